@@ -0,0 +1,53 @@
+"""Add transactions.month_day for day-of-year lookups
+
+Revision ID: a6d3f9b1c7e4
+Revises: f5c2d8a4b6e3
+Create Date: 2026-10-17 18:12:36.504918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.transaction import month_day
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d3f9b1c7e4'
+down_revision: Union[str, None] = 'f5c2d8a4b6e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.add_column(sa.Column('month_day', sa.Integer(), nullable=True))
+
+    # Backfill from the stored dates, the same way the ORM sets new rows
+    bind = op.get_bind()
+    transactions = sa.table(
+        'transactions',
+        sa.column('id'),  # Untyped: IDs are passed back exactly as stored
+        sa.column('date', sa.DateTime(timezone=True)),
+        sa.column('month_day', sa.Integer())
+    )
+    rows = bind.execute(sa.select(transactions.c.id, transactions.c.date)).fetchall()
+    if rows:
+        bind.execute(
+            transactions.update().where(transactions.c.id == sa.bindparam('row_id')),
+            [
+                {'row_id': row_id, 'month_day': month_day(value, bind.dialect.name)}
+                for row_id, value in rows
+            ]
+        )
+
+    op.create_index(
+        'idx_user_category_month_day', 'transactions', ['user_id', 'category', 'month_day']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_user_category_month_day', table_name='transactions')
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.drop_column('month_day')
@@ -0,0 +1,42 @@
+"""Add transaction daily rollups
+
+Revision ID: b7d2e4f1a9c3
+Revises: 4fc62033b40a
+Create Date: 2026-10-17 09:12:41.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.database_types import GUID
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e4f1a9c3'
+down_revision: Union[str, None] = '4fc62033b40a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Per-user (day, category, type, hour) transaction counters for analytics
+    op.create_table(
+        'transaction_daily_rollups',
+        sa.Column('user_id', GUID(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('category', sa.String(length=50), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('hour', sa.Integer(), nullable=False),
+        sa.Column('txn_count', sa.Integer(), nullable=False),
+        sa.Column('total_amount', sa.Numeric(14, 2), nullable=False),
+        sa.PrimaryKeyConstraint('user_id', 'day', 'category', 'type', 'hour')
+    )
+    op.create_index('idx_rollup_user_hour', 'transaction_daily_rollups', ['user_id', 'hour'])
+    # Rows are backfilled from existing transactions on application startup
+
+
+def downgrade() -> None:
+    op.drop_index('idx_rollup_user_hour', table_name='transaction_daily_rollups')
+    op.drop_table('transaction_daily_rollups')
@@ -0,0 +1,39 @@
+"""Add upcoming profile occasions
+
+Revision ID: b8e4a2c6d9f1
+Revises: a6d3f9b1c7e4
+Create Date: 2026-10-17 19:05:42.218736
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.database_types import GUID
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e4a2c6d9f1'
+down_revision: Union[str, None] = 'a6d3f9b1c7e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Filled from the existing profiles on the next application start
+    op.create_table(
+        'upcoming_occasions',
+        sa.Column('user_id', GUID(), nullable=False),
+        sa.Column('kind', sa.String(length=30), nullable=False),
+        sa.Column('original_date', sa.Date(), nullable=False),
+        sa.Column('next_date', sa.Date(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'kind')
+    )
+    op.create_index('idx_occasion_next_date', 'upcoming_occasions', ['next_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_occasion_next_date', table_name='upcoming_occasions')
+    op.drop_table('upcoming_occasions')
@@ -0,0 +1,120 @@
+"""Store GUIDs as BINARY(16) outside PostgreSQL
+
+Only converts databases configured with GUID_STORAGE=binary; with the
+default GUID_STORAGE=char the GUID columns keep their CHAR(36) type.
+
+Revision ID: c3e8a5d1f7b2
+Revises: b7d2e4f1a9c3
+Create Date: 2026-10-17 11:04:27.836512
+
+"""
+import uuid
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8a5d1f7b2'
+down_revision: Union[str, None] = 'b7d2e4f1a9c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# GUID columns of every table (all NOT NULL)
+GUID_COLUMNS = {
+    'users': ['id'],
+    'profiles': ['id', 'user_id'],
+    'transactions': ['id', 'user_id'],
+    'suggestions': ['id', 'user_id'],
+    'interactions': ['id', 'user_id', 'suggestion_id'],
+    'transaction_daily_rollups': ['user_id'],
+}
+
+
+def _to_bytes(value):
+    if isinstance(value, (bytes, bytearray)):
+        value = bytes(value)
+        if len(value) == 16:
+            return value
+        value = value.decode('ascii')
+    return uuid.UUID(value).bytes
+
+
+def _to_str(value):
+    if isinstance(value, (bytes, bytearray)):
+        return str(uuid.UUID(bytes=bytes(value)))
+    return str(uuid.UUID(value))
+
+
+def _convert_table(table_name, columns, column_type, convert):
+    """Rebuild a table with new GUID column types and convert the stored values."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if table_name not in inspector.get_table_names():
+        return
+    primary_key = inspector.get_pk_constraint(table_name)['constrained_columns']
+    foreign_keys = {
+        fk['constrained_columns'][0]: sa.ForeignKey(
+            f"{fk['referred_table']}.{fk['referred_columns'][0]}",
+            ondelete=fk.get('options', {}).get('ondelete')
+        )
+        for fk in inspector.get_foreign_keys(table_name)
+    }
+
+    # Overriding the reflected columns creates the new table with the new
+    # type and copies the rows as-is (no CAST, which would mangle the values)
+    with op.batch_alter_table(
+        table_name,
+        recreate='always',
+        reflect_args=[
+            sa.Column(
+                name,
+                column_type,
+                *([foreign_keys[name]] if name in foreign_keys else []),
+                nullable=False,
+                primary_key=name in primary_key
+            )
+            for name in columns
+        ]
+    ):
+        pass
+
+    table = sa.table(table_name, sa.column('rowid'), *[sa.column(name) for name in columns])
+    rows = bind.execute(sa.select(table.c.rowid, *[table.c[name] for name in columns])).fetchall()
+    for row in rows:
+        bind.execute(
+            table.update().where(table.c.rowid == row[0]).values(
+                {name: convert(value) for name, value in zip(columns, row[1:])}
+            )
+        )
+
+
+def _stores_binary() -> bool:
+    """Whether users.id is currently stored as bytes (SQLite reflects BINARY as NUMERIC)."""
+    id_type = next(
+        column['type'] for column in sa.inspect(op.get_bind()).get_columns('users')
+        if column['name'] == 'id'
+    )
+    return not isinstance(id_type, sa.String)
+
+
+def upgrade() -> None:
+    # PostgreSQL already stores GUIDs in its native 16-byte UUID type
+    if op.get_bind().dialect.name != 'sqlite' or settings.guid_storage != 'binary':
+        return
+
+    for table_name, columns in GUID_COLUMNS.items():
+        _convert_table(table_name, columns, sa.BINARY(16), _to_bytes)
+
+
+def downgrade() -> None:
+    # Databases upgraded with GUID_STORAGE=char were never converted
+    if op.get_bind().dialect.name != 'sqlite' or not _stores_binary():
+        return
+
+    for table_name, columns in GUID_COLUMNS.items():
+        _convert_table(table_name, columns, sa.CHAR(36), _to_str)
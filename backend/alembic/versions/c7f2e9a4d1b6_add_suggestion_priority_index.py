@@ -0,0 +1,30 @@
+"""Add the suggestion list pagination index
+
+Revision ID: c7f2e9a4d1b6
+Revises: b8e4a2c6d9f1
+Create Date: 2026-10-17 21:14:08.603217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7f2e9a4d1b6'
+down_revision: Union[str, None] = 'b8e4a2c6d9f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Matches ORDER BY priority DESC, scheduled_date, id so pages are read in order
+    op.create_index(
+        'idx_user_priority_scheduled', 'suggestions',
+        ['user_id', sa.text('priority DESC'), 'scheduled_date', 'id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_user_priority_scheduled', table_name='suggestions')
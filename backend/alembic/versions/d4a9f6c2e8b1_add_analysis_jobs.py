@@ -0,0 +1,50 @@
+"""Add analysis jobs
+
+Revision ID: d4a9f6c2e8b1
+Revises: c3e8a5d1f7b2
+Create Date: 2026-10-17 14:21:08.274519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.database_types import GUID
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a9f6c2e8b1'
+down_revision: Union[str, None] = 'c3e8a5d1f7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Persistent queue of AI analyses run outside the request path
+    op.create_table(
+        'analysis_jobs',
+        sa.Column('id', GUID(), nullable=False),
+        sa.Column('user_id', GUID(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('reason', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_after', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('suggestions_created', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_analysis_jobs_id'), 'analysis_jobs', ['id'], unique=False)
+    op.create_index('idx_job_status_run_after', 'analysis_jobs', ['status', 'run_after'])
+    op.create_index('idx_job_user_created', 'analysis_jobs', ['user_id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_job_user_created', table_name='analysis_jobs')
+    op.drop_index('idx_job_status_run_after', table_name='analysis_jobs')
+    op.drop_index(op.f('ix_analysis_jobs_id'), table_name='analysis_jobs')
+    op.drop_table('analysis_jobs')
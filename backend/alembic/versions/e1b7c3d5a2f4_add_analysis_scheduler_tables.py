@@ -0,0 +1,53 @@
+"""Add analysis scheduler tables
+
+Revision ID: e1b7c3d5a2f4
+Revises: d4a9f6c2e8b1
+Create Date: 2026-10-17 15:02:47.918236
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.database_types import GUID
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1b7c3d5a2f4'
+down_revision: Union[str, None] = 'd4a9f6c2e8b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Leader lock shared by all application processes
+    op.create_table(
+        'scheduler_leases',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('holder', sa.String(length=255), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+    # Progress of scheduled analysis runs (resumed after restarts)
+    op.create_table(
+        'analysis_runs',
+        sa.Column('id', GUID(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('shard_count', sa.Integer(), nullable=False),
+        sa.Column('next_shard', sa.Integer(), nullable=False),
+        sa.Column('users_processed', sa.Integer(), nullable=False),
+        sa.Column('users_failed', sa.Integer(), nullable=False),
+        sa.Column('suggestions_created', sa.Integer(), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_run_started', 'analysis_runs', ['started_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_run_started', table_name='analysis_runs')
+    op.drop_table('analysis_runs')
+    op.drop_table('scheduler_leases')
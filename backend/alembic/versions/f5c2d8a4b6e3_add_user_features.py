@@ -0,0 +1,38 @@
+"""Add user feature vectors
+
+Revision ID: f5c2d8a4b6e3
+Revises: e1b7c3d5a2f4
+Create Date: 2026-10-17 16:41:09.372518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.database_types import GUID
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5c2d8a4b6e3'
+down_revision: Union[str, None] = 'e1b7c3d5a2f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Rows are built lazily on the first analysis of each user
+    op.create_table(
+        'user_features',
+        sa.Column('user_id', GUID(), nullable=False),
+        sa.Column('window_start', sa.DateTime(), nullable=False),
+        sa.Column('features', sa.JSON(), nullable=False),
+        sa.Column('stale', sa.Boolean(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_features')
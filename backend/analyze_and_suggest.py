@@ -12,8 +12,9 @@ Uso:
     python analyze_and_suggest.py [username] [opções]
     
 Opções:
-    --days N          Analisar últimos N dias (padrão: 90)
+    --days N          Analisar últimos N dias (padrão: janela do feature store, 180)
     --force-llm       Forçar uso de LLM mesmo se desabilitado
+    --no-cache        Ignorar o cache de respostas do LLM
     --debug           Modo debug com mais informações
     --dry-run         Não salvar sugestões no banco
     --category CAT    Filtrar transações por categoria
@@ -26,35 +27,66 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import argparse
 from datetime import datetime, timedelta, timezone
-from decimal import Decimal
 from app.database import SessionLocal
-from app.models import User, Transaction, Suggestion, SuggestionType, SuggestionStatus
+from app.models import User, Transaction, Suggestion, SuggestionStatus
 from app.services.ai_engine import AIEngine
+from app.services.feature_store import FeatureVector, Totals, load_features
+from app.services.recurrence import detect_recurrences
 from app.config import settings
 import json
 
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def build_filtered_features(db, user, days, category=None):
+    """Calcula (sem salvar) o vetor de features de um período ou categoria específicos."""
+    now = datetime.now(timezone.utc)
+    start = now - timedelta(days=days)
+    dialect_name = db.get_bind().dialect.name
+    features = FeatureVector(
+        user_id=user.id,
+        window_start=start.replace(tzinfo=None),
+        computed_at=now
+    )
+    
+    query = db.query(
+        Transaction.date, Transaction.category, Transaction.description,
+        Transaction.type, Transaction.amount
+    ).filter(
+        Transaction.user_id == user.id,
+        Transaction.date >= start
+    )
+    if category:
+        query = query.filter(Transaction.category == category)
+    
+    for when, cat, description, type_, amount in query.order_by(Transaction.date).yield_per(1000):
+        features.add_transaction(when, cat, description, type_, amount, dialect_name)
+    
+    return features
+
 
 class EnhancedAIAnalyzer:
     """Analisador avançado com mais controles."""
     
-    def __init__(self, db, debug=False, force_llm=False):
+    def __init__(self, db, debug=False, force_llm=False, use_cache=True):
         self.db = db
         self.debug = debug
         self.force_llm = force_llm
         self.ai_engine = AIEngine(db)
+        self.ai_engine.use_llm_cache = use_cache
         
         # Forçar LLM se solicitado
         if force_llm:
             self.ai_engine.use_llm = True
     
-    def analyze_transaction_patterns_detailed(self, user, transactions, days):
-        """Análise detalhada de padrões de transações."""
-        print(f"\n📊 Análise detalhada de {len(transactions)} transações dos últimos {days} dias:")
+    def analyze_transaction_patterns_detailed(self, user, features):
+        """Análise detalhada de padrões a partir do vetor de features."""
+        print(f"\n📊 Análise detalhada de {features.transaction_count} transações dos últimos {features.window_days} dias:")
         
         # Estatísticas gerais
-        total_expense = sum(t.amount for t in transactions if t.type == 'expense')
-        total_income = sum(t.amount for t in transactions if t.type == 'income')
-        total_savings = sum(t.amount for t in transactions if t.type == 'savings')
+        total_expense = features.types.get('expense', Totals()).amount
+        total_income = features.types.get('income', Totals()).amount
+        total_savings = features.types.get('savings', Totals()).amount
         
         print(f"\n💰 Resumo Financeiro:")
         print(f"   - Total de despesas: R$ {total_expense:.2f}")
@@ -63,99 +95,71 @@ class EnhancedAIAnalyzer:
         print(f"   - Saldo líquido: R$ {(total_income - total_expense):.2f}")
         
         # Análise por categoria
-        category_analysis = {}
-        for t in transactions:
-            if t.category not in category_analysis:
-                category_analysis[t.category] = {
-                    'count': 0,
-                    'total': Decimal('0'),
-                    'transactions': []
-                }
-            category_analysis[t.category]['count'] += 1
-            category_analysis[t.category]['total'] += t.amount
-            category_analysis[t.category]['transactions'].append(t)
-        
         print("\n📂 Análise por Categoria:")
-        sorted_categories = sorted(
-            category_analysis.items(), 
-            key=lambda x: x[1]['total'], 
-            reverse=True
-        )
-        
-        for cat, data in sorted_categories[:10]:
-            avg = data['total'] / data['count']
+        for cat, totals in features.top_categories(10):
+            avg = totals.amount / totals.count
             print(f"   - {cat}:")
-            print(f"     • Total: R$ {data['total']:.2f}")
-            print(f"     • Quantidade: {data['count']} transações")
+            print(f"     • Total: R$ {totals.amount:.2f}")
+            print(f"     • Quantidade: {totals.count} transações")
             print(f"     • Média: R$ {avg:.2f}")
             
             if self.debug:
-                # Mostrar transações mais recentes desta categoria
-                recent = sorted(data['transactions'], key=lambda x: x.date, reverse=True)[:3]
-                for t in recent:
-                    print(f"       → {t.date.strftime('%d/%m')}: {t.description} (R$ {t.amount:.2f})")
+                # Mostrar os estabelecimentos mais frequentes desta categoria
+                merchants = sorted(
+                    (m for m in features.merchants.values() if m.category == cat),
+                    key=lambda m: m.last_date, reverse=True
+                )[:3]
+                for m in merchants:
+                    print(f"       → {m.last_date.strftime('%d/%m')}: {m.description} ({m.count}x, R$ {m.amount:.2f})")
         
         # Identificar padrões temporais
         print("\n📅 Padrões Temporais:")
         
         # Gastos por dia da semana
-        weekday_spending = {}
-        for t in transactions:
-            if t.type == 'expense':
-                weekday = t.date.strftime('%A')
-                if weekday not in weekday_spending:
-                    weekday_spending[weekday] = Decimal('0')
-                weekday_spending[weekday] += t.amount
-        
+        weekday_spending = {
+            WEEKDAYS[day]: amount for day, amount in enumerate(features.weekday_expenses) if amount
+        }
         if weekday_spending:
             print("   Gastos por dia da semana:")
             for day, total in sorted(weekday_spending.items(), key=lambda x: x[1], reverse=True):
                 print(f"     - {day}: R$ {total:.2f}")
         
+        if any(features.hour_counts):
+            busiest_hours = sorted(range(24), key=lambda h: features.hour_counts[h], reverse=True)[:3]
+            print("   Horários com mais transações: " + ", ".join(
+                f"{hour}h ({features.hour_counts[hour]})" for hour in busiest_hours if features.hour_counts[hour]
+            ))
+        
         # Identificar gastos recorrentes
         print("\n🔄 Possíveis Gastos Recorrentes:")
         
-        # Agrupar por descrição similar
-        description_groups = {}
-        for t in transactions:
-            # Simplificar descrição para agrupamento
-            key = t.description.lower().split('-')[0].strip()
-            if key not in description_groups:
-                description_groups[key] = []
-            description_groups[key].append(t)
-        
-        # Identificar recorrências
-        recurrent_patterns = []
-        for desc, trans_list in description_groups.items():
-            if len(trans_list) >= 3:  # Pelo menos 3 ocorrências
-                dates = sorted([t.date for t in trans_list])
-                intervals = []
-                for i in range(1, len(dates)):
-                    interval = (dates[i] - dates[i-1]).days
-                    intervals.append(interval)
-                
-                if intervals:
-                    avg_interval = sum(intervals) / len(intervals)
-                    if avg_interval < 40:  # Recorrência mensal ou mais frequente
-                        recurrent_patterns.append({
-                            'description': desc,
-                            'count': len(trans_list),
-                            'avg_interval': avg_interval,
-                            'total_spent': sum(t.amount for t in trans_list),
-                            'last_date': dates[-1]
-                        })
+        # Periodicidade (mediana e desvio absoluto mediano dos intervalos) de cada estabelecimento
+        recurrent_patterns = [
+            {
+                'description': r.description,
+                'count': r.count,
+                'avg_interval': r.period_days,
+                'interval_mad': r.mad_days,
+                'total_spent': features.merchants[(r.category, r.description)].amount,
+                'last_date': r.last_date,
+                'next_due': r.next_due
+            }
+            for r in detect_recurrences([features], min_count=3)[user.id]  # Pelo menos 3 ocorrências
+            if r.is_regular and r.period_days < 40  # Recorrência mensal ou mais frequente
+        ]
         
         # Mostrar padrões recorrentes
         for pattern in sorted(recurrent_patterns, key=lambda x: x['count'], reverse=True)[:5]:
             print(f"   - {pattern['description'].title()}:")
-            print(f"     • Frequência: a cada {pattern['avg_interval']:.0f} dias")
+            print(f"     • Frequência: a cada {pattern['avg_interval']:.0f} dias (± {pattern['interval_mad']:.0f})")
             print(f"     • Ocorrências: {pattern['count']}x")
             print(f"     • Total gasto: R$ {pattern['total_spent']:.2f}")
             print(f"     • Última vez: {pattern['last_date'].strftime('%d/%m/%Y')}")
+            print(f"     • Próxima prevista: {pattern['next_due'].strftime('%d/%m/%Y')}")
         
-        return category_analysis, recurrent_patterns
+        return features.categories, recurrent_patterns
     
-    def generate_custom_suggestions(self, user, transactions, min_suggestions=3):
+    def generate_custom_suggestions(self, user, min_suggestions=3):
         """Gera sugestões customizadas com mais controle."""
         print(f"\n🤖 Gerando sugestões (mínimo: {min_suggestions})...")
         
@@ -195,8 +199,9 @@ def main():
         description='Análise avançada de transações e geração de sugestões'
     )
     parser.add_argument('username', nargs='?', help='Nome de usuário para análise')
-    parser.add_argument('--days', type=int, default=90, help='Número de dias para análise')
+    parser.add_argument('--days', type=int, help='Número de dias para análise (padrão: janela do feature store)')
     parser.add_argument('--force-llm', action='store_true', help='Forçar uso de LLM')
+    parser.add_argument('--no-cache', action='store_true', help='Ignorar cache de respostas do LLM')
     parser.add_argument('--debug', action='store_true', help='Modo debug')
     parser.add_argument('--dry-run', action='store_true', help='Não salvar no banco')
     parser.add_argument('--category', help='Filtrar por categoria')
@@ -233,36 +238,31 @@ def main():
             print(f"\n👥 {len(users)} usuários ativos encontrados")
         
         # Analisar cada usuário
-        analyzer = EnhancedAIAnalyzer(db, debug=args.debug, force_llm=args.force_llm)
+        analyzer = EnhancedAIAnalyzer(
+            db, debug=args.debug, force_llm=args.force_llm, use_cache=not args.no_cache
+        )
         
         for user in users:
             print(f"\n{'='*60}")
             print(f"👤 Analisando: {user.username}")
             
-            # Buscar transações
-            query = db.query(Transaction).filter(
-                Transaction.user_id == user.id,
-                Transaction.date >= datetime.now(timezone.utc) - timedelta(days=args.days)
-            )
-            
-            if args.category:
-                query = query.filter(Transaction.category == args.category)
-            
-            transactions = query.order_by(Transaction.date.desc()).all()
+            # Features do período: o vetor armazenado, ou um calculado na hora para filtros
+            if args.days is None and not args.category:
+                features = load_features(db, user.id)
+            else:
+                features = build_filtered_features(
+                    db, user, args.days or settings.feature_store_window_days, args.category
+                )
             
-            if not transactions:
+            if not features.transaction_count:
                 print("   ⚠️  Nenhuma transação encontrada no período")
                 continue
             
             # Análise detalhada
-            category_analysis, patterns = analyzer.analyze_transaction_patterns_detailed(
-                user, transactions, args.days
-            )
+            category_analysis, patterns = analyzer.analyze_transaction_patterns_detailed(user, features)
             
             # Gerar sugestões
-            suggestions = analyzer.generate_custom_suggestions(
-                user, transactions, args.min_suggestions
-            )
+            suggestions = analyzer.generate_custom_suggestions(user, args.min_suggestions)
             
             print(f"\n✨ {len(suggestions)} sugestões geradas:")
             
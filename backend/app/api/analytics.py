@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, extract
-from typing import Optional
+from sqlalchemy import func, and_, extract, case, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Dict
 from datetime import datetime, timezone, timedelta
+from decimal import Decimal
 from uuid import UUID
 
 from ..database import get_db
-from ..models import User, Transaction, Suggestion, Interaction, SuggestionStatus, InteractionAction
+from ..models import User, Profile, Transaction, Suggestion, Interaction, SuggestionStatus, InteractionAction
 from ..schemas import (
     UserBehaviorAnalysis,
     DashboardStats,
@@ -14,6 +15,8 @@ from ..schemas import (
     BehaviorPattern
 )
 from ..services.auth import get_current_active_user
+from ..services.transaction_rollups import load_rollup_rows, hourly_transaction_counts
+from ..utils.dates import next_anniversary
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
@@ -21,7 +24,7 @@ router = APIRouter(prefix="/analytics", tags=["Analytics"])
 @router.get("/dashboard", response_model=DashboardStats)
 async def get_dashboard_stats(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get dashboard statistics for the current user.
@@ -41,82 +44,65 @@ async def get_dashboard_stats(
         created_at = created_at.replace(tzinfo=timezone.utc)
     days_active = (now - created_at).days + 1
     
-    # Get last activity
-    last_interaction = db.query(Interaction).filter(
-        Interaction.user_id == current_user.id
-    ).order_by(Interaction.timestamp.desc()).first()
-    
-    last_activity = last_interaction.timestamp if last_interaction else created_at
-    
-    # Calculate activity streak (simplified - days with at least one interaction)
+    week_start = now - timedelta(days=now.weekday())
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     seven_days_ago = now - timedelta(days=7)
-    daily_activities = db.query(
-        func.date(Interaction.timestamp).label('day')
-    ).filter(
-        and_(
-            Interaction.user_id == current_user.id,
-            Interaction.timestamp >= seven_days_ago
-        )
-    ).group_by(func.date(Interaction.timestamp)).count()
+    thirty_days_ago = now - timedelta(days=30)
     
-    activity_streak = daily_activities  # Simplified streak calculation
+    # Interactions: last activity and active days in the last week
+    interaction_stats = (await db.execute(
+        select(
+            func.max(Interaction.timestamp).label('last_activity'),
+            func.count(func.distinct(
+                case((Interaction.timestamp >= seven_days_ago, func.date(Interaction.timestamp)))
+            )).label('active_days')
+        ).where(
+            Interaction.user_id == current_user.id
+        )
+    )).one()
     
-    # Pending suggestions
-    pending_suggestions = db.query(Suggestion).filter(
-        Suggestion.user_id == current_user.id,
-        Suggestion.status == SuggestionStatus.PENDING
-    ).count()
+    last_activity = interaction_stats.last_activity or created_at
     
-    # Suggestions this week
-    week_start = now - timedelta(days=now.weekday())
-    suggestions_this_week = db.query(Suggestion).filter(
-        and_(
-            Suggestion.user_id == current_user.id,
-            Suggestion.created_at >= week_start
+    # Calculate activity streak (simplified - days with at least one interaction)
+    activity_streak = interaction_stats.active_days or 0  # Simplified streak calculation
+    
+    # Suggestions: all counters with conditional aggregation
+    suggestion_stats = (await db.execute(
+        select(
+            func.count(Suggestion.id).label('total'),
+            func.sum(case((Suggestion.status == SuggestionStatus.PENDING.value, 1), else_=0)).label('pending'),
+            func.sum(case((Suggestion.created_at >= week_start, 1), else_=0)).label('this_week'),
+            func.sum(case(
+                (Suggestion.status.in_([SuggestionStatus.ACCEPTED.value, SuggestionStatus.EXECUTED.value]), 1),
+                else_=0
+            )).label('accepted_or_executed')
+        ).where(
+            Suggestion.user_id == current_user.id
         )
-    ).count()
+    )).one()
     
-    # Suggestion acceptance rate
-    total_suggestions = db.query(Suggestion).filter(
-        Suggestion.user_id == current_user.id
-    ).count()
-    
-    accepted_or_executed = db.query(Suggestion).filter(
-        Suggestion.user_id == current_user.id,
-        Suggestion.status.in_([SuggestionStatus.ACCEPTED, SuggestionStatus.EXECUTED])
-    ).count()
+    total_suggestions = suggestion_stats.total or 0
+    pending_suggestions = suggestion_stats.pending or 0
+    suggestions_this_week = suggestion_stats.this_week or 0
+    accepted_or_executed = suggestion_stats.accepted_or_executed or 0
     
+    # Suggestion acceptance rate
     suggestion_acceptance_rate = accepted_or_executed / total_suggestions if total_suggestions > 0 else 0.0
     
-    # Transaction stats for current month
-    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    month_transactions = db.query(
-        func.count(Transaction.id).label('count'),
-        func.sum(Transaction.amount).label('total')
-    ).filter(
-        and_(
-            Transaction.user_id == current_user.id,
-            Transaction.date >= month_start
-        )
-    ).first()
+    # Transactions: current month and last 30 days, from the daily rollups
+    month_rows = await db.run_sync(load_rollup_rows, current_user.id, start=month_start)
+    recent_rows = await db.run_sync(load_rollup_rows, current_user.id, start=thirty_days_ago)
     
-    total_transactions = month_transactions.count or 0
-    total_spent_this_month = month_transactions.total or 0
+    total_transactions = sum(row.count for row in month_rows)
+    total_spent_this_month = sum((row.amount for row in month_rows), Decimal('0'))
     
     # Average daily spend (last 30 days)
-    thirty_days_ago = now - timedelta(days=30)
-    daily_avg = db.query(
-        func.avg(Transaction.amount).label('avg')
-    ).filter(
-        and_(
-            Transaction.user_id == current_user.id,
-            Transaction.date >= thirty_days_ago
-        )
-    ).scalar() or 0
+    recent_count = sum(row.count for row in recent_rows)
+    recent_total = sum((row.amount for row in recent_rows), Decimal('0'))
+    daily_avg = recent_total / recent_count if recent_count > 0 else 0
     
     # Next important date
-    profile = current_user.profile
+    profile = await db.scalar(select(Profile).where(Profile.user_id == current_user.id))
     next_important_date = None
     
     if profile:
@@ -125,9 +111,7 @@ async def get_dashboard_stats(
         dates_to_check = []
         
         if profile.birth_date:
-            next_birthday = profile.birth_date.replace(year=today.year)
-            if next_birthday < today:
-                next_birthday = next_birthday.replace(year=today.year + 1)
+            next_birthday = next_anniversary(profile.birth_date, today)
             dates_to_check.append({
                 "date": next_birthday,
                 "type": "birthday",
@@ -135,9 +119,7 @@ async def get_dashboard_stats(
             })
         
         if profile.spouse_birth_date:
-            next_spouse_birthday = profile.spouse_birth_date.replace(year=today.year)
-            if next_spouse_birthday < today:
-                next_spouse_birthday = next_spouse_birthday.replace(year=today.year + 1)
+            next_spouse_birthday = next_anniversary(profile.spouse_birth_date, today)
             dates_to_check.append({
                 "date": next_spouse_birthday,
                 "type": "anniversary",
@@ -152,13 +134,15 @@ async def get_dashboard_stats(
     # Top recommendations (simplified for now)
     top_recommendations = []
     if pending_suggestions > 0:
-        top_suggestions = db.query(Suggestion).filter(
-            Suggestion.user_id == current_user.id,
-            Suggestion.status == SuggestionStatus.PENDING
-        ).order_by(
-            Suggestion.priority.desc(),
-            Suggestion.scheduled_date.asc()
-        ).limit(3).all()
+        top_suggestions = (await db.scalars(
+            select(Suggestion).where(
+                Suggestion.user_id == current_user.id,
+                Suggestion.status == SuggestionStatus.PENDING
+            ).order_by(
+                Suggestion.priority.desc(),
+                Suggestion.scheduled_date.asc()
+            ).limit(3)
+        )).all()
         
         top_recommendations = [s.content for s in top_suggestions]
     
@@ -167,17 +151,13 @@ async def get_dashboard_stats(
     
     # Check for high spending categories
     if total_spent_this_month > 0:
-        category_spending = db.query(
-            Transaction.category,
-            func.sum(Transaction.amount).label('total')
-        ).filter(
-            and_(
-                Transaction.user_id == current_user.id,
-                Transaction.date >= month_start
-            )
-        ).group_by(Transaction.category).order_by(
-            func.sum(Transaction.amount).desc()
-        ).limit(3).all()
+        month_by_category: Dict[str, Decimal] = {}
+        for row in month_rows:
+            month_by_category[row.category] = month_by_category.get(row.category, Decimal('0')) + row.amount
+        
+        category_spending = sorted(
+            month_by_category.items(), key=lambda x: x[1], reverse=True
+        )[:3]
         
         for category, total in category_spending:
             # Simple rule: if spending > 20% of total, suggest reduction
@@ -209,7 +189,7 @@ async def get_dashboard_stats(
 @router.get("/behavior-patterns", response_model=UserBehaviorAnalysis)
 async def get_behavior_patterns(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get user behavior analysis and patterns.
@@ -230,18 +210,19 @@ async def get_behavior_patterns(
     thirty_days_ago = now - timedelta(days=30)
     
     # Find categories with multiple purchases
-    recurring_categories = db.query(
-        Transaction.category,
-        func.count(Transaction.id).label('count'),
-        func.avg(Transaction.amount).label('avg_amount')
-    ).filter(
-        and_(
-            Transaction.user_id == current_user.id,
-            Transaction.date >= thirty_days_ago
-        )
-    ).group_by(Transaction.category).having(
-        func.count(Transaction.id) >= 3  # At least 3 times in 30 days
-    ).all()
+    recent_rows = await db.run_sync(load_rollup_rows, current_user.id, start=thirty_days_ago)
+    
+    category_counts: Dict[str, int] = {}
+    spending_habits: Dict[str, float] = {}
+    for row in recent_rows:
+        category_counts[row.category] = category_counts.get(row.category, 0) + row.count
+        spending_habits[row.category] = spending_habits.get(row.category, 0.0) + float(row.amount)
+    
+    recurring_categories = [
+        (category, count, spending_habits[category] / count)
+        for category, count in category_counts.items()
+        if count >= 3  # At least 3 times in 30 days
+    ]
     
     for category, count, avg_amount in recurring_categories:
         frequency = count / 30  # Purchases per day
@@ -259,16 +240,7 @@ async def get_behavior_patterns(
             ))
     
     # Pattern 2: Peak spending times
-    activity_by_hour = db.query(
-        extract('hour', Transaction.date).label('hour'),
-        func.count(Transaction.id).label('count')
-    ).filter(
-        Transaction.user_id == current_user.id
-    ).group_by(
-        extract('hour', Transaction.date)
-    ).all()
-    
-    activity_times = {int(hour): count for hour, count in activity_by_hour if hour is not None}
+    activity_times = await db.run_sync(hourly_transaction_counts, current_user.id)
     
     # Find peak hours
     if activity_times:
@@ -285,39 +257,32 @@ async def get_behavior_patterns(
             ]
         ))
     
-    # Spending habits summary
-    spending_by_category = db.query(
-        Transaction.category,
-        func.sum(Transaction.amount).label('total')
-    ).filter(
-        and_(
-            Transaction.user_id == current_user.id,
-            Transaction.date >= thirty_days_ago
-        )
-    ).group_by(Transaction.category).all()
-    
-    spending_habits = {cat: float(total) for cat, total in spending_by_category}
-    
     # Preferred categories (top 3)
     preferred_categories = sorted(spending_habits.keys(), key=lambda x: spending_habits[x], reverse=True)[:3]
     
     # Suggestion responsiveness
-    suggestion_types = db.query(Suggestion.type).filter(
-        Suggestion.user_id == current_user.id
-    ).distinct().all()
+    suggestion_types = (await db.execute(
+        select(Suggestion.type).where(
+            Suggestion.user_id == current_user.id
+        ).distinct()
+    )).all()
     
     suggestion_responsiveness = {}
     for (stype,) in suggestion_types:
-        total = db.query(Suggestion).filter(
-            Suggestion.user_id == current_user.id,
-            Suggestion.type == stype
-        ).count()
+        total = await db.scalar(
+            select(func.count(Suggestion.id)).where(
+                Suggestion.user_id == current_user.id,
+                Suggestion.type == stype
+            )
+        )
         
-        accepted = db.query(Suggestion).filter(
-            Suggestion.user_id == current_user.id,
-            Suggestion.type == stype,
-            Suggestion.status.in_([SuggestionStatus.ACCEPTED, SuggestionStatus.EXECUTED])
-        ).count()
+        accepted = await db.scalar(
+            select(func.count(Suggestion.id)).where(
+                Suggestion.user_id == current_user.id,
+                Suggestion.type == stype,
+                Suggestion.status.in_([SuggestionStatus.ACCEPTED, SuggestionStatus.EXECUTED])
+            )
+        )
         
         if total > 0:
             suggestion_responsiveness[str(stype)] = accepted / total
@@ -327,7 +292,7 @@ async def get_behavior_patterns(
         analysis_date=now,
         patterns=patterns,
         spending_habits=spending_habits,
-        activity_times=activity_times,
+        activity_times={str(hour): count for hour, count in activity_times.items()},
         preferred_categories=preferred_categories,
         suggestion_responsiveness=suggestion_responsiveness
     )
@@ -336,7 +301,7 @@ async def get_behavior_patterns(
 @router.get("/engagement", response_model=EngagementMetrics)
 async def get_engagement_metrics(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get user engagement metrics.
@@ -352,30 +317,36 @@ async def get_engagement_metrics(
     thirty_days_ago = now - timedelta(days=30)
     
     # Daily active rate (days with activity in last 30 days)
-    active_days = db.query(
-        func.date(Interaction.timestamp).label('day')
-    ).filter(
-        and_(
-            Interaction.user_id == current_user.id,
-            Interaction.timestamp >= thirty_days_ago
+    active_days = await db.scalar(
+        select(func.count()).select_from(
+            select(
+                func.date(Interaction.timestamp).label('day')
+            ).where(
+                and_(
+                    Interaction.user_id == current_user.id,
+                    Interaction.timestamp >= thirty_days_ago
+                )
+            ).group_by(func.date(Interaction.timestamp)).subquery()
         )
-    ).group_by(func.date(Interaction.timestamp)).count()
+    )
     
     daily_active_rate = active_days / 30.0
     
     # Average response time to suggestions
-    response_times = db.query(
-        Suggestion.created_at,
-        Interaction.timestamp
-    ).join(
-        Interaction,
-        and_(
-            Interaction.suggestion_id == Suggestion.id,
-            Interaction.action.in_([InteractionAction.ACCEPTED, InteractionAction.REJECTED])
+    response_times = (await db.execute(
+        select(
+            Suggestion.created_at,
+            Interaction.timestamp
+        ).join(
+            Interaction,
+            and_(
+                Interaction.suggestion_id == Suggestion.id,
+                Interaction.action.in_([InteractionAction.ACCEPTED, InteractionAction.REJECTED])
+            )
+        ).where(
+            Suggestion.user_id == current_user.id
         )
-    ).filter(
-        Suggestion.user_id == current_user.id
-    ).all()
+    )).all()
     
     if response_times:
         total_hours = sum(
@@ -388,27 +359,33 @@ async def get_engagement_metrics(
     
     # Feature usage
     feature_usage = {
-        "suggestions": db.query(Interaction).filter(
-            Interaction.user_id == current_user.id,
-            Interaction.suggestion_id.isnot(None)
-        ).count(),
-        "transactions": db.query(Transaction).filter(
-            Transaction.user_id == current_user.id
-        ).count(),
+        "suggestions": await db.scalar(
+            select(func.count(Interaction.id)).where(
+                Interaction.user_id == current_user.id,
+                Interaction.suggestion_id.isnot(None)
+            )
+        ),
+        "transactions": await db.scalar(
+            select(func.count(Transaction.id)).where(
+                Transaction.user_id == current_user.id
+            )
+        ),
         "profile_updates": 1  # Simplified
     }
     
     # Peak activity hours
-    hourly_activity = db.query(
-        extract('hour', Interaction.timestamp).label('hour'),
-        func.count(Interaction.id).label('count')
-    ).filter(
-        Interaction.user_id == current_user.id
-    ).group_by(
-        extract('hour', Interaction.timestamp)
-    ).order_by(
-        func.count(Interaction.id).desc()
-    ).limit(3).all()
+    hourly_activity = (await db.execute(
+        select(
+            extract('hour', Interaction.timestamp).label('hour'),
+            func.count(Interaction.id).label('count')
+        ).where(
+            Interaction.user_id == current_user.id
+        ).group_by(
+            extract('hour', Interaction.timestamp)
+        ).order_by(
+            func.count(Interaction.id).desc()
+        ).limit(3)
+    )).all()
     
     peak_activity_hours = [int(hour) for hour, _ in hourly_activity if hour is not None]
     
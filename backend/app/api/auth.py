@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from typing import Dict, Any
 import logging
@@ -19,7 +20,7 @@ from ..schemas import (
     PasswordResetConfirm
 )
 from ..services.auth import authenticate_user, get_current_user, rate_limiter
-from ..utils.security import get_password_hash, create_tokens, decode_token
+from ..utils.security import get_password_hash_async, create_tokens, decode_token
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 logger = logging.getLogger(__name__)
@@ -28,7 +29,7 @@ logger = logging.getLogger(__name__)
 @router.post("/register", response_model=TokenResponse)
 async def register(
     user_data: UserCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     request: Request = None
 ):
     """
@@ -54,10 +55,12 @@ async def register(
         )
     
     # Check if username or email already exists
-    existing_user = db.query(User).filter(
-        (User.username == user_data.username) |
-        (User.email == user_data.email)
-    ).first()
+    existing_user = await db.scalar(select(User).where(
+        or_(
+            User.username == user_data.username,
+            User.email == user_data.email
+        )
+    ))
     
     if existing_user:
         if existing_user.username == user_data.username:
@@ -74,7 +77,7 @@ async def register(
     # Create new user
     try:
         # Hash password
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
         
         # Create user
         new_user = User(
@@ -83,14 +86,14 @@ async def register(
             password_hash=hashed_password
         )
         db.add(new_user)
-        db.flush()  # Get the user ID
+        await db.flush()  # Get the user ID
         
         # Create empty profile
         new_profile = Profile(user_id=new_user.id)
         db.add(new_profile)
         
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         
         # Generate tokens
         tokens = create_tokens(str(new_user.id))
@@ -101,13 +104,13 @@ async def register(
         return tokens
         
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User registration failed"
         )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error during registration"
@@ -117,7 +120,7 @@ async def register(
 @router.post("/login", response_model=TokenResponse)
 async def login(
     credentials: UserLogin,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     request: Request = None
 ):
     """
@@ -145,7 +148,7 @@ async def login(
         )
     
     # Authenticate user
-    user = authenticate_user(db, credentials.username, credentials.password)
+    user = await authenticate_user(db, credentials.username, credentials.password)
     
     if not user:
         raise HTTPException(
@@ -173,14 +176,14 @@ async def login(
 @router.post("/token", response_model=TokenResponse)
 async def login_for_swagger(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     OAuth2 compatible login endpoint for Swagger UI.
     
     This endpoint accepts form data instead of JSON.
     """
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     
     if not user:
         raise HTTPException(
@@ -201,7 +204,7 @@ async def login_for_swagger(
 @router.post("/refresh", response_model=TokenResponse)
 async def refresh_token(
     token_data: TokenRefresh,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Refresh access token using refresh token.
@@ -241,7 +244,7 @@ async def refresh_token(
         )
     
     # Verify user exists and is active
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -280,7 +283,7 @@ async def logout(current_user: User = Depends(get_current_user)):
 async def change_password(
     password_data: PasswordChange,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Change password for current user.
@@ -297,15 +300,15 @@ async def change_password(
         HTTPException: If current password incorrect
     """
     # Verify current password
-    if not authenticate_user(db, current_user.username, password_data.current_password):
+    if not await authenticate_user(db, current_user.username, password_data.current_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
     
     # Update password
-    current_user.password_hash = get_password_hash(password_data.new_password)
-    db.commit()
+    current_user.password_hash = await get_password_hash_async(password_data.new_password)
+    await db.commit()
     
     return {"message": "Password successfully changed"}
 
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy import and_, or_, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone, timedelta
 from uuid import UUID
@@ -9,6 +10,13 @@ from ..database import get_db
 from ..models import User, Interaction, Suggestion, InteractionAction
 from ..schemas import InteractionResponse
 from ..services.auth import get_current_active_user
+from ..utils.pagination import (
+    NEXT_CURSOR_HEADER,
+    encode_cursor,
+    decode_cursor,
+    keyset_condition,
+    keyset_order
+)
 
 router = APIRouter(prefix="/interactions", tags=["Interactions"])
 
@@ -22,20 +30,27 @@ async def list_interactions(
     end_date: Optional[datetime] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    response: Response = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     List user interactions with suggestions.
     
+    Pages can be walked with skip or, faster for deep pages, with the cursor
+    returned in the X-Next-Cursor header (absent on the last page).
+    
     Args:
         action: Filter by interaction action (viewed, accepted, rejected, etc.)
         suggestion_id: Filter by specific suggestion
         date_range: Predefined date range (today, week, month, year)
         start_date: Filter interactions after this date
         end_date: Filter interactions before this date
-        skip: Number of items to skip (pagination)
+        skip: Number of items to skip (pagination, ignored with cursor)
         limit: Number of items to return
+        cursor: Cursor of the page to fetch (from X-Next-Cursor)
+        response: Response (carries the next cursor header)
         current_user: Current authenticated user
         db: Database session
         
@@ -59,26 +74,40 @@ async def list_interactions(
             end_date = now
     
     # Build query
-    query = db.query(Interaction).filter(Interaction.user_id == current_user.id)
+    query = select(Interaction).options(
+        selectinload(Interaction.suggestion)
+    ).where(Interaction.user_id == current_user.id)
     
     # Apply filters
     if action:
-        query = query.filter(Interaction.action == action)
+        query = query.where(Interaction.action == action)
     
     if suggestion_id:
-        query = query.filter(Interaction.suggestion_id == suggestion_id)
+        query = query.where(Interaction.suggestion_id == suggestion_id)
     
     if start_date:
-        query = query.filter(Interaction.timestamp >= start_date)
+        query = query.where(Interaction.timestamp >= start_date)
     
     if end_date:
-        query = query.filter(Interaction.timestamp <= end_date)
-    
-    # Order by timestamp descending (most recent first)
-    query = query.order_by(Interaction.timestamp.desc())
-    
-    # Apply pagination
-    interactions = query.offset(skip).limit(limit).all()
+        query = query.where(Interaction.timestamp <= end_date)
+    
+    # Order by timestamp descending (most recent first, id breaks ties)
+    keys = [(Interaction.timestamp, True), (Interaction.id, True)]
+    query = query.order_by(*keyset_order(keys))
+    
+    # Apply pagination: seek past the cursor through idx_user_timestamp,
+    # fetching one extra row to know whether there is a next page
+    if cursor:
+        after = decode_cursor(cursor, (datetime.fromisoformat, UUID))
+        query = query.where(keyset_condition(keys, after))
+    else:
+        query = query.offset(skip)
+    interactions = (await db.scalars(query.limit(limit + 1))).all()
+    
+    if len(interactions) > limit:
+        interactions = interactions[:limit]
+        last = interactions[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([last.timestamp, last.id])
     
     return interactions
 
@@ -87,7 +116,7 @@ async def list_interactions(
 async def get_interaction_stats(
     date_range: Optional[str] = Query("month", pattern="^(today|week|month|year|all)$"),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get interaction statistics for the current user.
@@ -114,17 +143,18 @@ async def get_interaction_stats(
         elif date_range == "year":
             start_date = now - timedelta(days=365)
     
-    # Build base query
-    base_query = db.query(Interaction).filter(Interaction.user_id == current_user.id)
+    # Build base filters
+    filters = [Interaction.user_id == current_user.id]
     if start_date:
-        base_query = base_query.filter(Interaction.timestamp >= start_date)
+        filters.append(Interaction.timestamp >= start_date)
     
     # Count by action
-    from sqlalchemy import func
-    action_counts = base_query.with_entities(
-        Interaction.action,
-        func.count(Interaction.id).label('count')
-    ).group_by(Interaction.action).all()
+    action_counts = (await db.execute(
+        select(
+            Interaction.action,
+            func.count(Interaction.id).label('count')
+        ).where(*filters).group_by(Interaction.action)
+    )).all()
     
     by_action = {str(action): count for action, count in action_counts}
     
@@ -132,9 +162,11 @@ async def get_interaction_stats(
     total_interactions = sum(by_action.values())
     
     # Get most recent interactions
-    recent_interactions = base_query.order_by(
-        Interaction.timestamp.desc()
-    ).limit(5).all()
+    recent_interactions = (await db.scalars(
+        select(Interaction).where(*filters).order_by(
+            Interaction.timestamp.desc()
+        ).limit(5)
+    )).all()
     
     return {
         "total_interactions": total_interactions,
@@ -155,7 +187,7 @@ async def get_interaction_stats(
 async def get_interaction(
     interaction_id: UUID,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get a specific interaction.
@@ -171,10 +203,14 @@ async def get_interaction(
     Raises:
         HTTPException: If interaction not found or not owned by user
     """
-    interaction = db.query(Interaction).filter(
-        Interaction.id == interaction_id,
-        Interaction.user_id == current_user.id
-    ).first()
+    interaction = await db.scalar(
+        select(Interaction).options(
+            selectinload(Interaction.suggestion)
+        ).where(
+            Interaction.id == interaction_id,
+            Interaction.user_id == current_user.id
+        )
+    )
     
     if not interaction:
         raise HTTPException(
@@ -1,12 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query, Response
+from sqlalchemy import or_, select, func, insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone, timedelta
 from uuid import UUID
 import json
 
-from ..database import get_db
+from ..database import get_db, AsyncSessionLocal
 from ..models import User, Suggestion, Interaction, SuggestionStatus, SuggestionType, InteractionAction
 from ..schemas import (
     SuggestionCreate,
@@ -17,10 +17,59 @@ from ..schemas import (
     SuggestionStats
 )
 from ..services.auth import get_current_active_user
+from ..utils.pagination import (
+    NEXT_CURSOR_HEADER,
+    encode_cursor,
+    decode_cursor,
+    keyset_condition,
+    keyset_order
+)
 
 router = APIRouter(prefix="/suggestions", tags=["Suggestions"])
 
 
+async def mark_suggestions_viewed(user_id: UUID, suggestion_ids: List[UUID]):
+    """
+    Record a VIEWED interaction for each suggestion not viewed yet.
+    
+    Runs after the response is sent, with its own session: one lookup for
+    the whole page and one bulk insert for the missing rows.
+    
+    Args:
+        user_id: User ID
+        suggestion_ids: IDs of the listed pending suggestions
+    """
+    if not suggestion_ids:
+        return
+    
+    async with AsyncSessionLocal() as db:
+        try:
+            already_viewed = set((await db.scalars(
+                select(Interaction.suggestion_id).where(
+                    Interaction.user_id == user_id,
+                    Interaction.suggestion_id.in_(suggestion_ids),
+                    Interaction.action == InteractionAction.VIEWED
+                )
+            )).all())
+            
+            new_views = [
+                {
+                    "user_id": user_id,
+                    "suggestion_id": suggestion_id,
+                    "action": InteractionAction.VIEWED
+                }
+                for suggestion_id in dict.fromkeys(suggestion_ids)
+                if suggestion_id not in already_viewed
+            ]
+            
+            if new_views:
+                await db.execute(insert(Interaction), new_views)
+                await db.commit()
+        except Exception as e:
+            await db.rollback()
+            print(f"Error marking suggestions as viewed for user {user_id}: {e}")
+
+
 @router.get("/", response_model=List[SuggestionResponse])
 async def list_suggestions(
     status: Optional[SuggestionStatus] = None,
@@ -33,12 +82,18 @@ async def list_suggestions(
     end_date: Optional[datetime] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    response: Response = None,
+    background_tasks: BackgroundTasks = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     List user suggestions with optional filters.
     
+    Pages can be walked with skip or, faster for deep pages, with the cursor
+    returned in the X-Next-Cursor header (absent on the last page).
+    
     Args:
         status: Filter by suggestion status
         type: Filter by suggestion type
@@ -48,8 +103,11 @@ async def list_suggestions(
         priority_max: Maximum priority (1-10)
         start_date: Filter suggestions scheduled after this date
         end_date: Filter suggestions scheduled before this date
-        skip: Number of items to skip (pagination)
+        skip: Number of items to skip (pagination, ignored with cursor)
         limit: Number of items to return
+        cursor: Cursor of the page to fetch (from X-Next-Cursor)
+        response: Response (carries the next cursor header)
+        background_tasks: Tasks run after the response (view tracking)
         current_user: Current authenticated user
         db: Database session
         
@@ -74,58 +132,56 @@ async def list_suggestions(
         # "all" means no date filter
     
     # Build query
-    query = db.query(Suggestion).filter(Suggestion.user_id == current_user.id)
+    query = select(Suggestion).where(Suggestion.user_id == current_user.id)
     
     # Apply filters
     if status:
-        query = query.filter(Suggestion.status == status)
+        query = query.where(Suggestion.status == status)
     
     if type:
-        query = query.filter(Suggestion.type == type)
+        query = query.where(Suggestion.type == type)
     
     if priority_min is not None:
-        query = query.filter(Suggestion.priority >= priority_min)
+        query = query.where(Suggestion.priority >= priority_min)
     
     if priority_max is not None:
-        query = query.filter(Suggestion.priority <= priority_max)
+        query = query.where(Suggestion.priority <= priority_max)
     
     if start_date:
-        query = query.filter(Suggestion.scheduled_date >= start_date)
+        query = query.where(Suggestion.scheduled_date >= start_date)
     
     if end_date:
-        query = query.filter(Suggestion.scheduled_date <= end_date)
-    
-    # Order by priority (desc) and scheduled date (asc)
-    query = query.order_by(
-        Suggestion.priority.desc(),
-        Suggestion.scheduled_date.asc()
-    )
-    
-    # Apply pagination
-    suggestions = query.offset(skip).limit(limit).all()
-    
-    # Mark as viewed
-    for suggestion in suggestions:
-        if suggestion.status == "pending":
-            # Check if already viewed
-            existing_view = db.query(Interaction).filter(
-                and_(
-                    Interaction.user_id == current_user.id,
-                    Interaction.suggestion_id == suggestion.id,
-                    Interaction.action == InteractionAction.VIEWED
-                )
-            ).first()
-            
-            if not existing_view:
-                # Create viewed interaction
-                view_interaction = Interaction(
-                    user_id=current_user.id,
-                    suggestion_id=suggestion.id,
-                    action=InteractionAction.VIEWED
-                )
-                db.add(view_interaction)
+        query = query.where(Suggestion.scheduled_date <= end_date)
+    
+    # Order by priority (desc) and scheduled date (asc), id breaks ties
+    keys = [
+        (Suggestion.priority, True),
+        (Suggestion.scheduled_date, False),
+        (Suggestion.id, False)
+    ]
+    query = query.order_by(*keyset_order(keys))
+    
+    # Apply pagination: seek past the cursor through
+    # idx_user_priority_scheduled, which also serves the order, fetching one
+    # extra row to know whether there is a next page
+    if cursor:
+        after = decode_cursor(cursor, (int, datetime.fromisoformat, UUID))
+        query = query.where(keyset_condition(keys, after))
+    else:
+        query = query.offset(skip)
+    suggestions = (await db.scalars(query.limit(limit + 1))).all()
+    
+    if len(suggestions) > limit:
+        suggestions = suggestions[:limit]
+        last = suggestions[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            [last.priority, last.scheduled_date, last.id]
+        )
     
-    db.commit()
+    # Mark pending suggestions as viewed once the response is sent
+    pending_ids = [s.id for s in suggestions if s.status == "pending"]
+    if pending_ids:
+        background_tasks.add_task(mark_suggestions_viewed, current_user.id, pending_ids)
     
     return suggestions
 
@@ -133,65 +189,78 @@ async def list_suggestions(
 @router.get("/stats")
 async def get_suggestion_stats(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get suggestion statistics for the current user."""
     # Get total counts by status
-    total_suggestions = db.query(Suggestion).filter(
-        Suggestion.user_id == current_user.id
-    ).count()
+    total_suggestions = await db.scalar(
+        select(func.count(Suggestion.id)).where(Suggestion.user_id == current_user.id)
+    )
     
-    pending_suggestions = db.query(Suggestion).filter(
-        Suggestion.user_id == current_user.id,
-        Suggestion.status == "pending"
-    ).count()
+    pending_suggestions = await db.scalar(
+        select(func.count(Suggestion.id)).where(
+            Suggestion.user_id == current_user.id,
+            Suggestion.status == "pending"
+        )
+    )
     
-    accepted_suggestions = db.query(Suggestion).filter(
-        Suggestion.user_id == current_user.id,
-        Suggestion.status == "accepted"
-    ).count()
+    accepted_suggestions = await db.scalar(
+        select(func.count(Suggestion.id)).where(
+            Suggestion.user_id == current_user.id,
+            Suggestion.status == "accepted"
+        )
+    )
     
-    rejected_suggestions = db.query(Suggestion).filter(
-        Suggestion.user_id == current_user.id,
-        Suggestion.status == "rejected"
-    ).count()
+    rejected_suggestions = await db.scalar(
+        select(func.count(Suggestion.id)).where(
+            Suggestion.user_id == current_user.id,
+            Suggestion.status == "rejected"
+        )
+    )
     
-    executed_suggestions = db.query(Suggestion).filter(
-        Suggestion.user_id == current_user.id,
-        Suggestion.status == "executed"
-    ).count()
+    executed_suggestions = await db.scalar(
+        select(func.count(Suggestion.id)).where(
+            Suggestion.user_id == current_user.id,
+            Suggestion.status == "executed"
+        )
+    )
     
     # Calculate rates
     acceptance_rate = (accepted_suggestions + executed_suggestions) / total_suggestions if total_suggestions > 0 else 0.0
     execution_rate = executed_suggestions / total_suggestions if total_suggestions > 0 else 0.0
     
     # Count by type
-    from sqlalchemy import func
-    type_counts = db.query(
-        Suggestion.type,
-        func.count(Suggestion.id).label('count')
-    ).filter(
-        Suggestion.user_id == current_user.id
-    ).group_by(Suggestion.type).all()
+    type_counts = (await db.execute(
+        select(
+            Suggestion.type,
+            func.count(Suggestion.id).label('count')
+        ).where(
+            Suggestion.user_id == current_user.id
+        ).group_by(Suggestion.type)
+    )).all()
     
     by_type = {str(t): c for t, c in type_counts}
     
     # Count by status
-    status_counts = db.query(
-        Suggestion.status,
-        func.count(Suggestion.id).label('count')
-    ).filter(
-        Suggestion.user_id == current_user.id
-    ).group_by(Suggestion.status).all()
+    status_counts = (await db.execute(
+        select(
+            Suggestion.status,
+            func.count(Suggestion.id).label('count')
+        ).where(
+            Suggestion.user_id == current_user.id
+        ).group_by(Suggestion.status)
+    )).all()
     
     by_status = {str(s): c for s, c in status_counts}
     
     # Calculate average time to action
-    executed_with_time = db.query(Suggestion).filter(
-        Suggestion.user_id == current_user.id,
-        Suggestion.status == "executed",
-        Suggestion.executed_at.isnot(None)
-    ).all()
+    executed_with_time = (await db.scalars(
+        select(Suggestion).where(
+            Suggestion.user_id == current_user.id,
+            Suggestion.status == "executed",
+            Suggestion.executed_at.isnot(None)
+        )
+    )).all()
     
     if executed_with_time:
         total_hours = sum(
@@ -212,10 +281,12 @@ async def get_suggestion_stats(
     days_active = (now - created_at).days + 1
     
     # Calculate total actions (all interactions except VIEWED)
-    total_actions = db.query(Interaction).filter(
-        Interaction.user_id == current_user.id,
-        Interaction.action != InteractionAction.VIEWED
-    ).count()
+    total_actions = await db.scalar(
+        select(func.count(Interaction.id)).where(
+            Interaction.user_id == current_user.id,
+            Interaction.action != InteractionAction.VIEWED
+        )
+    )
     
     # Calculate total savings (placeholder - would need real calculation)
     total_savings = 0.0
@@ -241,7 +312,7 @@ async def get_suggestion_stats(
 async def get_suggestion(
     suggestion_id: UUID,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get a specific suggestion.
@@ -257,10 +328,10 @@ async def get_suggestion(
     Raises:
         HTTPException: If suggestion not found or not owned by user
     """
-    suggestion = db.query(Suggestion).filter(
+    suggestion = await db.scalar(select(Suggestion).where(
         Suggestion.id == suggestion_id,
         Suggestion.user_id == current_user.id
-    ).first()
+    ))
     
     if not suggestion:
         raise HTTPException(
@@ -275,7 +346,7 @@ async def get_suggestion(
 async def create_suggestion(
     suggestion_data: SuggestionCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Create a new suggestion (admin/system only in production).
@@ -304,8 +375,8 @@ async def create_suggestion(
     )
     
     db.add(new_suggestion)
-    db.commit()
-    db.refresh(new_suggestion)
+    await db.commit()
+    await db.refresh(new_suggestion)
     
     return new_suggestion
 
@@ -315,7 +386,7 @@ async def update_suggestion(
     suggestion_id: UUID,
     suggestion_data: SuggestionUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Update a suggestion.
@@ -332,10 +403,10 @@ async def update_suggestion(
     Raises:
         HTTPException: If suggestion not found or not owned by user
     """
-    suggestion = db.query(Suggestion).filter(
+    suggestion = await db.scalar(select(Suggestion).where(
         Suggestion.id == suggestion_id,
         Suggestion.user_id == current_user.id
-    ).first()
+    ))
     
     if not suggestion:
         raise HTTPException(
@@ -348,8 +419,8 @@ async def update_suggestion(
     for field, value in update_dict.items():
         setattr(suggestion, field, value)
     
-    db.commit()
-    db.refresh(suggestion)
+    await db.commit()
+    await db.refresh(suggestion)
     
     return suggestion
 
@@ -359,7 +430,7 @@ async def interact_with_suggestion(
     suggestion_id: UUID,
     interaction_data: SuggestionInteraction,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Interact with a suggestion (accept, reject, snooze, execute).
@@ -376,10 +447,10 @@ async def interact_with_suggestion(
     Raises:
         HTTPException: If suggestion not found or invalid action
     """
-    suggestion = db.query(Suggestion).filter(
+    suggestion = await db.scalar(select(Suggestion).where(
         Suggestion.id == suggestion_id,
         Suggestion.user_id == current_user.id
-    ).first()
+    ))
     
     if not suggestion:
         raise HTTPException(
@@ -433,7 +504,7 @@ async def interact_with_suggestion(
         )
     
     db.add(interaction)
-    db.commit()
+    await db.commit()
     
     return {"message": message, "suggestion_id": str(suggestion_id)}
 
@@ -442,7 +513,7 @@ async def interact_with_suggestion(
 async def delete_suggestion(
     suggestion_id: UUID,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Delete a suggestion.
@@ -458,10 +529,10 @@ async def delete_suggestion(
     Raises:
         HTTPException: If suggestion not found or not owned by user
     """
-    suggestion = db.query(Suggestion).filter(
+    suggestion = await db.scalar(select(Suggestion).where(
         Suggestion.id == suggestion_id,
         Suggestion.user_id == current_user.id
-    ).first()
+    ))
     
     if not suggestion:
         raise HTTPException(
@@ -469,7 +540,7 @@ async def delete_suggestion(
             detail="Suggestion not found"
         )
     
-    db.delete(suggestion)
-    db.commit()
+    await db.delete(suggestion)
+    await db.commit()
     
     return {"message": "Suggestion deleted successfully"}
\ No newline at end of file
@@ -1,24 +1,186 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, extract
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import extract, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
 from datetime import datetime, timezone, timedelta
 from decimal import Decimal
 from uuid import UUID
+import csv
+import io
+import json
 
-from ..database import get_db
+from ..config import settings
+from ..database import get_db, AsyncSessionLocal
 from ..models import User, Transaction
 from ..schemas import (
     TransactionCreate,
     TransactionUpdate,
     TransactionResponse,
+    TransactionImportResult,
     TransactionFilter,
     TransactionAnalytics
 )
 from ..services.auth import get_current_active_user
+from ..services.incremental_analysis import incremental_analyzer
+from ..services.transaction_import import import_transactions, iterate_ndjson, iterate_rows
+from ..services.transaction_rollups import load_rollup_rows
+from ..utils.pagination import (
+    NEXT_CURSOR_HEADER,
+    encode_cursor,
+    decode_cursor,
+    keyset_condition,
+    keyset_order
+)
 
 router = APIRouter(prefix="/transactions", tags=["Transactions"])
 
+# Rows fetched per round trip by the export cursor
+EXPORT_BATCH_SIZE = 1000
+
+# Exported columns, in TransactionResponse field order
+EXPORT_COLUMNS = [
+    Transaction.id,
+    Transaction.user_id,
+    Transaction.type,
+    Transaction.amount,
+    Transaction.date,
+    Transaction.category,
+    Transaction.location,
+    Transaction.description,
+    Transaction.created_at
+]
+
+
+def resolve_date_range(
+    date_range: Optional[str],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime]
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Turn a predefined date range into start and end dates.
+    
+    Args:
+        date_range: Predefined date range (today, week, month, year, all)
+        start_date: Explicit start date (takes precedence over date_range)
+        end_date: Explicit end date (takes precedence over date_range)
+        
+    Returns:
+        Tuple of (start_date, end_date)
+    """
+    if date_range and not start_date and not end_date:
+        now = datetime.now(timezone.utc)
+        if date_range == "today":
+            start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            end_date = now.replace(hour=23, minute=59, second=59, microsecond=999999)
+        elif date_range == "week":
+            start_date = now - timedelta(days=7)
+            end_date = now
+        elif date_range == "month":
+            start_date = now - timedelta(days=30)
+            end_date = now
+        elif date_range == "year":
+            start_date = now - timedelta(days=365)
+            end_date = now
+    
+    return start_date, end_date
+
+
+def filter_transactions(
+    query,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    category: Optional[str] = None,
+    type: Optional[str] = None,
+    min_amount: Optional[Decimal] = None,
+    max_amount: Optional[Decimal] = None
+):
+    """
+    Apply the transaction listing filters to a query.
+    
+    Args:
+        query: Select statement over transactions
+        start_date: Filter transactions after this date
+        end_date: Filter transactions before this date
+        category: Filter by category
+        type: Filter by transaction type
+        min_amount: Minimum transaction amount
+        max_amount: Maximum transaction amount
+        
+    Returns:
+        Filtered select statement
+    """
+    if start_date:
+        query = query.where(Transaction.date >= start_date)
+    
+    if end_date:
+        query = query.where(Transaction.date <= end_date)
+    
+    if category:
+        query = query.where(Transaction.category == category.lower())
+    
+    if type:
+        query = query.where(Transaction.type == type.lower())
+    
+    if min_amount is not None:
+        query = query.where(Transaction.amount >= min_amount)
+    
+    if max_amount is not None:
+        query = query.where(Transaction.amount <= max_amount)
+    
+    return query
+
+
+def _export_value(value: Any) -> Any:
+    """Format a column value the way TransactionResponse serializes it."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+async def stream_transactions(query, format: str) -> AsyncIterator[str]:
+    """
+    Stream the rows of a transaction query as NDJSON or CSV.
+    
+    Rows are read through a server-side cursor, EXPORT_BATCH_SIZE at a time,
+    and each batch is written out before the next one is fetched, so memory
+    use does not grow with the number of rows. The stream uses its own
+    session because request dependencies are closed before the body is sent.
+    
+    Args:
+        query: Select statement over EXPORT_COLUMNS
+        format: "ndjson" or "csv"
+        
+    Yields:
+        str: Chunks of the export body
+    """
+    names = [column.key for column in EXPORT_COLUMNS]
+    
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+        yield buffer.getvalue()
+    
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        
+        async for rows in result.partitions():
+            buffer = io.StringIO()
+            if format == "csv":
+                writer = csv.writer(buffer)
+                for row in rows:
+                    writer.writerow([_export_value(value) for value in row])
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(
+                        {name: _export_value(value) for name, value in zip(names, row)}
+                    ))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+
 
 @router.get("/", response_model=List[TransactionResponse])
 async def list_transactions(
@@ -31,12 +193,17 @@ async def list_transactions(
     max_amount: Optional[Decimal] = Query(None, ge=0),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    response: Response = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     List user transactions with optional filters.
     
+    Pages can be walked with skip or, faster for deep pages, with the cursor
+    returned in the X-Next-Cursor header (absent on the last page).
+    
     Args:
         date_range: Predefined date range (today, week, month, year)
         start_date: Filter transactions after this date
@@ -45,8 +212,10 @@ async def list_transactions(
         type: Filter by transaction type
         min_amount: Minimum transaction amount
         max_amount: Maximum transaction amount
-        skip: Number of items to skip (pagination)
+        skip: Number of items to skip (pagination, ignored with cursor)
         limit: Number of items to return
+        cursor: Cursor of the page to fetch (from X-Next-Cursor)
+        response: Response (carries the next cursor header)
         current_user: Current authenticated user
         db: Database session
         
@@ -54,50 +223,82 @@ async def list_transactions(
         List of transactions
     """
     # Process date_range parameter
-    if date_range and not start_date and not end_date:
-        now = datetime.now(timezone.utc)
-        if date_range == "today":
-            start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            end_date = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-        elif date_range == "week":
-            start_date = now - timedelta(days=7)
-            end_date = now
-        elif date_range == "month":
-            start_date = now - timedelta(days=30)
-            end_date = now
-        elif date_range == "year":
-            start_date = now - timedelta(days=365)
-            end_date = now
+    start_date, end_date = resolve_date_range(date_range, start_date, end_date)
     
     # Build query
-    query = db.query(Transaction).filter(Transaction.user_id == current_user.id)
+    query = select(Transaction).where(Transaction.user_id == current_user.id)
     
     # Apply filters
-    if start_date:
-        query = query.filter(Transaction.date >= start_date)
+    query = filter_transactions(
+        query, start_date, end_date, category, type, min_amount, max_amount
+    )
     
-    if end_date:
-        query = query.filter(Transaction.date <= end_date)
+    # Order by date descending (id breaks ties so the order is stable)
+    keys = [(Transaction.date, True), (Transaction.id, True)]
+    query = query.order_by(*keyset_order(keys))
     
-    if category:
-        query = query.filter(Transaction.category == category.lower())
+    # Apply pagination: seek past the cursor through idx_user_date,
+    # fetching one extra row to know whether there is a next page
+    if cursor:
+        after = decode_cursor(cursor, (datetime.fromisoformat, UUID))
+        query = query.where(keyset_condition(keys, after))
+    else:
+        query = query.offset(skip)
+    transactions = (await db.scalars(query.limit(limit + 1))).all()
     
-    if type:
-        query = query.filter(Transaction.type == type.lower())
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        last = transactions[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([last.date, last.id])
     
-    if min_amount is not None:
-        query = query.filter(Transaction.amount >= min_amount)
+    return transactions
+
+
+@router.get("/export")
+async def export_transactions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    date_range: Optional[str] = Query(None, pattern="^(today|week|month|year|all)$"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    category: Optional[str] = None,
+    type: Optional[str] = None,
+    min_amount: Optional[Decimal] = Query(None, ge=0),
+    max_amount: Optional[Decimal] = Query(None, ge=0),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Export the user's transactions as a streamed NDJSON or CSV file.
     
-    if max_amount is not None:
-        query = query.filter(Transaction.amount <= max_amount)
+    Accepts the same filters as list_transactions, without a row limit.
     
-    # Order by date descending
-    query = query.order_by(Transaction.date.desc())
+    Args:
+        format: Output format (ndjson or csv)
+        date_range: Predefined date range (today, week, month, year)
+        start_date: Filter transactions after this date
+        end_date: Filter transactions before this date
+        category: Filter by category
+        type: Filter by transaction type
+        min_amount: Minimum transaction amount
+        max_amount: Maximum transaction amount
+        current_user: Current authenticated user
+        
+    Returns:
+        Streaming response with one transaction per line
+    """
+    start_date, end_date = resolve_date_range(date_range, start_date, end_date)
     
-    # Apply pagination
-    transactions = query.offset(skip).limit(limit).all()
+    query = select(*EXPORT_COLUMNS).where(Transaction.user_id == current_user.id)
+    query = filter_transactions(
+        query, start_date, end_date, category, type, min_amount, max_amount
+    )
+    query = query.order_by(Transaction.date.desc(), Transaction.id.desc())
     
-    return transactions
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_transactions(query, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="transactions.{format}"'}
+    )
 
 
 @router.get("/analytics", response_model=TransactionAnalytics)
@@ -105,7 +306,7 @@ async def get_transaction_analytics(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get transaction analytics for the current user.
@@ -125,101 +326,39 @@ async def get_transaction_analytics(
     if not start_date:
         start_date = end_date - timedelta(days=30)
     
-    # Base query
-    base_query = db.query(Transaction).filter(
-        and_(
-            Transaction.user_id == current_user.id,
-            Transaction.date >= start_date,
-            Transaction.date <= end_date
-        )
-    )
+    # Daily rollups for the range (partial edge days come from raw rows)
+    rows = await db.run_sync(load_rollup_rows, current_user.id, start_date, end_date)
     
     # Get total spent and count
-    totals = db.query(
-        func.sum(Transaction.amount).label('total'),
-        func.count(Transaction.id).label('count')
-    ).filter(
-        and_(
-            Transaction.user_id == current_user.id,
-            Transaction.date >= start_date,
-            Transaction.date <= end_date
-        )
-    ).first()
-    
-    total_spent = Decimal(str(totals.total or 0))
-    transaction_count = totals.count or 0
+    transaction_count = sum(row.count for row in rows)
+    total_spent = sum((row.amount for row in rows), Decimal('0'))
     average_transaction = total_spent / transaction_count if transaction_count > 0 else Decimal('0')
     
-    # Get spending by category
-    category_spending = db.query(
-        Transaction.category,
-        func.sum(Transaction.amount).label('total')
-    ).filter(
-        and_(
-            Transaction.user_id == current_user.id,
-            Transaction.date >= start_date,
-            Transaction.date <= end_date
-        )
-    ).group_by(Transaction.category).all()
-    
-    by_category = {cat: Decimal(str(total)) for cat, total in category_spending}
-    
-    # Get spending by type
-    type_spending = db.query(
-        Transaction.type,
-        func.sum(Transaction.amount).label('total')
-    ).filter(
-        and_(
-            Transaction.user_id == current_user.id,
-            Transaction.date >= start_date,
-            Transaction.date <= end_date
-        )
-    ).group_by(Transaction.type).all()
+    # Get spending and counts by category and by type, and the daily trend
+    by_category: Dict[str, Decimal] = {}
+    category_counts: Dict[str, int] = {}
+    by_type: Dict[str, Decimal] = {}
+    daily_totals: Dict[Any, Decimal] = {}
     
-    by_type = {t: Decimal(str(total)) for t, total in type_spending}
+    for row in rows:
+        by_category[row.category] = by_category.get(row.category, Decimal('0')) + row.amount
+        category_counts[row.category] = category_counts.get(row.category, 0) + row.count
+        by_type[row.type] = by_type.get(row.type, Decimal('0')) + row.amount
+        daily_totals[row.day] = daily_totals.get(row.day, Decimal('0')) + row.amount
     
     # Get spending trend (daily for last 30 days or less)
-    daily_spending = db.query(
-        func.date(Transaction.date).label('day'),
-        func.sum(Transaction.amount).label('total')
-    ).filter(
-        and_(
-            Transaction.user_id == current_user.id,
-            Transaction.date >= start_date,
-            Transaction.date <= end_date
-        )
-    ).group_by(
-        func.date(Transaction.date)
-    ).order_by(
-        func.date(Transaction.date)
-    ).all()
-    
     spending_trend = [
         {"date": str(day), "amount": float(total)}
-        for day, total in daily_spending
+        for day, total in sorted(daily_totals.items())
     ]
     
     # Find most frequent and expensive categories
     most_frequent_category = None
     most_expensive_category = None
     
-    if category_spending:
+    if by_category:
         # Most frequent (by count)
-        category_counts = db.query(
-            Transaction.category,
-            func.count(Transaction.id).label('count')
-        ).filter(
-            and_(
-                Transaction.user_id == current_user.id,
-                Transaction.date >= start_date,
-                Transaction.date <= end_date
-            )
-        ).group_by(Transaction.category).order_by(
-            func.count(Transaction.id).desc()
-        ).first()
-        
-        if category_counts:
-            most_frequent_category = category_counts[0]
+        most_frequent_category = max(category_counts.items(), key=lambda x: x[1])[0]
         
         # Most expensive (by total amount)
         sorted_categories = sorted(by_category.items(), key=lambda x: x[1], reverse=True)
@@ -242,7 +381,7 @@ async def get_transaction_analytics(
 async def get_transaction(
     transaction_id: UUID,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get a specific transaction.
@@ -258,10 +397,10 @@ async def get_transaction(
     Raises:
         HTTPException: If transaction not found or not owned by user
     """
-    transaction = db.query(Transaction).filter(
+    transaction = await db.scalar(select(Transaction).where(
         Transaction.id == transaction_id,
         Transaction.user_id == current_user.id
-    ).first()
+    ))
     
     if not transaction:
         raise HTTPException(
@@ -276,7 +415,7 @@ async def get_transaction(
 async def create_transaction(
     transaction_data: TransactionCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Create a new transaction.
@@ -300,11 +439,11 @@ async def create_transaction(
     )
     
     db.add(new_transaction)
-    db.commit()
-    db.refresh(new_transaction)
+    await db.commit()
+    await db.refresh(new_transaction)
     
-    # TODO: In Phase 5, trigger AI analysis here
-    # ai_engine.analyze_new_transaction(new_transaction)
+    # Re-check the user's routines once their burst of transactions settles
+    incremental_analyzer.notify(current_user.id, [new_transaction])
     
     return new_transaction
 
@@ -314,7 +453,7 @@ async def update_transaction(
     transaction_id: UUID,
     transaction_data: TransactionUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Update a transaction.
@@ -331,10 +470,10 @@ async def update_transaction(
     Raises:
         HTTPException: If transaction not found or not owned by user
     """
-    transaction = db.query(Transaction).filter(
+    transaction = await db.scalar(select(Transaction).where(
         Transaction.id == transaction_id,
         Transaction.user_id == current_user.id
-    ).first()
+    ))
     
     if not transaction:
         raise HTTPException(
@@ -349,8 +488,8 @@ async def update_transaction(
             value = value.lower()
         setattr(transaction, field, value)
     
-    db.commit()
-    db.refresh(transaction)
+    await db.commit()
+    await db.refresh(transaction)
     
     return transaction
 
@@ -359,7 +498,7 @@ async def update_transaction(
 async def delete_transaction(
     transaction_id: UUID,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Delete a transaction.
@@ -375,10 +514,10 @@ async def delete_transaction(
     Raises:
         HTTPException: If transaction not found or not owned by user
     """
-    transaction = db.query(Transaction).filter(
+    transaction = await db.scalar(select(Transaction).where(
         Transaction.id == transaction_id,
         Transaction.user_id == current_user.id
-    ).first()
+    ))
     
     if not transaction:
         raise HTTPException(
@@ -386,8 +525,8 @@ async def delete_transaction(
             detail="Transaction not found"
         )
     
-    db.delete(transaction)
-    db.commit()
+    await db.delete(transaction)
+    await db.commit()
     
     return {"message": "Transaction deleted successfully"}
 
@@ -396,7 +535,7 @@ async def delete_transaction(
 async def create_bulk_transactions(
     transactions: List[TransactionCreate],
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Create multiple transactions at once.
@@ -430,10 +569,61 @@ async def create_bulk_transactions(
         db.add(new_transaction)
         created_transactions.append(new_transaction)
     
-    db.commit()
+    # IDs and created_at are filled in by the flush and stay loaded after
+    # commit, so no per-row refresh is needed
+    await db.commit()
+    incremental_analyzer.notify(current_user.id, created_transactions)
     
-    # Refresh all transactions
-    for transaction in created_transactions:
-        db.refresh(transaction)
+    return created_transactions
+
+
+@router.post("/import", response_model=TransactionImportResult)
+async def import_transaction_rows(
+    request: Request,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Import many transactions at once (e.g. from a bank feed).
+    
+    The body is either a JSON array of transactions (up to
+    TRANSACTION_IMPORT_MAX_ROWS) or, with Content-Type application/x-ndjson,
+    one transaction per line of any length, read as it is streamed in.
+    Invalid rows are reported by position and do not stop the import.
+    
+    Args:
+        request: Incoming request (body read directly)
+        current_user: Current authenticated user
+        db: Database session
+        
+    Returns:
+        Import results with created IDs and per-row errors
+        
+    Raises:
+        HTTPException: If the body is not a JSON array or has too many rows
+    """
+    content_type = request.headers.get("content-type", "")
+    
+    if "ndjson" in content_type:
+        rows = iterate_ndjson(request.stream())
+    else:
+        try:
+            values = await request.json()
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Body must be a JSON array or NDJSON"
+            )
+        if not isinstance(values, list):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Body must be a JSON array or NDJSON"
+            )
+        if len(values) > settings.transaction_import_max_rows:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Maximum {settings.transaction_import_max_rows} transactions per JSON import; use NDJSON for larger imports"
+            )
+        rows = iterate_rows(values)
     
-    return created_transactions
\ No newline at end of file
+    return await import_transactions(db, current_user.id, rows)
\ No newline at end of file
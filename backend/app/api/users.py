@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from sqlalchemy.orm.attributes import flag_modified
-from typing import Dict, Any
+from typing import Dict, Any, List
+from uuid import UUID
 from datetime import datetime, timezone, timedelta
 import json
 
 from ..database import get_db
-from ..models import User, Profile, Transaction, Suggestion, Interaction
+from ..models import User, Profile, Transaction, Suggestion, Interaction, AnalysisJob
 from ..schemas import (
     ProfileCreate,
     ProfileUpdate,
@@ -14,10 +17,14 @@ from ..schemas import (
     PreferencesUpdate,
     UserWithProfile,
     UserStats,
-    UserResponse
+    UserResponse,
+    AnalysisJobResponse
 )
 from ..services.auth import get_current_active_user
-from ..services.ai_engine import AIEngine
+from ..services.analysis_jobs import enqueue_analysis_job
+
+# Response header carrying the ID of a queued analysis job
+ANALYSIS_JOB_HEADER = "X-Analysis-Job-Id"
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -41,7 +48,7 @@ async def get_current_user_info(
 @router.get("/me/profile", response_model=UserWithProfile)
 async def get_user_profile(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get current user with profile information.
@@ -54,9 +61,11 @@ async def get_user_profile(
         User with profile information
     """
     # Load profile relationship
-    user_with_profile = db.query(User).filter(
-        User.id == current_user.id
-    ).first()
+    user_with_profile = await db.scalar(
+        select(User).options(selectinload(User.profile)).where(
+            User.id == current_user.id
+        )
+    )
     
     return user_with_profile
 
@@ -65,7 +74,7 @@ async def get_user_profile(
 async def create_user_profile(
     profile_data: ProfileCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Create or update user profile.
@@ -79,17 +88,17 @@ async def create_user_profile(
         Created/updated profile
     """
     # Check if profile already exists
-    existing_profile = db.query(Profile).filter(
+    existing_profile = await db.scalar(select(Profile).where(
         Profile.user_id == current_user.id
-    ).first()
+    ))
     
     if existing_profile:
         # Update existing profile
         for field, value in profile_data.dict(exclude_unset=True).items():
             setattr(existing_profile, field, value)
         existing_profile.updated_at = datetime.now(timezone.utc)
-        db.commit()
-        db.refresh(existing_profile)
+        await db.commit()
+        await db.refresh(existing_profile)
         return existing_profile
     else:
         # This shouldn't happen as profile is created during registration
@@ -99,22 +108,27 @@ async def create_user_profile(
             **profile_data.dict()
         )
         db.add(new_profile)
-        db.commit()
-        db.refresh(new_profile)
+        await db.commit()
+        await db.refresh(new_profile)
         return new_profile
 
 
 @router.put("/me/profile", response_model=ProfileResponse)
 async def update_user_profile(
     profile_data: ProfileUpdate,
+    response: Response,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Update user profile.
     
+    When important fields change, an AI analysis job is queued and its ID is
+    returned in the X-Analysis-Job-Id header.
+    
     Args:
         profile_data: Profile update data
+        response: Response (carries the analysis job header)
         current_user: Current authenticated user
         db: Database session
         
@@ -122,9 +136,9 @@ async def update_user_profile(
         Updated profile
     """
     # Get existing profile
-    profile = db.query(Profile).filter(
+    profile = await db.scalar(select(Profile).where(
         Profile.user_id == current_user.id
-    ).first()
+    ))
     
     if not profile:
         raise HTTPException(
@@ -155,8 +169,8 @@ async def update_user_profile(
         setattr(profile, field, new_value)
     
     profile.updated_at = datetime.now(timezone.utc)
-    db.commit()
-    db.refresh(profile)
+    await db.commit()
+    await db.refresh(profile)
     
     # Create audit transaction if important fields changed
     if important_changes:
@@ -173,33 +187,11 @@ async def update_user_profile(
             })
         )
         db.add(audit_transaction)
-        db.commit()
+        await db.commit()
         
-        # Trigger AI analysis for new suggestions
-        try:
-            ai_engine = AIEngine(db)
-            new_suggestions = ai_engine.analyze_user(current_user)
-            
-            # Save new suggestions
-            for suggestion_data in new_suggestions:
-                # Check if similar suggestion already exists
-                existing = db.query(Suggestion).filter(
-                    Suggestion.user_id == current_user.id,
-                    Suggestion.content == suggestion_data['content'],
-                    Suggestion.status.in_(['pending', 'accepted'])
-                ).first()
-                
-                if not existing:
-                    suggestion = Suggestion(
-                        user_id=current_user.id,
-                        **suggestion_data
-                    )
-                    db.add(suggestion)
-            
-            db.commit()
-            print(f"Generated {len(new_suggestions)} new suggestions after profile update")
-        except Exception as e:
-            print(f"Error running AI analysis after profile update: {e}")
+        # Analyze in the background; the client can poll the job
+        job = await enqueue_analysis_job(db, current_user.id, "profile_update")
+        response.headers[ANALYSIS_JOB_HEADER] = str(job.id)
     
     # Debug after save
     print(f"Profile after save - name: {profile.name}, phone: {profile.phone}")
@@ -210,7 +202,7 @@ async def update_user_profile(
 @router.get("/me/preferences", response_model=Dict[str, Any])
 async def get_user_preferences(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get user preferences.
@@ -222,9 +214,9 @@ async def get_user_preferences(
     Returns:
         User preferences
     """
-    profile = db.query(Profile).filter(
+    profile = await db.scalar(select(Profile).where(
         Profile.user_id == current_user.id
-    ).first()
+    ))
     
     if not profile:
         raise HTTPException(
@@ -238,23 +230,28 @@ async def get_user_preferences(
 @router.put("/me/preferences", response_model=Dict[str, Any])
 async def update_user_preferences(
     preferences: PreferencesUpdate,
+    response: Response,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Update user preferences.
     
+    When important preferences change, an AI analysis job is queued and its
+    ID is returned in the X-Analysis-Job-Id header.
+    
     Args:
         preferences: Preferences update data
+        response: Response (carries the analysis job header)
         current_user: Current authenticated user
         db: Database session
         
     Returns:
         Updated preferences
     """
-    profile = db.query(Profile).filter(
+    profile = await db.scalar(select(Profile).where(
         Profile.user_id == current_user.id
-    ).first()
+    ))
     
     if not profile:
         raise HTTPException(
@@ -283,8 +280,8 @@ async def update_user_preferences(
     # Debug log
     print(f"Updating preferences for user {current_user.username}: {current_prefs}")
     
-    db.commit()
-    db.refresh(profile)
+    await db.commit()
+    await db.refresh(profile)
     
     # Check if important preferences changed
     important_pref_changes = []
@@ -295,7 +292,7 @@ async def update_user_preferences(
     if old_prefs.get('notification_preferences') != current_prefs.get('notification_preferences'):
         important_pref_changes.append('notification_preferences')
     
-    # Create audit transaction and trigger AI if preferences changed significantly
+    # Create audit transaction and queue AI analysis if preferences changed significantly
     if important_pref_changes:
         audit_transaction = Transaction(
             user_id=current_user.id,
@@ -310,39 +307,79 @@ async def update_user_preferences(
             })
         )
         db.add(audit_transaction)
-        db.commit()
+        await db.commit()
         
-        # Trigger AI analysis
-        try:
-            ai_engine = AIEngine(db)
-            new_suggestions = ai_engine.analyze_user(current_user)
-            
-            for suggestion_data in new_suggestions:
-                existing = db.query(Suggestion).filter(
-                    Suggestion.user_id == current_user.id,
-                    Suggestion.content == suggestion_data['content'],
-                    Suggestion.status.in_(['pending', 'accepted'])
-                ).first()
-                
-                if not existing:
-                    suggestion = Suggestion(
-                        user_id=current_user.id,
-                        **suggestion_data
-                    )
-                    db.add(suggestion)
-            
-            db.commit()
-            print(f"Generated {len(new_suggestions)} new suggestions after preferences update")
-        except Exception as e:
-            print(f"Error running AI analysis after preferences update: {e}")
+        # Analyze in the background; the client can poll the job
+        job = await enqueue_analysis_job(db, current_user.id, "preferences_update")
+        response.headers[ANALYSIS_JOB_HEADER] = str(job.id)
     
     return profile.preferences_json
 
 
+@router.get("/me/analysis-jobs", response_model=List[AnalysisJobResponse])
+async def list_analysis_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    List the user's most recent AI analysis jobs.
+    
+    Args:
+        limit: Number of items to return
+        current_user: Current authenticated user
+        db: Database session
+        
+    Returns:
+        List of analysis jobs, newest first
+    """
+    jobs = await db.scalars(
+        select(AnalysisJob).where(
+            AnalysisJob.user_id == current_user.id
+        ).order_by(AnalysisJob.created_at.desc()).limit(limit)
+    )
+    
+    return jobs.all()
+
+
+@router.get("/me/analysis-jobs/{job_id}", response_model=AnalysisJobResponse)
+async def get_analysis_job(
+    job_id: UUID,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get the status of an AI analysis job.
+    
+    Args:
+        job_id: Job ID (from the X-Analysis-Job-Id header)
+        current_user: Current authenticated user
+        db: Database session
+        
+    Returns:
+        Analysis job details
+        
+    Raises:
+        HTTPException: If job not found or not owned by user
+    """
+    job = await db.scalar(select(AnalysisJob).where(
+        AnalysisJob.id == job_id,
+        AnalysisJob.user_id == current_user.id
+    ))
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Analysis job not found"
+        )
+    
+    return job
+
+
 @router.get("/me/stats", response_model=UserStats)
 async def get_user_stats(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get user statistics.
@@ -364,29 +401,35 @@ async def get_user_stats(
     days_active = (now - created_at).days + 1
     
     # Get interaction counts
-    total_interactions = db.query(Interaction).filter(
-        Interaction.user_id == current_user.id
-    ).count()
+    total_interactions = await db.scalar(
+        select(func.count(Interaction.id)).where(Interaction.user_id == current_user.id)
+    )
     
     # Get suggestion counts
-    total_suggestions = db.query(Suggestion).filter(
-        Suggestion.user_id == current_user.id
-    ).count()
+    total_suggestions = await db.scalar(
+        select(func.count(Suggestion.id)).where(Suggestion.user_id == current_user.id)
+    )
     
-    accepted_suggestions = db.query(Suggestion).filter(
-        Suggestion.user_id == current_user.id,
-        Suggestion.status == "accepted"
-    ).count()
+    accepted_suggestions = await db.scalar(
+        select(func.count(Suggestion.id)).where(
+            Suggestion.user_id == current_user.id,
+            Suggestion.status == "accepted"
+        )
+    )
     
-    rejected_suggestions = db.query(Suggestion).filter(
-        Suggestion.user_id == current_user.id,
-        Suggestion.status == "rejected"
-    ).count()
+    rejected_suggestions = await db.scalar(
+        select(func.count(Suggestion.id)).where(
+            Suggestion.user_id == current_user.id,
+            Suggestion.status == "rejected"
+        )
+    )
     
-    executed_suggestions = db.query(Suggestion).filter(
-        Suggestion.user_id == current_user.id,
-        Suggestion.status == "executed"
-    ).count()
+    executed_suggestions = await db.scalar(
+        select(func.count(Suggestion.id)).where(
+            Suggestion.user_id == current_user.id,
+            Suggestion.status == "executed"
+        )
+    )
     
     # Calculate acceptance rate
     if total_suggestions > 0:
@@ -395,26 +438,29 @@ async def get_user_stats(
         acceptance_rate = 0.0
     
     # Get most common suggestion type
-    from sqlalchemy import func
-    most_common_type_result = db.query(
-        Suggestion.type,
-        func.count(Suggestion.type).label('count')
-    ).filter(
-        Suggestion.user_id == current_user.id
-    ).group_by(
-        Suggestion.type
-    ).order_by(
-        func.count(Suggestion.type).desc()
-    ).first()
+    most_common_type_result = (await db.execute(
+        select(
+            Suggestion.type,
+            func.count(Suggestion.type).label('count')
+        ).where(
+            Suggestion.user_id == current_user.id
+        ).group_by(
+            Suggestion.type
+        ).order_by(
+            func.count(Suggestion.type).desc()
+        ).limit(1)
+    )).first()
     
     most_common_suggestion_type = most_common_type_result[0] if most_common_type_result else None
     
     # Get last activity
-    last_interaction = db.query(Interaction).filter(
-        Interaction.user_id == current_user.id
-    ).order_by(
-        Interaction.timestamp.desc()
-    ).first()
+    last_interaction = await db.scalar(
+        select(Interaction).where(
+            Interaction.user_id == current_user.id
+        ).order_by(
+            Interaction.timestamp.desc()
+        ).limit(1)
+    )
     
     last_activity = last_interaction.timestamp if last_interaction else current_user.created_at
     
@@ -434,7 +480,7 @@ async def get_user_stats(
 @router.delete("/me", response_model=Dict[str, str])
 async def delete_user_account(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Delete user account and all associated data.
@@ -455,12 +501,12 @@ async def delete_user_account(
     """
     try:
         # Delete user (cascades will handle related data)
-        db.delete(current_user)
-        db.commit()
+        await db.delete(current_user)
+        await db.commit()
         
         return {"message": "Account successfully deleted"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to delete account"
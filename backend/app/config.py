@@ -16,12 +16,33 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = "sqlite:///./concierge.db"
+    db_pool_size: int = 5  # Connections kept open per engine
+    db_max_overflow: int = 10  # Extra connections allowed under load
+    db_pool_timeout: int = 30  # Seconds to wait for a free connection
+    db_pool_recycle: int = 1800  # Seconds before a connection is replaced
+    db_pool_pre_ping: bool = True  # Check connections before handing them out
+    guid_storage: str = "char"  # "char" (CHAR(36)) or "binary" (BINARY(16)) UUIDs outside PostgreSQL; migrations follow it
+    
+    # SQLite tuning (applied on every new connection)
+    sqlite_journal_mode: str = "WAL"  # Readers no longer block the writer
+    sqlite_synchronous: str = "NORMAL"  # Safe with WAL, far fewer fsyncs
+    sqlite_mmap_size: int = 268435456  # 256 MB memory-mapped I/O
+    sqlite_cache_size: int = -64000  # Negative = KiB, i.e. ~64 MB page cache
+    sqlite_busy_timeout_ms: int = 5000  # Wait for locks instead of failing
     
     # Security
     secret_key: str = "your-secret-key-here-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     refresh_token_expire_days: int = 7
+    auth_user_cache_ttl_seconds: int = 30  # 0 disables the authenticated user cache
+    auth_user_cache_max_entries: int = 10000
+    bcrypt_rounds: int = 12  # Cost of new password hashes (each +1 doubles the time)
+    password_hash_workers: int = 4  # Threads hashing/verifying passwords off the event loop
+    
+    # Transaction import
+    transaction_import_max_rows: int = 50000  # Rows per JSON array import (NDJSON bodies are unbounded)
+    transaction_import_batch_size: int = 1000  # Rows inserted per executemany and commit
     
     # CORS
     cors_origins: List[str] = ["http://localhost:3000", "http://localhost:5173"]
@@ -29,14 +50,56 @@ class Settings(BaseSettings):
     # AI Engine
     ai_engine_enabled: bool = True
     suggestion_generation_interval_hours: int = 6
+    analysis_scheduler_enabled: bool = True  # Run the fleet-wide analysis every interval from the app
+    analysis_scheduler_shards: int = 24  # Slices of users analyzed one at a time across the interval
+    analysis_scheduler_poll_seconds: float = 60  # Lease renewal and due-shard check period
+    analysis_scheduler_lease_seconds: int = 180  # Leader lease; another process takes over after it expires
+    ai_batch_concurrency: int = 10  # Users analyzed in parallel (concurrent LLM calls)
+    ai_batch_write_size: int = 50  # Users persisted per writer commit
+    ai_batch_queue_size: int = 200  # Max analyzed users waiting for the writer
+    ai_batch_prepare_size: int = 500  # Users loaded, and run through recurrence detection, together
+    incremental_analysis_enabled: bool = True  # Re-check routines as transactions arrive
+    incremental_analysis_debounce_seconds: float = 10  # Quiet time before a user's new transactions are analyzed
+    incremental_analysis_max_delay_seconds: float = 60  # Upper bound on that wait during steady streams
+    incremental_analysis_drain_seconds: float = 10  # Shutdown time given to users still pending
+    feature_store_window_days: int = 180  # Transactions summarized in each user's feature vector
+    feature_store_max_age_hours: int = 24  # Vectors are rebuilt after this so old transactions leave the window
+    analysis_job_concurrency: int = 4  # Queued analyses (profile/preferences updates) run at once
+    analysis_job_poll_seconds: float = 2  # How often the worker looks for due jobs
+    analysis_job_max_attempts: int = 3
+    analysis_job_retry_backoff_seconds: int = 30  # Doubles after each failed attempt
+    analysis_job_lease_seconds: int = 300  # Running jobs older than this are retried (crashed worker)
     
     # LLM Configuration (Claude/Anthropic)
     anthropic_api_key: str = os.getenv("ANTHROPIC_API_KEY", "")
     llm_model: str = "claude-3-7-sonnet-20250219"  # Latest Sonnet 3.7 - good balance
     llm_max_tokens: int = 1000
     llm_temperature: float = 0.7
+    llm_prompt_caching: bool = True  # Mark the static system prompt as a prompt cache breakpoint
+    llm_context_token_budget: int = 400  # Estimated tokens of user context per prompt; low-value sections are trimmed beyond it
     use_llm_for_suggestions: bool = True  # Toggle between LLM and rule-based
     
+    # LLM HTTP client (one pooled keep-alive client shared by all calls)
+    llm_http2: bool = True  # Requires the `h2` package (httpx[http2])
+    llm_timeout_seconds: float = 30.0
+    llm_connect_timeout_seconds: float = 10.0
+    llm_max_connections: int = 20
+    llm_max_keepalive_connections: int = 10
+    llm_keepalive_expiry_seconds: float = 30.0
+    
+    # LLM response cache (skips Claude when the prompt has not changed)
+    llm_cache_enabled: bool = True
+    llm_cache_path: str = "./llm_cache.sqlite3"
+    llm_cache_ttl_hours: int = 24
+    llm_cache_max_entries: int = 50000
+    
+    # Fleet-wide runs through the Message Batches API instead of one call per user
+    llm_batch_mode: bool = False
+    llm_batch_max_requests: int = 10000  # Users per batch job
+    llm_batch_poll_seconds: float = 60  # Longest wait between job status checks
+    llm_batch_timeout_hours: float = 24  # Jobs still running after this are canceled
+    llm_batch_transport: str = "anthropic"  # "local": in-process fake batch server (development/tests)
+    
     # Rate Limiting
     rate_limit_per_minute: int = 60
     
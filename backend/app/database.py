@@ -1,33 +1,157 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from typing import AsyncGenerator
 
 from .config import settings
 
-# Create engine
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {}
-)
+# Async drivers used by the API for each database backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def get_async_database_url(database_url: str) -> str:
+    """
+    Get the async-driver variant of a database URL.
+
+    Args:
+        database_url: Database URL (e.g. sqlite:///./concierge.db)
+
+    Returns:
+        str: Same URL using the async driver (e.g. sqlite+aiosqlite:///./concierge.db)
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        return database_url
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def get_engine_options(database_url: str) -> dict:
+    """
+    Get the connection pool options for an engine.
+
+    In-memory SQLite databases use a single shared connection, so pool sizing
+    does not apply to them.
+
+    Args:
+        database_url: Database URL
+
+    Returns:
+        dict: Keyword arguments for create_engine / create_async_engine
+    """
+    url = make_url(database_url)
+    options = {"pool_pre_ping": settings.db_pool_pre_ping}
+
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            return options
+        if url.get_driver_name() == "aiosqlite":
+            # aiosqlite defaults to NullPool (a new connection per checkout)
+            options["poolclass"] = AsyncAdaptedQueuePool
+
+    options.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle
+    )
+    return options
+
+
+def configure_sqlite_pragmas(target_engine: Engine) -> None:
+    """
+    Apply the SQLite tuning pragmas to every new connection of an engine.
+
+    WAL lets readers work while a write is in progress, and the busy timeout
+    makes concurrent writers wait for the lock instead of failing with
+    "database is locked".
+
+    Args:
+        target_engine: Synchronous engine (use async_engine.sync_engine for async engines)
+    """
+    if target_engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(target_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+            cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+            cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+            cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+            cursor.execute(f"PRAGMA cache_size={int(settings.sqlite_cache_size)}")
+        finally:
+            cursor.close()
+
+
+# Create engine (scripts, AI engine and background jobs)
+engine = create_engine(settings.database_url, **get_engine_options(settings.database_url))
+configure_sqlite_pragmas(engine)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create async engine (API routers)
+async_database_url = get_async_database_url(settings.database_url)
+async_engine = create_async_engine(async_database_url, **get_engine_options(async_database_url))
+configure_sqlite_pragmas(async_engine.sync_engine)
+
+# Create AsyncSessionLocal class
+# Objects stay loaded after commit: lazy refreshes are not possible with async IO
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Create Base class
 Base = declarative_base()
 
 
+def check_missing_columns(target_engine: Engine) -> None:
+    """
+    Refuse to run against existing tables that lack columns of the models.
+
+    create_all only creates missing tables, so a database that has not run
+    the migrations adding a column would fail on every query of its table.
+
+    Args:
+        target_engine: Application database engine
+
+    Raises:
+        RuntimeError: If a table of the database lacks a model column
+    """
+    inspector = inspect(target_engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = [
+        f"{table.name}.{column}"
+        for table in Base.metadata.sorted_tables if table.name in existing_tables
+        for column in sorted(
+            set(table.columns.keys()) - {column['name'] for column in inspector.get_columns(table.name)}
+        )
+    ]
+    if missing:
+        raise RuntimeError(
+            f"The database is missing columns {', '.join(missing)}. Run `alembic upgrade head`."
+        )
+
+
 # Dependency to get DB session
-def get_db() -> Generator[Session, None, None]:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
-    Get database session.
-    
+    Get async database session.
+
     Yields:
-        Session: Database session
+        AsyncSession: Database session
     """
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -3,17 +3,56 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from .config import settings
-from .database import engine, Base
+from .database import engine, async_engine, Base, SessionLocal, check_missing_columns
 from .api import auth, users, suggestions, transactions, analytics, interactions
+from .api.users import ANALYSIS_JOB_HEADER
+from .services.analysis_jobs import analysis_job_worker
+from .services.incremental_analysis import incremental_analyzer
+from .services.llm_service import llm_service
+from .services.occasions import backfill_occasions_if_empty
+from .services.scheduler import analysis_scheduler
+from .services.transaction_rollups import backfill_rollups_if_empty
+from .utils.database_types import check_guid_storage
+from .utils.security import password_hash_pool
+from .utils.pagination import NEXT_CURSOR_HEADER
 
 
 # Create all tables on startup
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    check_guid_storage(engine)
+    check_missing_columns(engine)
     Base.metadata.create_all(bind=engine)
+    
+    # Build transaction rollups and the occasion index for data created before they existed
+    db = SessionLocal()
+    try:
+        backfill_rollups_if_empty(db)
+        backfill_occasions_if_empty(db)
+    finally:
+        db.close()
+    
+    # Re-check routines as new transactions arrive
+    if settings.ai_engine_enabled and settings.incremental_analysis_enabled:
+        incremental_analyzer.start()
+    
+    # Run queued AI analyses (profile and preferences updates)
+    if settings.ai_engine_enabled:
+        analysis_job_worker.start()
+    
+    # Periodic fleet-wide analysis (only the lease holder does the work)
+    if settings.ai_engine_enabled and settings.analysis_scheduler_enabled:
+        analysis_scheduler.start()
+    
     yield
     # Shutdown
+    await analysis_scheduler.stop()
+    await analysis_job_worker.stop()
+    await incremental_analyzer.stop()
+    await llm_service.aclose()
+    password_hash_pool.shutdown()
+    await async_engine.dispose()
 
 
 # Create FastAPI app
@@ -31,6 +70,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, ANALYSIS_JOB_HEADER],
 )
 
 
@@ -46,7 +86,12 @@ async def health_check():
     return {
         "status": "healthy",
         "app_name": settings.app_name,
-        "version": settings.app_version
+        "version": settings.app_version,
+        "password_hashing": password_hash_pool.stats(),
+        "incremental_analysis": incremental_analyzer.stats(),
+        "analysis_jobs": analysis_job_worker.stats(),
+        "analysis_scheduler": analysis_scheduler.stats(),
+        "llm_usage": llm_service.usage_stats()
     }
 
 
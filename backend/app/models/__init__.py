@@ -4,6 +4,12 @@ from .profile import Profile
 from .transaction import Transaction
 from .suggestion import Suggestion, SuggestionStatus, SuggestionType
 from .interaction import Interaction, InteractionAction
+from .transaction_rollup import TransactionDailyRollup
+from .analysis_job import AnalysisJob, AnalysisJobStatus
+from .analysis_run import AnalysisRun
+from .scheduler_lease import SchedulerLease
+from .user_features import UserFeatures
+from .upcoming_occasion import UpcomingOccasion
 
 __all__ = [
     "User",
@@ -13,5 +19,12 @@ __all__ = [
     "SuggestionStatus",
     "SuggestionType",
     "Interaction",
-    "InteractionAction"
+    "InteractionAction",
+    "TransactionDailyRollup",
+    "AnalysisJob",
+    "AnalysisJobStatus",
+    "AnalysisRun",
+    "SchedulerLease",
+    "UserFeatures",
+    "UpcomingOccasion"
 ]
\ No newline at end of file
@@ -0,0 +1,80 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Text, Index
+from sqlalchemy.orm import relationship
+import uuid
+from datetime import datetime, timezone
+import enum
+
+from ..database import Base
+from ..utils.database_types import GUID
+
+
+class AnalysisJobStatus(str, enum.Enum):
+    """Enumeration for analysis job status."""
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class AnalysisJob(Base):
+    """Queued AI analysis of a user, run by the background job worker."""
+    
+    __tablename__ = "analysis_jobs"
+    
+    # Primary key
+    id = Column(
+        GUID(),
+        primary_key=True,
+        default=uuid.uuid4,
+        index=True
+    )
+    
+    # Foreign key to user
+    user_id = Column(
+        GUID(),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    
+    # What triggered the analysis (profile_update, preferences_update, ...)
+    reason = Column(String(50), nullable=False)
+    
+    status = Column(
+        String(20),
+        nullable=False,
+        default="pending"
+    )
+    
+    # Retry bookkeeping
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )  # Not picked up before this time (retry backoff)
+    last_error = Column(Text, nullable=True)
+    
+    # Result
+    suggestions_created = Column(Integer, nullable=True)
+    
+    # Timestamp fields
+    created_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Relationships
+    user = relationship("User", back_populates="analysis_jobs")
+    
+    # Indexes for performance
+    __table_args__ = (
+        Index('idx_job_status_run_after', 'status', 'run_after'),
+        Index('idx_job_user_created', 'user_id', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f"<AnalysisJob(id={self.id}, user_id={self.user_id}, status={self.status}, attempts={self.attempts})>"
@@ -0,0 +1,50 @@
+from sqlalchemy import Column, String, Integer, DateTime, Index
+import uuid
+from datetime import datetime, timezone
+
+from ..database import Base
+from ..utils.database_types import GUID
+
+
+class AnalysisRun(Base):
+    """
+    Progress of one scheduled fleet-wide AI analysis.
+
+    Users are split into shard_count ranges of their IDs, analyzed one shard
+    per tick over the generation interval. next_shard is saved after every
+    shard, so a run interrupted by a restart resumes where it stopped.
+    """
+    
+    __tablename__ = "analysis_runs"
+    
+    # Primary key
+    id = Column(
+        GUID(),
+        primary_key=True,
+        default=uuid.uuid4
+    )
+    
+    status = Column(String(20), nullable=False, default="running")  # running, completed
+    shard_count = Column(Integer, nullable=False)
+    next_shard = Column(Integer, nullable=False, default=0)
+    
+    # Counters
+    users_processed = Column(Integer, nullable=False, default=0)
+    users_failed = Column(Integer, nullable=False, default=0)
+    suggestions_created = Column(Integer, nullable=False, default=0)
+    
+    # Timestamp fields
+    started_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Indexes for performance
+    __table_args__ = (
+        Index('idx_run_started', 'started_at'),
+    )
+    
+    def __repr__(self):
+        return f"<AnalysisRun(id={self.id}, status={self.status}, shard={self.next_shard}/{self.shard_count})>"
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, String, DateTime
+
+from ..database import Base
+
+
+class SchedulerLease(Base):
+    """
+    Leader lock for periodic jobs.
+
+    Every process runs the scheduler loop, but only the holder of an
+    unexpired lease does the work. The holder renews the lease on each tick;
+    if it dies, another process takes over once the lease expires.
+    """
+    
+    __tablename__ = "scheduler_leases"
+    
+    name = Column(String(100), primary_key=True)
+    holder = Column(String(255), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    
+    def __repr__(self):
+        return f"<SchedulerLease(name={self.name}, holder={self.holder}, expires_at={self.expires_at})>"
@@ -109,6 +109,8 @@ class Suggestion(Base):
         Index('idx_user_status', 'user_id', 'status'),
         Index('idx_user_scheduled', 'user_id', 'scheduled_date'),
         Index('idx_user_type', 'user_id', 'type'),
+        # Cursor pagination order of GET /suggestions (priority desc, then oldest first)
+        Index('idx_user_priority_scheduled', 'user_id', priority.desc(), 'scheduled_date', 'id'),
     )
     
     def __repr__(self):
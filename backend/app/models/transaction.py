@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Numeric, Index, Text
+from sqlalchemy import Column, String, DateTime, ForeignKey, Numeric, Index, Text, Integer, event
 from sqlalchemy.orm import relationship
 import uuid
 from datetime import datetime, timezone
@@ -53,6 +53,10 @@ class Transaction(Base):
         index=True
     )  # food, entertainment, utilities, etc.
     
+    # Calendar day of `date` as MMDD (e.g. 1225), for "same day in past
+    # years" lookups; set from `date` on every insert and update
+    month_day = Column(Integer, nullable=True)
+    
     location = Column(String(255), nullable=True)
     description = Column(String(500), nullable=False)
     metadata_json = Column(Text, nullable=True)  # JSON string for additional metadata
@@ -71,6 +75,7 @@ class Transaction(Base):
     __table_args__ = (
         Index('idx_user_date', 'user_id', 'date'),
         Index('idx_user_category', 'user_id', 'category'),
+        Index('idx_user_category_month_day', 'user_id', 'category', 'month_day'),
     )
     
     def __repr__(self):
@@ -101,4 +106,32 @@ class Transaction(Base):
             category=data.get('category'),
             location=data.get('location'),
             description=data.get('description')
-        )
\ No newline at end of file
+        )
+
+
+def month_day(value, dialect_name: str) -> int:
+    """
+    Get the MMDD number of a transaction date.
+    
+    MMDD values sort in calendar order (Feb 29 falls between Feb 28 and
+    Mar 1), so a window of days around a date is a range of them.
+    
+    Args:
+        value: Transaction date
+        dialect_name: Name of the database dialect (the day follows the
+            same convention as the daily rollups)
+        
+    Returns:
+        int: Month * 100 + day
+    """
+    from ..services.transaction_rollups import rollup_bucket
+    day, _ = rollup_bucket(value, dialect_name)
+    return day.month * 100 + day.day
+
+
+@event.listens_for(Transaction, "before_insert")
+@event.listens_for(Transaction, "before_update")
+def _set_month_day(mapper, connection, target):
+    """Keep month_day in sync with the transaction date."""
+    if target.date is not None:
+        target.month_day = month_day(target.date, connection.dialect.name)
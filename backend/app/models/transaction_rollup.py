@@ -0,0 +1,47 @@
+from sqlalchemy import Column, String, Integer, Date, ForeignKey, Numeric, Index, event
+from sqlalchemy.orm import Session
+
+from ..database import Base
+from ..utils.database_types import GUID
+
+
+class TransactionDailyRollup(Base):
+    """
+    Per-user daily rollup of transactions.
+
+    One row per (user, day, category, type, hour) with the number of
+    transactions and their total amount. Rows are kept in sync with the
+    transactions table by a session flush hook (see
+    app/services/transaction_rollups.py), so analytics can read days instead
+    of scanning raw transactions.
+    """
+
+    __tablename__ = "transaction_daily_rollups"
+
+    user_id = Column(
+        GUID(),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    day = Column(Date, primary_key=True)
+    category = Column(String(50), primary_key=True)
+    type = Column(String(50), primary_key=True)
+    hour = Column(Integer, primary_key=True)  # 0-23
+
+    txn_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Numeric(14, 2), nullable=False, default=0)
+
+    # Indexes for performance
+    __table_args__ = (
+        Index('idx_rollup_user_hour', 'user_id', 'hour'),
+    )
+
+    def __repr__(self):
+        return f"<TransactionDailyRollup(user_id={self.user_id}, day={self.day}, category={self.category}, count={self.txn_count})>"
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_transaction_rollups(session, flush_context):
+    """Apply the transaction changes of this flush to the daily rollups."""
+    from ..services.transaction_rollups import apply_flush_to_rollups
+    apply_flush_to_rollups(session)
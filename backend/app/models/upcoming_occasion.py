@@ -0,0 +1,43 @@
+from sqlalchemy import Column, String, Date, ForeignKey, Index, event
+from sqlalchemy.orm import Session
+
+from ..database import Base
+from ..utils.database_types import GUID
+
+
+class UpcomingOccasion(Base):
+    """
+    Next occurrence of a yearly profile date (own or spouse birthday).
+
+    One row per (user, kind), kept in sync with profiles by a session flush
+    hook and rolled forward once an occurrence has passed (see
+    app/services/occasions.py), so "who has an occasion in the next N days"
+    is a range scan on next_date instead of a pass over every profile.
+    """
+
+    __tablename__ = "upcoming_occasions"
+
+    user_id = Column(
+        GUID(),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    kind = Column(String(30), primary_key=True)  # birthday, spouse_birthday
+
+    original_date = Column(Date, nullable=False)
+    next_date = Column(Date, nullable=False)
+
+    # Indexes for performance
+    __table_args__ = (
+        Index('idx_occasion_next_date', 'next_date'),
+    )
+
+    def __repr__(self):
+        return f"<UpcomingOccasion(user_id={self.user_id}, kind={self.kind}, next_date={self.next_date})>"
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_upcoming_occasions(session, flush_context):
+    """Apply the profile date changes of this flush to the upcoming occasions."""
+    from ..services.occasions import apply_flush_to_occasions
+    apply_flush_to_occasions(session)
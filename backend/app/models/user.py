@@ -63,6 +63,11 @@ class User(Base):
         back_populates="user",
         cascade="all, delete-orphan"
     )
+    analysis_jobs = relationship(
+        "AnalysisJob",
+        back_populates="user",
+        cascade="all, delete-orphan"
+    )
     
     def __repr__(self):
         return f"<User(id={self.id}, username={self.username}, email={self.email})>"
\ No newline at end of file
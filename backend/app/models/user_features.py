@@ -0,0 +1,42 @@
+from sqlalchemy import Column, DateTime, ForeignKey, JSON, Boolean, event
+from sqlalchemy.orm import Session
+
+from ..database import Base
+from ..utils.database_types import GUID
+
+
+class UserFeatures(Base):
+    """
+    Precomputed feature vector of one user's recent transactions.
+
+    Holds category and type totals, per-merchant counts and inter-purchase
+    intervals, and weekday/hour histograms over a rolling window, so the AI
+    analysis reads one row per user instead of scanning raw transactions.
+    New transactions are added by a session flush hook (see
+    app/services/feature_store.py); updates and deletes mark the row stale
+    and it is rebuilt on the next read.
+    """
+
+    __tablename__ = "user_features"
+
+    user_id = Column(
+        GUID(),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+
+    # Oldest transaction date covered (naive, in the database's convention)
+    window_start = Column(DateTime, nullable=False)
+    features = Column(JSON, nullable=False)
+    stale = Column(Boolean, nullable=False, default=False)
+    computed_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<UserFeatures(user_id={self.user_id}, stale={self.stale}, computed_at={self.computed_at})>"
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_user_features(session, flush_context):
+    """Apply the transaction changes of this flush to the feature vectors."""
+    from ..services.feature_store import apply_flush_to_features
+    apply_flush_to_features(session)
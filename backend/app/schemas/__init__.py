@@ -25,6 +25,8 @@ from .transaction import (
     TransactionCreate,
     TransactionUpdate,
     TransactionResponse,
+    TransactionImportError,
+    TransactionImportResult,
     TransactionFilter,
     TransactionAnalytics
 )
@@ -47,6 +49,8 @@ from .analytics import (
     InsightReport
 )
 
+from .job import AnalysisJobResponse
+
 from .interaction import (
     InteractionBase,
     InteractionCreate,
@@ -80,6 +84,8 @@ __all__ = [
     "TransactionCreate",
     "TransactionUpdate",
     "TransactionResponse",
+    "TransactionImportError",
+    "TransactionImportResult",
     "TransactionFilter",
     "TransactionAnalytics",
     
@@ -104,5 +110,8 @@ __all__ = [
     "InteractionCreate",
     "InteractionResponse",
     "InteractionStats",
-    "InteractionFilter"
+    "InteractionFilter",
+    
+    # Job schemas
+    "AnalysisJobResponse"
 ]
\ No newline at end of file
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+from uuid import UUID
+
+
+class AnalysisJobResponse(BaseModel):
+    """Schema for analysis job status."""
+    id: UUID
+    user_id: UUID
+    reason: str
+    status: str  # pending, running, succeeded, failed
+    attempts: int
+    max_attempts: int
+    run_after: datetime
+    last_error: Optional[str] = None
+    suggestions_created: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
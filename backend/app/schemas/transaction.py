@@ -68,6 +68,21 @@ class TransactionResponse(TransactionBase):
         from_attributes = True
 
 
+class TransactionImportError(BaseModel):
+    """Validation errors of one rejected import row."""
+    row: int  # 0-based position in the request body
+    errors: List[str]
+
+
+class TransactionImportResult(BaseModel):
+    """Schema for transaction import results."""
+    received: int
+    created: int
+    failed: int
+    ids: List[UUID]  # IDs of the created transactions, in request order
+    errors: List[TransactionImportError]
+
+
 class TransactionFilter(BaseModel):
     """Schema for filtering transactions."""
     start_date: Optional[datetime] = None
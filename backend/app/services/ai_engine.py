@@ -5,8 +5,8 @@ This module contains the implementation of the AI engine that analyzes
 user data and generates proactive suggestions using either rule-based 
 logic or LLM (Claude) for more natural suggestions.
 """
-from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Optional
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Dict, Optional, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func
 import asyncio
@@ -14,7 +14,10 @@ import json
 
 from ..models import User, Profile, Transaction, Suggestion, SuggestionType, SuggestionStatus
 from ..config import settings
+from .feature_store import FeatureVector, load_features
+from .recurrence import Recurrence, detect_recurrences
 from .llm_service import llm_service
+from ..utils.dates import next_anniversary
 
 # Priority levels
 class Priority:
@@ -22,7 +25,6 @@ class Priority:
     MEDIUM = 5
     HIGH = 8
     URGENT = 10
-from ..database import SessionLocal
 
 
 class AIEngine:
@@ -31,6 +33,7 @@ class AIEngine:
     def __init__(self, db: Session):
         self.db = db
         self.use_llm = settings.use_llm_for_suggestions and bool(settings.anthropic_api_key)
+        self.use_llm_cache = True
     
     def analyze_user(self, user: User) -> List[Dict]:
         """
@@ -60,35 +63,58 @@ class AIEngine:
             suggestions.extend(pattern_suggestions)
         
         # Remove duplicates and limit suggestions
-        return self._deduplicate_suggestions(suggestions)[:10]
+        return self.finalize_suggestions(suggestions)
+    
+    @classmethod
+    def finalize_suggestions(cls, suggestions: List[Dict]) -> List[Dict]:
+        """Deduplicate, sort by priority and cap the suggestions for one user."""
+        return cls._deduplicate_suggestions(suggestions)[:10]
+    
+    def load_llm_inputs(self, user: User,
+                        features: Optional[FeatureVector] = None) -> Tuple[FeatureVector, List[Suggestion]]:
+        """
+        Load the data the LLM prompt is built from.
+        
+        Args:
+            user: User to analyze
+            features: Already loaded feature vector of the user (loaded when omitted)
+            
+        Returns:
+            Tuple of (transaction features, suggestions from the last 30 days)
+        """
+        if features is None:
+            features = load_features(self.db, user.id)
+        
+        # Get existing suggestions to avoid duplicates
+        existing_suggestions = self.db.query(Suggestion).filter(
+            Suggestion.user_id == user.id,
+            Suggestion.created_at >= datetime.now(timezone.utc) - timedelta(days=30)
+        ).all()
+        
+        return features, existing_suggestions
     
     def _generate_llm_suggestions(self, user: User) -> List[Dict]:
         """Generate suggestions using LLM (Claude)."""
         try:
-            # Get recent transactions
-            recent_transactions = self.db.query(Transaction).filter(
-                Transaction.user_id == user.id,
-                Transaction.date >= datetime.now(timezone.utc) - timedelta(days=90)
-            ).order_by(Transaction.date.desc()).limit(50).all()
-            
-            # Get existing suggestions to avoid duplicates
-            existing_suggestions = self.db.query(Suggestion).filter(
-                Suggestion.user_id == user.id,
-                Suggestion.created_at >= datetime.now(timezone.utc) - timedelta(days=30)
-            ).all()
+            features, existing_suggestions = self.load_llm_inputs(user)
             
             # Run async LLM generation
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
-            llm_suggestions = loop.run_until_complete(
-                llm_service.generate_suggestions(
-                    user, 
-                    recent_transactions, 
-                    existing_suggestions,
-                    max_suggestions=5
+            try:
+                llm_suggestions = loop.run_until_complete(
+                    llm_service.generate_suggestions(
+                        user, 
+                        features, 
+                        existing_suggestions,
+                        max_suggestions=5,
+                        use_cache=self.use_llm_cache
+                    )
                 )
-            )
-            loop.close()
+            finally:
+                # Pooled connections cannot outlive this loop
+                loop.run_until_complete(llm_service.aclose())
+                loop.close()
             
             return llm_suggestions
             
@@ -97,7 +123,8 @@ class AIEngine:
             # Fall back to rule-based
             return self._analyze_transaction_patterns(user)
     
-    def _deduplicate_suggestions(self, suggestions: List[Dict]) -> List[Dict]:
+    @staticmethod
+    def _deduplicate_suggestions(suggestions: List[Dict]) -> List[Dict]:
         """Remove duplicate suggestions based on content similarity."""
         unique_suggestions = []
         seen_contents = set()
@@ -123,6 +150,7 @@ class AIEngine:
         # Check spouse birthday
         if user.profile.spouse_birth_date and user.profile.spouse_name:
             days_until = self._days_until_birthday(user.profile.spouse_birth_date)
+            spouse_birthday = next_anniversary(user.profile.spouse_birth_date, today)
             
             if 0 < days_until <= 7:  # Within next week
                 # Check if already suggested
@@ -131,7 +159,7 @@ class AIEngine:
                         Suggestion.user_id == user.id,
                         Suggestion.type == SuggestionType.ANNIVERSARY,
                         Suggestion.status.in_(["pending", "accepted"]),
-                        Suggestion.scheduled_date == user.profile.spouse_birth_date.replace(year=today.year)
+                        Suggestion.scheduled_date == spouse_birthday
                     )
                 ).first()
                 
@@ -145,7 +173,7 @@ class AIEngine:
                                   (f"Deseja que eu reserve o {restaurant_suggestion}?" if restaurant_suggestion 
                                    else "Gostaria de fazer uma reserva em algum restaurante especial?"),
                         "priority": Priority.HIGH if days_until <= 3 else Priority.MEDIUM,
-                        "scheduled_date": user.profile.spouse_birth_date.replace(year=today.year),
+                        "scheduled_date": spouse_birthday,
                         "context_data": json.dumps({
                             "person": user.profile.spouse_name,
                             "occasion": "birthday",
@@ -162,7 +190,7 @@ class AIEngine:
                                       "Posso providenciar um buquê especial?",
                             # "category": "gift",
                             "priority": Priority.MEDIUM,
-                            "scheduled_date": (user.profile.spouse_birth_date.replace(year=today.year) - timedelta(days=1)),
+                            "scheduled_date": (spouse_birthday - timedelta(days=1)),
                             "context_data": json.dumps({
                                 "person": user.profile.spouse_name,
                                 "occasion": "birthday",
@@ -180,7 +208,7 @@ class AIEngine:
                     "content": "Amanhã é seu aniversário! 🎉 Gostaria de algumas sugestões para comemorar?",
                     # "category": "personal",
                     "priority": Priority.LOW,
-                    "scheduled_date": user.profile.birth_date.replace(year=today.year),
+                    "scheduled_date": next_anniversary(user.profile.birth_date, today),
                     "context_data": json.dumps({
                         "occasion": "user_birthday"
                     })
@@ -188,90 +216,148 @@ class AIEngine:
         
         return suggestions
     
-    def _analyze_transaction_patterns(self, user: User) -> List[Dict]:
-        """Analyze transaction patterns to identify routines."""
+    def _analyze_transaction_patterns(self, user: User,
+                                      features: Optional[FeatureVector] = None) -> List[Dict]:
+        """
+        Analyze transaction patterns to identify routines.
+        
+        Args:
+            user: User to analyze
+            features: Already loaded feature vector of the user (loaded when omitted)
+            
+        Returns:
+            List of routine suggestions
+        """
+        if features is None:
+            features = load_features(self.db, user.id)
+        
+        # Periodicity of every merchant seen at least 3 times in the feature window
+        recurrences = detect_recurrences([features], min_count=3)[user.id]
+        return self.routine_suggestions(user.id, recurrences)
+    
+    def routine_suggestions(self, user_id, recurrences: List[Recurrence]) -> List[Dict]:
+        """
+        Build the routine suggestions that are due from detected recurrences.
+        
+        Args:
+            user_id: User ID
+            recurrences: Recurrences of the user's merchants
+            
+        Returns:
+            List of routine suggestions
+        """
         suggestions = []
         today = datetime.now(timezone.utc).date()
-        thirty_days_ago = today - timedelta(days=30)
         
-        # Find recurring monthly patterns
-        monthly_patterns = self.db.query(
-            Transaction.category,
-            Transaction.description,
-            func.count(Transaction.id).label('frequency')
-        ).filter(
+        routines = [r for r in recurrences if r.is_regular]
+        if not routines:
+            return suggestions
+        
+        # Descriptions already suggested recently, loaded once for all patterns
+        recently_suggested = self._recently_suggested_descriptions(user_id, days=7)
+        
+        for recurrence in routines:
+            suggestion = self.routine_suggestion(recurrence, today, recently_suggested)
+            if suggestion:
+                suggestions.append(suggestion)
+        
+        return suggestions
+    
+    def routine_suggestion(self, recurrence: Recurrence, today,
+                           recently_suggested: set) -> Optional[Dict]:
+        """
+        Build the routine suggestion for one recurring pattern, if it is due.
+        
+        Args:
+            recurrence: Regular recurrence of a merchant
+            today: Current date
+            recently_suggested: Descriptions already suggested recently
+            
+        Returns:
+            Suggestion dictionary, or None if the routine is not due
+        """
+        description = recurrence.description
+        days_until_due = (recurrence.next_due.date() - today).days
+        
+        # Check if it's time for this recurring transaction
+        if days_until_due > 3 or description in recently_suggested:  # Within 3 days of expected
+            return None
+        
+        return {
+            "type": "routine",  # String minúscula
+            "content": f"Está na hora de {self._humanize_transaction(recurrence.category, description)}? " +
+                      f"Você costuma fazer isso a cada {round(recurrence.period_days)} dias.",
+            # "category": category,
+            "priority": Priority.LOW,
+            "scheduled_date": today,
+            "context_data": json.dumps({
+                "pattern": "recurring",
+                # "category": category,
+                "description": description,
+                "frequency": recurrence.count,
+                "median_interval_days": recurrence.period_days,
+                "interval_mad_days": recurrence.mad_days,
+                "next_due": recurrence.next_due.date().isoformat(),
+                "days_since_last": (today - recurrence.last_date.date()).days
+            })
+        }
+    
+    def _recently_suggested_descriptions(self, user_id, days: int) -> set:
+        """Get the transaction descriptions behind routine suggestions created in the last `days`."""
+        context_rows = self.db.query(Suggestion.context_data).filter(
             and_(
-                Transaction.user_id == user.id,
-                Transaction.date >= datetime.now(timezone.utc) - timedelta(days=180)  # Last 6 months
+                Suggestion.user_id == user_id,
+                Suggestion.type == SuggestionType.ROUTINE.value,
+                Suggestion.created_at >= datetime.now(timezone.utc) - timedelta(days=days),
+                Suggestion.context_data.isnot(None)
             )
-        ).group_by(
-            Transaction.category,
-            Transaction.description
-        ).having(
-            func.count(Transaction.id) >= 3  # At least 3 times
         ).all()
         
-        for category, description, frequency in monthly_patterns:
-            # Check if it's time for this recurring transaction
-            last_transaction = self.db.query(Transaction).filter(
-                and_(
-                    Transaction.user_id == user.id,
-                    Transaction.category == category,
-                    Transaction.description == description
-                )
-            ).order_by(Transaction.date.desc()).first()
-            
-            if last_transaction:
-                days_since = (today - last_transaction.date.date()).days
-                avg_interval = 180 / frequency  # Average days between transactions
-                
-                if days_since >= (avg_interval - 3):  # Within 3 days of expected
-                    # Check if already suggested recently
-                    recent_suggestion = self.db.query(Suggestion).filter(
-                        and_(
-                            Suggestion.user_id == user.id,
-                            Suggestion.type == SuggestionType.ROUTINE,
-                            Suggestion.created_at >= datetime.now(timezone.utc) - timedelta(days=7),
-                            Suggestion.metadata_json.contains({"description": description})
-                        )
-                    ).first()
-                    
-                    if not recent_suggestion:
-                        suggestions.append({
-                            "type": "routine",  # String minúscula
-                            "content": f"Está na hora de {self._humanize_transaction(category, description)}? " +
-                                      f"Você costuma fazer isso a cada {int(avg_interval)} dias.",
-                            # "category": category,
-                            "priority": Priority.LOW,
-                            "scheduled_date": today,
-                            "context_data": json.dumps({
-                                "pattern": "recurring",
-                                # "category": category,
-                                "description": description,
-                                "frequency": frequency,
-                                "average_interval_days": avg_interval,
-                                "days_since_last": days_since
-                            })
-                        })
+        descriptions = set()
+        for (context_data,) in context_rows:
+            try:
+                description = json.loads(context_data).get("description")
+            except (ValueError, AttributeError):
+                continue
+            if description:
+                descriptions.add(description)
         
-        return suggestions
+        return descriptions
     
     def _days_until_birthday(self, birth_date) -> int:
         """Calculate days until next birthday."""
         today = datetime.now(timezone.utc).date()
-        this_year_birthday = birth_date.replace(year=today.year)
+        return (next_anniversary(birth_date, today) - today).days
+    
+    def _find_anniversary_restaurant_pattern(self, user: User, special_date,
+                                             window_days: int = 3) -> Optional[str]:
+        """
+        Find the restaurant visited most around a special date in past years.
+        
+        Transactions carry their calendar day as MMDD (month_day), so the
+        days around the date in every past year are one range of the
+        (user_id, category, month_day) index, however long the history.
         
-        if this_year_birthday < today:
-            # Birthday passed this year, check next year
-            next_birthday = birth_date.replace(year=today.year + 1)
+        Args:
+            user: User to analyze
+            special_date: Date whose month and day are looked up
+            window_days: Days before and after the date to include
+            
+        Returns:
+            Restaurant description visited at least twice, or None
+        """
+        # Leap reference year, so Feb 29 is a valid date
+        reference = date(2000, special_date.month, special_date.day)
+        lower = reference - timedelta(days=window_days)
+        upper = reference + timedelta(days=window_days)
+        lower_md = lower.month * 100 + lower.day
+        upper_md = upper.month * 100 + upper.day
+        if lower.year == upper.year:
+            in_window = Transaction.month_day.between(lower_md, upper_md)
         else:
-            next_birthday = this_year_birthday
+            # Window across New Year: late December or early January
+            in_window = or_(Transaction.month_day >= lower_md, Transaction.month_day <= upper_md)
         
-        return (next_birthday - today).days
-    
-    def _find_anniversary_restaurant_pattern(self, user: User, special_date) -> Optional[str]:
-        """Find restaurants visited around special dates in the past."""
-        # Look for restaurant transactions within 3 days of the special date in previous years
         restaurants = self.db.query(
             Transaction.description,
             func.count(Transaction.id).label('visits')
@@ -279,15 +365,9 @@ class AIEngine:
             and_(
                 Transaction.user_id == user.id,
                 Transaction.category == 'restaurant',
-                or_(
-                    *[
-                        and_(
-                            Transaction.date >= datetime(year, special_date.month, special_date.day) - timedelta(days=3),
-                            Transaction.date <= datetime(year, special_date.month, special_date.day) + timedelta(days=3)
-                        )
-                        for year in range(datetime.now().year - 3, datetime.now().year)
-                    ]
-                )
+                in_window,
+                # Past years only: this year's occasion is still ahead
+                Transaction.date < datetime.now(timezone.utc) - timedelta(days=window_days)
             )
         ).group_by(Transaction.description).order_by(func.count(Transaction.id).desc()).first()
         
@@ -321,55 +401,46 @@ class AIEngine:
         return humanized.get(category, f"{category} - {description}")
 
 
+def normalize_suggestion_data(suggestion_data: Dict) -> Dict:
+    """
+    Normalize a generated suggestion so it can be stored as a Suggestion row.
+    
+    Type and status are always persisted as lowercase strings.
+    
+    Args:
+        suggestion_data: Suggestion dictionary produced by the engine
+        
+    Returns:
+        The same dictionary, normalized in place
+    """
+    # Garantir que type seja uma string minúscula
+    if hasattr(suggestion_data.get('type'), 'value'):
+        # É um objeto Enum, pegar o valor
+        suggestion_data['type'] = suggestion_data['type'].value
+    else:
+        # É uma string, garantir que seja minúscula
+        suggestion_data['type'] = str(suggestion_data['type']).lower()
+    
+    # Garantir que status seja 'pending' (minúsculo)
+    if 'status' not in suggestion_data:
+        suggestion_data['status'] = 'pending'
+    elif hasattr(suggestion_data.get('status'), 'value'):
+        suggestion_data['status'] = suggestion_data['status'].value
+    else:
+        suggestion_data['status'] = str(suggestion_data['status']).lower()
+    
+    return suggestion_data
+
+
 def run_ai_analysis_for_all_users():
     """Run AI analysis for all active users."""
-    db = SessionLocal()
+    from .batch_analysis import run_batch_analysis_sync
     
     try:
-        # Get all active users
-        users = db.query(User).filter(User.is_active == True).all()
-        
-        engine = AIEngine(db)
-        
-        for user in users:
-            print(f"\nAnalyzing user: {user.username}")
-            
-            # Generate suggestions
-            suggestions = engine.analyze_user(user)
-            
-            # Save suggestions to database
-            for suggestion_data in suggestions:
-                # Garantir que type seja uma string minúscula
-                if hasattr(suggestion_data.get('type'), 'value'):
-                    # É um objeto Enum, pegar o valor
-                    suggestion_data['type'] = suggestion_data['type'].value
-                else:
-                    # É uma string, garantir que seja minúscula
-                    suggestion_data['type'] = str(suggestion_data['type']).lower()
-                
-                # Garantir que status seja 'pending' (minúsculo)
-                if 'status' not in suggestion_data:
-                    suggestion_data['status'] = 'pending'
-                elif hasattr(suggestion_data.get('status'), 'value'):
-                    suggestion_data['status'] = suggestion_data['status'].value
-                else:
-                    suggestion_data['status'] = str(suggestion_data['status']).lower()
-                
-                suggestion = Suggestion(
-                    user_id=user.id,
-                    **suggestion_data
-                )
-                db.add(suggestion)
-                print(f"  - Generated: {suggestion_data['content'][:60]}...")
-            
-        db.commit()
-        print(f"\nAnalysis complete. Processed {len(users)} users.")
-        
+        result = run_batch_analysis_sync()
+        print(f"\nAnalysis complete. Processed {result['users_processed']} users.")
     except Exception as e:
         print(f"Error during AI analysis: {e}")
-        db.rollback()
-    finally:
-        db.close()
 
 
 if __name__ == "__main__":
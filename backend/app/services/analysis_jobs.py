@@ -0,0 +1,237 @@
+"""
+Background AI analysis jobs.
+
+Endpoints that want a user re-analyzed (profile and preferences updates)
+insert a row into the analysis_jobs table and return immediately. A worker
+running in the application's event loop claims due jobs, runs them through
+the batch analysis pipeline (LLM calls on the loop, database work in
+threads) and records the outcome. Failed jobs are retried with exponential
+backoff, and jobs left running by a crashed process are picked up again once
+their lease expires.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import AnalysisJob, AnalysisJobStatus
+from .batch_analysis import run_batch_analysis
+
+
+async def enqueue_analysis_job(db: AsyncSession, user_id: UUID, reason: str) -> AnalysisJob:
+    """
+    Queue an AI analysis of a user.
+
+    A job still waiting to start already covers any change made before it
+    runs, so it is reused instead of queueing a duplicate.
+
+    Args:
+        db: Database session (committed here)
+        user_id: User to analyze
+        reason: What triggered the analysis (e.g. profile_update)
+
+    Returns:
+        AnalysisJob: The queued job
+    """
+    job = await db.scalar(select(AnalysisJob).where(
+        AnalysisJob.user_id == user_id,
+        AnalysisJob.status == AnalysisJobStatus.PENDING.value,
+        AnalysisJob.attempts == 0
+    ).limit(1))
+
+    if job is None:
+        job = AnalysisJob(
+            user_id=user_id,
+            reason=reason,
+            status=AnalysisJobStatus.PENDING.value,
+            attempts=0,
+            max_attempts=settings.analysis_job_max_attempts
+        )
+        db.add(job)
+        await db.commit()
+
+    analysis_job_worker.wake()
+    return job
+
+
+class AnalysisJobWorker:
+    """Poll the analysis_jobs table and run due jobs concurrently."""
+
+    def __init__(self, concurrency: Optional[int] = None,
+                 poll_seconds: Optional[float] = None):
+        self.concurrency = max(1, concurrency or settings.analysis_job_concurrency)
+        self.poll_seconds = poll_seconds or settings.analysis_job_poll_seconds
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+        self._stats = {
+            "jobs_succeeded": 0,
+            "jobs_retried": 0,
+            "jobs_failed": 0
+        }
+
+    def start(self) -> None:
+        """Start the worker on the running event loop."""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop the worker.
+
+        Jobs interrupted here stay in the running state and are picked up
+        again once their lease expires.
+        """
+        if self._task is None:
+            return
+        for task in [self._task, *self._running]:
+            task.cancel()
+        await asyncio.gather(self._task, *self._running, return_exceptions=True)
+        self._task = None
+        self._running.clear()
+
+    def wake(self) -> None:
+        """Check for due jobs now instead of at the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def stats(self) -> Dict[str, int]:
+        """Get the worker counters."""
+        return {**self._stats, "jobs_running": len(self._running)}
+
+    async def _run(self) -> None:
+        """Claim due jobs while there is capacity, then wait for work."""
+        while True:
+            while len(self._running) < self.concurrency:
+                try:
+                    job = await asyncio.to_thread(self._claim_next_job)
+                except Exception as e:
+                    print(f"Error claiming analysis job: {e}")
+                    break
+                if job is None:
+                    break
+                task = asyncio.create_task(self._execute(*job))
+                self._running.add(task)
+                task.add_done_callback(self._job_done)
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _job_done(self, task: asyncio.Task) -> None:
+        self._running.discard(task)
+        # A slot is free: look for the next job right away
+        self.wake()
+
+    def _claim_next_job(self) -> Optional[tuple]:
+        """
+        Atomically move the oldest due job to running (worker thread).
+
+        Returns:
+            Tuple of (job ID, user ID, attempt number), or None if nothing is due
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.now(timezone.utc)
+            claimable = or_(
+                and_(
+                    AnalysisJob.status == AnalysisJobStatus.PENDING.value,
+                    AnalysisJob.run_after <= now
+                ),
+                and_(
+                    AnalysisJob.status == AnalysisJobStatus.RUNNING.value,
+                    AnalysisJob.started_at <= now - timedelta(seconds=settings.analysis_job_lease_seconds)
+                )
+            )
+
+            while True:
+                candidate = db.query(AnalysisJob.id).filter(claimable).order_by(
+                    AnalysisJob.run_after
+                ).limit(1).scalar()
+                if candidate is None:
+                    return None
+
+                # The status check in the UPDATE makes the claim safe when
+                # several processes poll the same table
+                claimed = db.execute(
+                    update(AnalysisJob).where(
+                        AnalysisJob.id == candidate, claimable
+                    ).values(
+                        status=AnalysisJobStatus.RUNNING.value,
+                        attempts=AnalysisJob.attempts + 1,
+                        started_at=now
+                    )
+                ).rowcount
+                db.commit()
+
+                if claimed:
+                    job = db.get(AnalysisJob, candidate)
+                    return job.id, job.user_id, job.attempts
+        finally:
+            db.close()
+
+    async def _execute(self, job_id: UUID, user_id: UUID, attempt: int) -> None:
+        """Run one claimed job and record its outcome."""
+        try:
+            result = await run_batch_analysis(user_ids=[user_id], verbose=False)
+            if result["users_failed"]:
+                raise RuntimeError("Analysis failed")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await asyncio.to_thread(self._record_failure, job_id, attempt, str(e) or type(e).__name__)
+            return
+
+        await asyncio.to_thread(self._record_success, job_id, result["suggestions_created"])
+
+    def _record_success(self, job_id: UUID, suggestions_created: int) -> None:
+        """Mark a job as succeeded (worker thread)."""
+        db = SessionLocal()
+        try:
+            db.execute(update(AnalysisJob).where(AnalysisJob.id == job_id).values(
+                status=AnalysisJobStatus.SUCCEEDED.value,
+                suggestions_created=suggestions_created,
+                last_error=None,
+                finished_at=datetime.now(timezone.utc)
+            ))
+            db.commit()
+            self._stats["jobs_succeeded"] += 1
+        finally:
+            db.close()
+
+    def _record_failure(self, job_id: UUID, attempt: int, error: str) -> None:
+        """Schedule a retry with backoff, or mark the job as failed (worker thread)."""
+        db = SessionLocal()
+        try:
+            job = db.get(AnalysisJob, job_id)
+            if job is None:
+                return
+
+            now = datetime.now(timezone.utc)
+            job.last_error = error[:1000]
+            if attempt < job.max_attempts:
+                job.status = AnalysisJobStatus.PENDING.value
+                job.run_after = now + timedelta(
+                    seconds=settings.analysis_job_retry_backoff_seconds * 2 ** (attempt - 1)
+                )
+                self._stats["jobs_retried"] += 1
+            else:
+                job.status = AnalysisJobStatus.FAILED.value
+                job.finished_at = now
+                self._stats["jobs_failed"] += 1
+            db.commit()
+            print(f"Analysis job {job_id} attempt {attempt} failed: {error}")
+        finally:
+            db.close()
+
+
+# Global analysis job worker instance
+analysis_job_worker = AnalysisJobWorker()
@@ -1,10 +1,18 @@
 from typing import Optional, Dict, Any
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timezone
+import threading
+import time
+from uuid import UUID
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
 
+from ..config import settings
 from ..database import get_db
 from ..models.user import User
 from ..utils.security import decode_token
@@ -13,9 +21,135 @@ from ..utils.security import decode_token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 
 
+@dataclass(frozen=True)
+class AuthSnapshot:
+    """Immutable copy of the users row taken when the user was authenticated."""
+    id: UUID
+    username: str
+    email: str
+    password_hash: str
+    is_active: bool
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_user(cls, user: User) -> "AuthSnapshot":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            password_hash=user.password_hash,
+            is_active=user.is_active,
+            created_at=user.created_at,
+            updated_at=user.updated_at
+        )
+
+    async def attach(self, db: AsyncSession) -> User:
+        """
+        Rebuild the user as a persistent instance of the session without a query.
+
+        Relationships (profile, transactions...) still lazy-load through the
+        session and changes are flushed as usual.
+        """
+        user = User(
+            id=self.id,
+            username=self.username,
+            email=self.email,
+            password_hash=self.password_hash,
+            is_active=self.is_active,
+            created_at=self.created_at,
+            updated_at=self.updated_at
+        )
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
+
+
+class UserAuthCache:
+    """
+    Short-lived, bounded in-memory cache of authenticated users.
+
+    Entries expire after a TTL and the least recently used ones are evicted
+    once the cache is full. Any update or deletion of a user (password
+    change, deactivation, account deletion) invalidates its entry.
+    """
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[UUID, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def get(self, user_id: UUID) -> Optional[AuthSnapshot]:
+        """
+        Get the cached snapshot of a user.
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            Optional[AuthSnapshot]: Snapshot, or None if missing or expired
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+
+            snapshot, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self.entries[user_id]
+                return None
+
+            self.entries.move_to_end(user_id)
+            return snapshot
+
+    def set(self, snapshot: AuthSnapshot):
+        """
+        Cache the snapshot of a user.
+
+        Args:
+            snapshot: Snapshot to cache
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self.entries[snapshot.id] = (snapshot, time.monotonic() + self.ttl_seconds)
+            self.entries.move_to_end(snapshot.id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_id: UUID):
+        """
+        Drop the cached snapshot of a user.
+
+        Args:
+            user_id: User ID
+        """
+        with self._lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        """Drop every cached snapshot."""
+        with self._lock:
+            self.entries.clear()
+
+
+# Global authenticated user cache
+user_auth_cache = UserAuthCache(
+    ttl_seconds=settings.auth_user_cache_ttl_seconds,
+    max_entries=settings.auth_user_cache_max_entries
+)
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> User:
     """
     Get the current authenticated user from JWT token.
@@ -49,11 +183,21 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
     
-    # Get user from database
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
+    try:
+        user_uuid = UUID(user_id)
+    except (ValueError, TypeError):
         raise credentials_exception
     
+    # Get user from the cache, falling back to the database
+    snapshot = user_auth_cache.get(user_uuid)
+    if snapshot is not None:
+        user = await snapshot.attach(db)
+    else:
+        user = await db.scalar(select(User).where(User.id == user_uuid))
+        if user is None:
+            raise credentials_exception
+        user_auth_cache.set(AuthSnapshot.from_user(user))
+    
     # Check if user is active
     if not user.is_active:
         raise HTTPException(
@@ -87,7 +231,7 @@ async def get_current_active_user(
     return current_user
 
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
     """
     Authenticate a user by username and password.
     
@@ -99,17 +243,17 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[Use
     Returns:
         Optional[User]: User if authentication successful, None otherwise
     """
-    from ..utils.security import verify_password
+    from ..utils.security import verify_password_async
     
     # Try to find user by username or email
-    user = db.query(User).filter(
-        (User.username == username) | (User.email == username)
-    ).first()
+    user = await db.scalar(select(User).where(
+        or_(User.username == username, User.email == username)
+    ))
     
     if not user:
         return None
     
-    if not verify_password(password, user.password_hash):
+    if not await verify_password_async(password, user.password_hash):
         return None
     
     return user
@@ -167,4 +311,22 @@ class RateLimiter:
 
 
 # Global rate limiter instance
-rate_limiter = RateLimiter()
\ No newline at end of file
+rate_limiter = RateLimiter()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    """Forget a user as soon as its row changes (password, status, deletion)."""
+    user_auth_cache.invalidate(target.id)
+    # Invalidate again on commit, in case a concurrent request re-cached the old row
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault("auth_invalidated_users", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    """Drop users changed by the committed transaction from the cache."""
+    for user_id in session.info.pop("auth_invalidated_users", ()):
+        user_auth_cache.invalidate(user_id)
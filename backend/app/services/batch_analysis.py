@@ -0,0 +1,355 @@
+"""
+Concurrent batch runner for fleet-wide AI analysis.
+
+The nightly run is dominated by the time spent waiting on Claude, so users are
+analyzed concurrently: an asyncio semaphore caps how many LLM calls are in
+flight, while database reads and writes run in worker threads with their own
+short-lived sessions. Generated suggestions go through a bounded queue to a
+single writer stage that persists them in batches.
+
+With LLM_BATCH_MODE the users needing Claude are instead collected into
+Message Batches jobs of up to LLM_BATCH_MAX_REQUESTS users, each submitted
+as soon as it is full and polled in the background while the next users are
+prepared; results are mapped back to users by custom_id.
+
+Users are loaded in chunks: one query reads their feature vectors, the
+recurrence engine runs once over the whole chunk, and one range query on the
+upcoming occasion index picks the users whose special dates need checking.
+"""
+import asyncio
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Any
+from uuid import UUID
+
+from sqlalchemy.orm import joinedload
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import User, Suggestion
+from .ai_engine import AIEngine, normalize_suggestion_data
+from .feature_store import FeatureVector, load_features_batch
+from .llm_batches import MAX_BATCH_REQUESTS
+from .llm_service import llm_service
+from .occasions import users_with_upcoming_occasions
+from .recurrence import detect_recurrences
+
+
+@dataclass
+class PreparedUser:
+    """Everything needed to analyze a user without holding a DB session."""
+    user: User
+    suggestions: List[Dict] = field(default_factory=list)
+    features: Optional[FeatureVector] = None
+    existing_suggestions: Optional[List[Suggestion]] = None
+
+    @property
+    def needs_llm(self) -> bool:
+        return self.features is not None
+
+
+@dataclass
+class AnalyzedUser:
+    """Result of analyzing a single user, waiting to be persisted."""
+    user_id: UUID
+    username: str
+    suggestions: List[Dict]
+
+
+class BatchAnalysisRunner:
+    """Analyze many users concurrently and persist their suggestions in batches."""
+
+    def __init__(self, concurrency: Optional[int] = None,
+                 write_size: Optional[int] = None,
+                 queue_size: Optional[int] = None,
+                 verbose: bool = True):
+        self.concurrency = max(1, concurrency or settings.ai_batch_concurrency)
+        self.write_size = max(1, write_size or settings.ai_batch_write_size)
+        self.queue_size = max(1, queue_size or settings.ai_batch_queue_size)
+        self.prepare_size = max(1, settings.ai_batch_prepare_size)
+        self.llm_batch_size = min(max(1, settings.llm_batch_max_requests), MAX_BATCH_REQUESTS)
+        self.verbose = verbose
+        self.stats = {
+            "users_processed": 0,
+            "users_failed": 0,
+            "suggestions_created": 0
+        }
+
+    async def run(self, user_ids: Optional[List[UUID]] = None) -> Dict[str, int]:
+        """
+        Run the analysis for the given users (all active users by default).
+
+        Args:
+            user_ids: Optional explicit list of user IDs to analyze
+
+        Returns:
+            Counters for processed users, failures and created suggestions
+        """
+        if user_ids is None:
+            user_ids = await asyncio.to_thread(self._load_active_user_ids)
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        writer = asyncio.create_task(self._writer(queue))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        batched: List[PreparedUser] = []
+
+        def spawn(coro) -> None:
+            task = asyncio.create_task(coro)
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        try:
+            for start in range(0, len(user_ids), self.prepare_size):
+                chunk = user_ids[start:start + self.prepare_size]
+                try:
+                    prepared_users = await asyncio.to_thread(self._prepare_users, chunk)
+                except Exception as e:
+                    self.stats["users_failed"] += len(chunk)
+                    print(f"Error preparing {len(chunk)} users: {e}")
+                    continue
+
+                for prepared in prepared_users:
+                    if settings.llm_batch_mode and prepared.needs_llm:
+                        batched.append(prepared)
+                        if len(batched) >= self.llm_batch_size:
+                            spawn(self._analyze_llm_batch(batched, queue))
+                            batched = []
+                        continue
+
+                    # Only keep `concurrency` users in flight at any time
+                    await semaphore.acquire()
+                    spawn(self._analyze(prepared, queue, semaphore))
+
+            if batched:
+                spawn(self._analyze_llm_batch(batched, queue))
+
+            if tasks:
+                await asyncio.gather(*tasks)
+
+            await queue.put(None)
+            await writer
+        except asyncio.CancelledError:
+            # Aborted run (e.g. the scheduler lost its lease): stop every stage
+            for task in [*tasks, writer]:
+                task.cancel()
+            raise
+
+        return self.stats
+
+    async def _analyze(self, prepared: PreparedUser, queue: asyncio.Queue,
+                       semaphore: asyncio.Semaphore) -> None:
+        """Analyze a single user and hand the result to the writer."""
+        try:
+            suggestions = list(prepared.suggestions)
+            if prepared.needs_llm:
+                try:
+                    suggestions.extend(await llm_service.generate_suggestions(
+                        prepared.user,
+                        prepared.features,
+                        prepared.existing_suggestions,
+                        max_suggestions=5
+                    ))
+                except Exception as e:
+                    print(f"Error generating LLM suggestions for {prepared.user.username}: {e}")
+                    # Fall back to rule-based
+                    suggestions.extend(await asyncio.to_thread(self._rule_based_patterns, prepared))
+
+            await queue.put(AnalyzedUser(
+                user_id=prepared.user.id,
+                username=prepared.user.username,
+                suggestions=AIEngine.finalize_suggestions(suggestions)
+            ))
+        except Exception as e:
+            self.stats["users_failed"] += 1
+            print(f"Error analyzing user {prepared.user.id}: {e}")
+        finally:
+            semaphore.release()
+
+    async def _analyze_llm_batch(self, batch: List[PreparedUser], queue: asyncio.Queue) -> None:
+        """Analyze users with one Message Batches job and hand the results to the writer."""
+        try:
+            llm_results = await llm_service.generate_suggestions_batch(
+                {
+                    prepared.user.id.hex: (prepared.user, prepared.features, prepared.existing_suggestions)
+                    for prepared in batch
+                },
+                max_suggestions=5
+            )
+        except Exception as e:
+            print(f"Error running LLM batch for {len(batch)} users: {e}")
+            llm_results = {}
+
+        for prepared in batch:
+            try:
+                suggestions = list(prepared.suggestions)
+                llm_suggestions = llm_results.get(prepared.user.id.hex)
+                if llm_suggestions is None:
+                    # Fall back to rule-based
+                    suggestions.extend(await asyncio.to_thread(self._rule_based_patterns, prepared))
+                else:
+                    suggestions.extend(llm_suggestions)
+
+                await queue.put(AnalyzedUser(
+                    user_id=prepared.user.id,
+                    username=prepared.user.username,
+                    suggestions=AIEngine.finalize_suggestions(suggestions)
+                ))
+            except Exception as e:
+                self.stats["users_failed"] += 1
+                print(f"Error analyzing user {prepared.user.id}: {e}")
+
+    async def _writer(self, queue: asyncio.Queue) -> None:
+        """Drain analyzed users from the queue and persist them in batches."""
+        batch: List[AnalyzedUser] = []
+
+        while True:
+            item = await queue.get()
+            if item is not None:
+                batch.append(item)
+
+            # Flush when the batch is full, when nothing else is waiting or at the end
+            if batch and (item is None or len(batch) >= self.write_size or queue.empty()):
+                try:
+                    await asyncio.to_thread(self._write_batch, batch)
+                except Exception as e:
+                    self.stats["users_failed"] += len(batch)
+                    print(f"Error saving suggestions for {len(batch)} users: {e}")
+                batch = []
+
+            if item is None:
+                return
+
+    def _load_active_user_ids(self) -> List[UUID]:
+        """Load the IDs of all active users."""
+        db = SessionLocal()
+        try:
+            return [
+                user_id for (user_id,) in
+                db.query(User.id).filter(User.is_active == True).all()
+            ]
+        finally:
+            db.close()
+
+    def _prepare_users(self, user_ids: List[UUID]) -> List[PreparedUser]:
+        """Run the DB-bound part of the analysis for a chunk of users (worker thread)."""
+        db = SessionLocal()
+        try:
+            engine = AIEngine(db)
+            query = db.query(User).filter(User.id.in_(user_ids))
+            if engine.use_llm:
+                # The LLM context reads the profile after the session is closed
+                query = query.options(joinedload(User.profile))
+            users = query.all()
+            if not users:
+                return []
+
+            features = load_features_batch(db, [user.id for user in users])
+            recurrences = {} if engine.use_llm else detect_recurrences(list(features.values()))
+            with_occasions = users_with_upcoming_occasions(db, user_ids=[user.id for user in users])
+
+            prepared_users = []
+            for user in users:
+                try:
+                    prepared = PreparedUser(user=user)
+                    if user.id in with_occasions:
+                        prepared.suggestions = engine._analyze_special_dates(user)
+                    if engine.use_llm:
+                        prepared.features, prepared.existing_suggestions = engine.load_llm_inputs(
+                            user, features[user.id]
+                        )
+                    else:
+                        prepared.suggestions.extend(
+                            engine.routine_suggestions(user.id, recurrences[user.id])
+                        )
+                    prepared_users.append(prepared)
+                except Exception as e:
+                    self.stats["users_failed"] += 1
+                    print(f"Error analyzing user {user.id}: {e}")
+
+            return prepared_users
+        finally:
+            # Loaded attributes stay readable on the detached instances
+            db.close()
+
+    def _rule_based_patterns(self, prepared: PreparedUser) -> List[Dict[str, Any]]:
+        """Rule-based pattern analysis used when the LLM call fails (worker thread)."""
+        db = SessionLocal()
+        try:
+            # The features loaded for the prompt are reused
+            return AIEngine(db)._analyze_transaction_patterns(prepared.user, prepared.features)
+        finally:
+            db.close()
+
+    def _write_batch(self, batch: List[AnalyzedUser]) -> None:
+        """Persist the suggestions of a batch of users in one transaction (worker thread)."""
+        db = SessionLocal()
+        try:
+            # One lookup for the whole batch instead of one per suggestion
+            existing = set(
+                db.query(Suggestion.user_id, Suggestion.content).filter(
+                    Suggestion.user_id.in_([item.user_id for item in batch]),
+                    Suggestion.status.in_(['pending', 'accepted'])
+                ).all()
+            )
+
+            created = 0
+            for item in batch:
+                user_created = 0
+                for suggestion_data in item.suggestions:
+                    key = (item.user_id, suggestion_data['content'])
+                    if key in existing:
+                        continue
+                    existing.add(key)
+
+                    db.add(Suggestion(
+                        user_id=item.user_id,
+                        **normalize_suggestion_data(suggestion_data)
+                    ))
+                    user_created += 1
+                    if self.verbose:
+                        print(f"  ✅ {suggestion_data['type']}: {suggestion_data['content'][:60]}...")
+
+                created += user_created
+                if self.verbose:
+                    print(f"  Generated {user_created} new suggestions for {item.username}")
+
+            db.commit()
+            self.stats["users_processed"] += len(batch)
+            self.stats["suggestions_created"] += created
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+async def run_batch_analysis(concurrency: Optional[int] = None,
+                             user_ids: Optional[List[UUID]] = None,
+                             verbose: bool = True) -> Dict[str, int]:
+    """
+    Analyze users concurrently and save the generated suggestions.
+
+    Args:
+        concurrency: Max users analyzed at once (defaults to settings)
+        user_ids: Optional explicit list of user IDs (defaults to all active users)
+        verbose: Print progress for every persisted user
+
+    Returns:
+        Counters for processed users, failures and created suggestions
+    """
+    runner = BatchAnalysisRunner(concurrency=concurrency, verbose=verbose)
+    return await runner.run(user_ids)
+
+
+def run_batch_analysis_sync(concurrency: Optional[int] = None,
+                            user_ids: Optional[List[UUID]] = None,
+                            verbose: bool = True) -> Dict[str, int]:
+    """Run the batch analysis from synchronous code (scripts, cron jobs)."""
+    async def _run() -> Dict[str, int]:
+        try:
+            return await run_batch_analysis(concurrency, user_ids, verbose)
+        finally:
+            # The pooled client is bound to this loop, which ends with the run
+            await llm_service.aclose()
+
+    return asyncio.run(_run())
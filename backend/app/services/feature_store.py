@@ -0,0 +1,463 @@
+"""
+Per-user feature vectors for the AI analysis.
+
+Each user's transactions over the last FEATURE_STORE_WINDOW_DAYS are
+summarized in one user_features row: category and type totals, per-merchant
+counts, amounts, inter-purchase intervals and recent purchases (for the
+recurrence engine), and weekday/hour histograms.
+The rule-based routines, the LLM prompt context, the incremental analyzer
+and the analysis scripts all read this row instead of scanning raw
+transactions.
+
+New transactions are added to the stored vector by the session flush hook
+(and by the bulk import, which bypasses the ORM). Updates, deletes and
+transactions older than the last one of their merchant cannot be applied
+incrementally, so they mark the vector stale; stale and expired vectors are
+rebuilt from raw transactions on the next read.
+"""
+import bisect
+import math
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import Transaction, User, UserFeatures
+from .transaction_rollups import _attribute_before_flush, rollup_bucket
+
+# (category, description)
+MerchantKey = Tuple[str, str]
+
+# Transaction fields a vector is built from
+FEATURE_FIELDS = ('user_id', 'date', 'category', 'description', 'type', 'amount')
+
+# Layout of the stored features; rows with another version are rebuilt
+FEATURES_VERSION = 2
+
+# Most recent (timestamp, amount) events kept per merchant for recurrence detection
+MERCHANT_EVENTS = 24
+
+
+def _db_naive(value: datetime, dialect_name: str) -> datetime:
+    """
+    Reduce a date to the naive value the database compares and returns.
+
+    SQLite keeps the wall-clock time it was given, PostgreSQL stores an
+    instant (returned here as naive UTC), as in rollup_bucket.
+    """
+    if value.tzinfo is None:
+        return value
+    if dialect_name == 'postgresql':
+        value = value.astimezone(timezone.utc)
+    return value.replace(tzinfo=None)
+
+
+@dataclass
+class Totals:
+    """Number and total amount of transactions."""
+    count: int = 0
+    amount: Decimal = Decimal('0')
+
+
+@dataclass
+class MerchantStats:
+    """Transactions of one (category, description) pair and their intervals."""
+    category: str
+    description: str
+    count: int
+    amount: Decimal
+    first_date: datetime
+    last_date: datetime
+    # Sum of squared and largest gap between consecutive transactions, in days
+    gap_sq_days: float = 0.0
+    max_gap_days: float = 0.0
+    # Most recent [epoch seconds, amount] pairs, oldest first
+    events: List[List[float]] = field(default_factory=list)
+
+    @property
+    def mean_interval_days(self) -> Optional[float]:
+        """Average days between consecutive transactions (None below 2)."""
+        if self.count < 2:
+            return None
+        return (self.last_date - self.first_date).total_seconds() / 86400 / (self.count - 1)
+
+    @property
+    def interval_stddev_days(self) -> Optional[float]:
+        """Standard deviation of the days between consecutive transactions."""
+        mean = self.mean_interval_days
+        if mean is None:
+            return None
+        return math.sqrt(max(0.0, self.gap_sq_days / (self.count - 1) - mean ** 2))
+
+
+@dataclass
+class FeatureVector:
+    """Summary of one user's transactions within the feature window."""
+    user_id: UUID
+    window_start: datetime
+    computed_at: datetime
+    categories: Dict[str, Totals] = field(default_factory=dict)
+    types: Dict[str, Totals] = field(default_factory=dict)
+    merchants: Dict[MerchantKey, MerchantStats] = field(default_factory=dict)
+    weekday_counts: List[int] = field(default_factory=lambda: [0] * 7)  # Monday first
+    weekday_expenses: List[Decimal] = field(default_factory=lambda: [Decimal('0')] * 7)
+    hour_counts: List[int] = field(default_factory=lambda: [0] * 24)
+
+    @property
+    def transaction_count(self) -> int:
+        return sum(totals.count for totals in self.types.values())
+
+    @property
+    def window_days(self) -> int:
+        return (self.computed_at.replace(tzinfo=None) - self.window_start).days
+
+    def top_categories(self, limit: int = 5) -> List[Tuple[str, Totals]]:
+        """Categories with the largest total amount."""
+        return sorted(self.categories.items(), key=lambda item: item[1].amount, reverse=True)[:limit]
+
+    def top_merchants(self, limit: int = 5) -> List[MerchantStats]:
+        """Merchants with the most transactions."""
+        return sorted(self.merchants.values(), key=lambda m: m.count, reverse=True)[:limit]
+
+    def recurring_merchants(self, min_count: int = 3) -> List[MerchantStats]:
+        """Merchants seen at least min_count times (routine candidates)."""
+        return [m for m in self.merchants.values() if m.count >= min_count]
+
+    def add_transaction(self, when: datetime, category: str, description: str,
+                        type_: str, amount, dialect_name: str) -> bool:
+        """
+        Add one transaction to the vector.
+
+        Args:
+            when: Transaction date
+            category: Transaction category
+            description: Transaction description
+            type_: Transaction type (expense, income, savings)
+            amount: Transaction amount
+            dialect_name: Name of the database dialect
+
+        Returns:
+            bool: False if the transaction predates the last one of its
+            merchant, which leaves the interval stats inexact (rebuild needed)
+        """
+        when = _db_naive(when, dialect_name)
+        if when < self.window_start:
+            return True
+
+        amount = Decimal(str(amount or 0))
+        for totals in (
+            self.categories.setdefault(category, Totals()),
+            self.types.setdefault(type_, Totals())
+        ):
+            totals.count += 1
+            totals.amount += amount
+
+        day, hour = rollup_bucket(when, dialect_name)
+        self.weekday_counts[day.weekday()] += 1
+        self.hour_counts[hour] += 1
+        if type_ == 'expense':
+            self.weekday_expenses[day.weekday()] += amount
+
+        event = [when.replace(tzinfo=timezone.utc).timestamp(), float(amount)]
+        merchant = self.merchants.get((category, description))
+        if merchant is None:
+            self.merchants[(category, description)] = MerchantStats(
+                category=category, description=description, count=1,
+                amount=amount, first_date=when, last_date=when, events=[event]
+            )
+            return True
+
+        in_order = when >= merchant.last_date
+        if in_order:
+            gap = (when - merchant.last_date).total_seconds() / 86400
+            merchant.gap_sq_days += gap ** 2
+            merchant.max_gap_days = max(merchant.max_gap_days, gap)
+        merchant.count += 1
+        merchant.amount += amount
+        merchant.first_date = min(merchant.first_date, when)
+        merchant.last_date = max(merchant.last_date, when)
+        bisect.insort(merchant.events, event)
+        del merchant.events[:-MERCHANT_EVENTS]
+        return in_order
+
+    def to_json(self) -> Dict:
+        """Serialize for the user_features.features column."""
+        return {
+            "version": FEATURES_VERSION,
+            "categories": {k: [t.count, str(t.amount)] for k, t in self.categories.items()},
+            "types": {k: [t.count, str(t.amount)] for k, t in self.types.items()},
+            "merchants": [
+                [m.category, m.description, m.count, str(m.amount),
+                 m.first_date.isoformat(), m.last_date.isoformat(),
+                 m.gap_sq_days, m.max_gap_days, m.events]
+                for m in self.merchants.values()
+            ],
+            "weekday_counts": self.weekday_counts,
+            "weekday_expenses": [str(amount) for amount in self.weekday_expenses],
+            "hour_counts": self.hour_counts
+        }
+
+    @classmethod
+    def from_row(cls, row) -> "FeatureVector":
+        """Load a vector from a user_features row."""
+        data = row.features
+        merchants = {}
+        for category, description, count, amount, first, last, gap_sq, max_gap, events in data["merchants"]:
+            merchants[(category, description)] = MerchantStats(
+                category=category, description=description, count=count,
+                amount=Decimal(amount),
+                first_date=datetime.fromisoformat(first),
+                last_date=datetime.fromisoformat(last),
+                gap_sq_days=gap_sq, max_gap_days=max_gap, events=events
+            )
+
+        return cls(
+            user_id=row.user_id,
+            window_start=row.window_start,
+            computed_at=_as_utc(row.computed_at),
+            categories={k: Totals(c, Decimal(a)) for k, (c, a) in data["categories"].items()},
+            types={k: Totals(c, Decimal(a)) for k, (c, a) in data["types"].items()},
+            merchants=merchants,
+            weekday_counts=list(data["weekday_counts"]),
+            weekday_expenses=[Decimal(amount) for amount in data["weekday_expenses"]],
+            hour_counts=list(data["hour_counts"])
+        )
+
+
+def _as_utc(value: datetime) -> datetime:
+    """SQLite returns naive datetimes; they were stored as UTC."""
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def apply_flush_to_features(session: Session) -> None:
+    """
+    Apply the transaction changes of a flush to the stored feature vectors.
+
+    Called from the session after_flush hook. New transactions are added to
+    existing vectors; vectors of users whose transactions were updated or
+    deleted are marked stale.
+
+    Args:
+        session: Session being flushed
+    """
+    new = [obj for obj in session.new if isinstance(obj, Transaction)]
+    changed = [
+        obj for obj in session.dirty
+        if isinstance(obj, Transaction) and session.is_modified(obj)
+    ] + [obj for obj in session.deleted if isinstance(obj, Transaction)]
+    deleted_users = {obj.id for obj in session.deleted if isinstance(obj, User)}
+
+    if not (new or changed or deleted_users):
+        return
+
+    connection = session.connection()
+    table = UserFeatures.__table__
+
+    # SQLite does not enforce the FK cascade
+    if deleted_users:
+        connection.execute(delete(table).where(table.c.user_id.in_(list(deleted_users))))
+
+    stale_users = set()
+    for obj in changed:
+        stale_users.add(_attribute_before_flush(obj, 'user_id'))
+        stale_users.add(obj.user_id)
+    stale_users -= deleted_users
+    if stale_users:
+        connection.execute(
+            update(table).where(table.c.user_id.in_(list(stale_users))).values(stale=True)
+        )
+
+    add_rows_to_features(connection, [
+        {name: getattr(obj, name) for name in FEATURE_FIELDS}
+        for obj in new
+        if obj.user_id not in deleted_users and obj.user_id not in stale_users
+    ])
+
+
+def add_rows_to_features(connection: Connection, rows: List[Dict]) -> None:
+    """
+    Add new transactions to the stored feature vectors of their users.
+
+    Users without a stored (or with a stale) vector are skipped; theirs is
+    built from raw transactions on the next read. Core inserts do not go
+    through a session flush, so callers that bypass the ORM (bulk imports)
+    must call this in the same transaction.
+
+    Args:
+        connection: Connection the rows were inserted on
+        rows: Inserted transaction values (user_id, date, category,
+            description, type, amount)
+    """
+    if not rows:
+        return
+
+    by_user: Dict[UUID, List[Dict]] = defaultdict(list)
+    for row in rows:
+        by_user[row["user_id"]].append(row)
+
+    table = UserFeatures.__table__
+    dialect_name = connection.dialect.name
+    query = select(table).where(table.c.user_id.in_(list(by_user)), table.c.stale == False)
+    if dialect_name == 'postgresql':
+        # Concurrent flushes of the same user must not lose each other's update
+        query = query.with_for_update()
+
+    for stored in connection.execute(query).all():
+        if stored.features.get("version") != FEATURES_VERSION:
+            connection.execute(
+                update(table).where(table.c.user_id == stored.user_id).values(stale=True)
+            )
+            continue
+
+        vector = FeatureVector.from_row(stored)
+        exact = True
+        for row in sorted(by_user[stored.user_id], key=lambda r: _db_naive(r["date"], dialect_name)):
+            exact = vector.add_transaction(
+                row["date"], row["category"], row["description"],
+                row["type"], row["amount"], dialect_name
+            ) and exact
+
+        connection.execute(
+            update(table).where(table.c.user_id == stored.user_id).values(
+                features=vector.to_json(),
+                stale=not exact
+            )
+        )
+
+
+def build_features(db: Session, user_id: UUID) -> FeatureVector:
+    """
+    Compute a user's feature vector from raw transactions and store it.
+
+    Args:
+        db: Database session (committed by the caller)
+        user_id: User ID
+
+    Returns:
+        FeatureVector: The rebuilt vector
+    """
+    connection = db.connection()
+    dialect_name = connection.dialect.name
+    now = datetime.now(timezone.utc)
+    window_start = now - timedelta(days=settings.feature_store_window_days)
+
+    vector = FeatureVector(
+        user_id=user_id,
+        window_start=_db_naive(window_start, dialect_name),
+        computed_at=now
+    )
+    query = db.query(
+        Transaction.date, Transaction.category, Transaction.description,
+        Transaction.type, Transaction.amount
+    ).filter(
+        Transaction.user_id == user_id,
+        Transaction.date >= window_start
+    ).order_by(Transaction.date)
+    for when, category, description, type_, amount in query.yield_per(1000):
+        vector.add_transaction(when, category, description, type_, amount, dialect_name)
+
+    _store_vector(connection, vector)
+    return vector
+
+
+def _store_vector(connection: Connection, vector: FeatureVector) -> None:
+    """Insert or replace the stored vector of a user."""
+    table = UserFeatures.__table__
+    values = {
+        "user_id": vector.user_id,
+        "window_start": vector.window_start,
+        "features": vector.to_json(),
+        "stale": False,
+        "computed_at": vector.computed_at
+    }
+
+    dialect_name = connection.dialect.name
+    if dialect_name in ('sqlite', 'postgresql'):
+        insert = sqlite_insert if dialect_name == 'sqlite' else pg_insert
+        stmt = insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={name: stmt.excluded[name] for name in values if name != "user_id"}
+        )
+        connection.execute(stmt)
+    else:
+        result = connection.execute(
+            update(table).where(table.c.user_id == vector.user_id).values(**values)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(**values))
+
+
+def _is_fresh(stored: UserFeatures) -> bool:
+    """Whether a stored vector can be used as-is (current layout, not stale or expired)."""
+    max_age = timedelta(hours=settings.feature_store_max_age_hours)
+    return (
+        not stored.stale
+        and stored.features.get("version") == FEATURES_VERSION
+        and _as_utc(stored.computed_at) + max_age > datetime.now(timezone.utc)
+    )
+
+
+def load_features(db: Session, user_id: UUID) -> FeatureVector:
+    """
+    Get a user's feature vector, rebuilding it when stale or expired.
+
+    Vectors older than FEATURE_STORE_MAX_AGE_HOURS are rebuilt so
+    transactions leave the window. A rebuilt vector is committed in its own
+    session, so later reads reuse it without committing (and expiring) the
+    caller's session.
+
+    Args:
+        db: Database session
+        user_id: User ID
+
+    Returns:
+        FeatureVector: The user's features
+    """
+    stored = db.get(UserFeatures, user_id, populate_existing=True)
+    if stored is not None and _is_fresh(stored):
+        return FeatureVector.from_row(stored)
+
+    return _rebuild_features(db, user_id)
+
+
+def load_features_batch(db: Session, user_ids: List[UUID]) -> Dict[UUID, FeatureVector]:
+    """
+    Get the feature vectors of several users, reading the fresh ones in one query.
+
+    Args:
+        db: Database session
+        user_ids: User IDs
+
+    Returns:
+        Mapping of user ID to feature vector
+    """
+    vectors = {
+        stored.user_id: FeatureVector.from_row(stored)
+        for stored in db.query(UserFeatures).filter(
+            UserFeatures.user_id.in_(user_ids)
+        ).populate_existing()
+        if _is_fresh(stored)
+    }
+
+    for user_id in user_ids:
+        if user_id not in vectors:
+            vectors[user_id] = _rebuild_features(db, user_id)
+    return vectors
+
+
+def _rebuild_features(db: Session, user_id: UUID) -> FeatureVector:
+    """Rebuild a vector and commit it in a session of its own."""
+    with Session(db.get_bind()) as store_db:
+        vector = build_features(store_db, user_id)
+        store_db.commit()
+    return vector
@@ -0,0 +1,259 @@
+"""
+Incremental, event-driven suggestion generation.
+
+New transactions are queued in-process as they are created. Events for the
+same user are coalesced over a debounce window, then the user's recurring
+patterns are re-evaluated by the recurrence engine against their feature
+vector (see feature_store.py), which the flush hook has already updated
+with the new transactions. A burst of transactions costs one row read
+instead of a full re-analysis per transaction.
+
+A merchant whose latest purchase is in the delta has just been bought from:
+its pending routine suggestions are expired and it is not suggested again
+until it is due. The user's other routines are checked for being due.
+
+On shutdown, users still waiting for their debounce window are analyzed
+right away (for up to INCREMENTAL_ANALYSIS_DRAIN_SECONDS) instead of
+being dropped until their next transaction.
+
+This keeps routine suggestions fresh between the periodic batch runs, which
+still perform the full (LLM and special dates) analysis.
+"""
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal, engine
+from ..models import Suggestion, SuggestionStatus, SuggestionType
+from .ai_engine import AIEngine, normalize_suggestion_data
+from .feature_store import _db_naive, load_features
+from .recurrence import detect_recurrences
+
+# (category, description)
+PatternKey = Tuple[str, str]
+
+
+class IncrementalAnalyzer:
+    """Coalesce transaction events per user and re-check their routines once per burst."""
+
+    def __init__(self, debounce_seconds: Optional[float] = None,
+                 max_delay_seconds: Optional[float] = None,
+                 drain_seconds: Optional[float] = None):
+        self.debounce_seconds = (
+            settings.incremental_analysis_debounce_seconds
+            if debounce_seconds is None else debounce_seconds
+        )
+        self.max_delay_seconds = (
+            settings.incremental_analysis_max_delay_seconds
+            if max_delay_seconds is None else max_delay_seconds
+        )
+        self.drain_seconds = (
+            settings.incremental_analysis_drain_seconds
+            if drain_seconds is None else drain_seconds
+        )
+
+        # user_id -> latest new transaction date (as the feature vectors store
+        # it) of each pattern touched while waiting for the debounce window to close
+        self._pending: Dict[UUID, Dict[PatternKey, datetime]] = {}
+        # user_id -> (first event time, time the user becomes due)
+        self._deadlines: Dict[UUID, Tuple[float, float]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._stats = {
+            "events_received": 0,
+            "users_analyzed": 0,
+            "users_failed": 0,
+            "suggestions_created": 0,
+            "suggestions_expired": 0
+        }
+
+    def start(self) -> None:
+        """Start the worker on the running event loop."""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Analyze the pending users without waiting for their debounce, then stop the worker."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            # Shielded so a timeout leaves the user being analyzed to the cancel below
+            await asyncio.wait_for(asyncio.shield(self._task), self.drain_seconds)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        if self._pending:
+            print(f"Incremental analysis stopped with {len(self._pending)} users still pending")
+        self._pending.clear()
+        self._deadlines.clear()
+
+    def notify(self, user_id: UUID, transactions: Iterable) -> None:
+        """
+        Queue new transactions of a user for analysis.
+
+        Must be called from the event loop thread. Does nothing while the
+        worker is not running (scripts, batch jobs).
+
+        Args:
+            user_id: Owner of the transactions
+            transactions: Created transactions (anything with category,
+                description and date)
+        """
+        if self._task is None:
+            return
+
+        transactions = list(transactions)
+        if not transactions:
+            return
+
+        now = time.monotonic()
+        touched = self._pending.setdefault(user_id, {})
+        for t in transactions:
+            key = (t.category, t.description)
+            when = _db_naive(t.date, engine.dialect.name)
+            touched[key] = max(touched.get(key, when), when)
+        first_seen = self._deadlines.get(user_id, (now, now))[0]
+        # Each event pushes the user back, but never past the max delay
+        self._deadlines[user_id] = (
+            first_seen,
+            min(now + self.debounce_seconds, first_seen + self.max_delay_seconds)
+        )
+        self._stats["events_received"] += len(transactions)
+        self._wakeup.set()
+
+    def stats(self) -> Dict[str, int]:
+        """Get the analyzer counters."""
+        return {**self._stats, "users_pending": len(self._pending)}
+
+    async def _run(self) -> None:
+        """Wait for users to become due and analyze them."""
+        while True:
+            if self._stopping and not self._deadlines:
+                return
+
+            timeout = None
+            if self._stopping:
+                timeout = 0.0
+            elif self._deadlines:
+                next_due = min(due for _, due in self._deadlines.values())
+                timeout = max(0.0, next_due - time.monotonic())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            now = time.monotonic()
+            due_users = [
+                user_id for user_id, (_, due) in self._deadlines.items()
+                if due <= now or self._stopping
+            ]
+            for user_id in due_users:
+                del self._deadlines[user_id]
+                touched = self._pending.pop(user_id, {})
+                try:
+                    created, expired = await asyncio.to_thread(self._analyze, user_id, touched)
+                    self._stats["users_analyzed"] += 1
+                    self._stats["suggestions_created"] += created
+                    self._stats["suggestions_expired"] += expired
+                except Exception as e:
+                    self._stats["users_failed"] += 1
+                    print(f"Error in incremental analysis for user {user_id}: {e}")
+
+    def _analyze(self, user_id: UUID, touched: Dict[PatternKey, datetime]) -> Tuple[int, int]:
+        """
+        Apply a user's new transactions to their routine suggestions (worker thread).
+
+        Args:
+            user_id: User ID
+            touched: Latest new transaction date of each touched pattern
+
+        Returns:
+            Number of suggestions created and expired
+        """
+        db = SessionLocal()
+        try:
+            features = load_features(db, user_id)
+
+            # Patterns whose latest purchase is new: bought just now, not due
+            bought = {
+                key for key, when in touched.items()
+                if key in features.merchants and features.merchants[key].last_date <= when
+            }
+            expired = self._expire_routines(db, user_id, {description for _, description in bought})
+
+            recurrences = [
+                r for r in detect_recurrences([features], min_count=3)[user_id]  # At least 3 times
+                if (r.category, r.description) not in bought
+            ]
+            suggestions = AIEngine(db).routine_suggestions(user_id, recurrences)
+            created = self._save_suggestions(db, user_id, AIEngine.finalize_suggestions(suggestions))
+
+            db.commit()
+            return created, expired
+        finally:
+            db.close()
+
+    def _expire_routines(self, db: Session, user_id: UUID, descriptions: Set[str]) -> int:
+        """Expire the pending routine suggestions of merchants just bought from."""
+        if not descriptions:
+            return 0
+
+        pending = db.query(Suggestion).filter(
+            Suggestion.user_id == user_id,
+            Suggestion.type == SuggestionType.ROUTINE.value,
+            Suggestion.status == SuggestionStatus.PENDING.value,
+            Suggestion.context_data.isnot(None)
+        ).all()
+
+        expired = 0
+        for suggestion in pending:
+            try:
+                description = json.loads(suggestion.context_data).get("description")
+            except (ValueError, AttributeError):
+                continue
+            if description in descriptions:
+                suggestion.status = SuggestionStatus.EXPIRED.value
+                expired += 1
+        return expired
+
+    def _save_suggestions(self, db: Session, user_id: UUID, suggestions: List[Dict]) -> int:
+        """Add the suggestions not already pending or accepted (committed by the caller)."""
+        if not suggestions:
+            return 0
+
+        existing = {
+            content for (content,) in db.query(Suggestion.content).filter(
+                Suggestion.user_id == user_id,
+                Suggestion.content.in_([s['content'] for s in suggestions]),
+                Suggestion.status.in_(['pending', 'accepted'])
+            ).all()
+        }
+
+        created = 0
+        for suggestion_data in suggestions:
+            if suggestion_data['content'] in existing:
+                continue
+            db.add(Suggestion(user_id=user_id, **normalize_suggestion_data(suggestion_data)))
+            created += 1
+
+        return created
+
+
+# Global incremental analyzer instance
+incremental_analyzer = IncrementalAnalyzer()
@@ -0,0 +1,321 @@
+"""
+Client for the Claude Message Batches API, with a local stand-in server.
+
+A batch job carries many Messages requests at once, each tagged with a
+custom_id. The job is processed asynchronously by Anthropic (at batch
+pricing, outside the per-minute rate limits), polled until it has ended,
+and its results are streamed back as JSON lines keyed by the same
+custom_id.
+
+The HTTP transport is pluggable: with LLM_BATCH_TRANSPORT=local the
+requests go to LocalBatchServer, an in-process fake of the batch endpoints
+served through an httpx MockTransport, so batch mode can be exercised in
+development and tests without network access.
+"""
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import httpx
+
+from ..config import settings
+from .prompt_builder import estimate_tokens, is_cacheable
+
+# Requests per job accepted by the API
+MAX_BATCH_REQUESTS = 100000
+
+
+class MessageBatchClient:
+    """Create, poll and read Message Batches jobs."""
+
+    def __init__(self, client_factory: Callable[[], httpx.AsyncClient], base_url: str):
+        """
+        Args:
+            client_factory: Returns the HTTP client to send requests with
+            base_url: URL of the batches endpoint
+        """
+        self.client_factory = client_factory
+        self.base_url = base_url
+
+    async def create(self, requests: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Submit a batch job.
+
+        Args:
+            requests: Items with a custom_id and the Messages API params
+
+        Returns:
+            The created batch object
+        """
+        response = await self.client_factory().post(self.base_url, json={"requests": requests})
+        response.raise_for_status()
+        return response.json()
+
+    async def retrieve(self, batch_id: str) -> Dict[str, Any]:
+        """Get the current state of a batch job."""
+        response = await self.client_factory().get(f"{self.base_url}/{batch_id}")
+        response.raise_for_status()
+        return response.json()
+
+    async def cancel(self, batch_id: str) -> Dict[str, Any]:
+        """Ask for a batch job to stop; requests already processed keep their results."""
+        response = await self.client_factory().post(f"{self.base_url}/{batch_id}/cancel")
+        response.raise_for_status()
+        return response.json()
+
+    async def results(self, batch: Dict[str, Any]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Read the results of an ended batch job.
+
+        Args:
+            batch: Batch object whose processing_status is "ended"
+
+        Returns:
+            Mapping of custom_id to the response message (content, usage...),
+            None for requests that errored, were canceled or expired
+        """
+        messages: Dict[str, Optional[Dict[str, Any]]] = {}
+        failed = 0
+        async with self.client_factory().stream("GET", batch["results_url"]) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                result = item["result"]
+                if result["type"] == "succeeded":
+                    messages[item["custom_id"]] = result["message"]
+                else:
+                    messages[item["custom_id"]] = None
+                    failed += 1
+
+        if failed:
+            print(f"Message batch {batch['id']}: {failed} of {len(messages)} requests did not succeed")
+        return messages
+
+    async def run(self, requests: Dict[str, Dict[str, Any]]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Submit requests as one batch job, wait for it to end and read its results.
+
+        Polling starts after a second and backs off to LLM_BATCH_POLL_SECONDS.
+        A job still running after LLM_BATCH_TIMEOUT_HOURS is canceled, and only
+        the requests it finished get a result.
+
+        Args:
+            requests: Mapping of custom_id to Messages API params
+
+        Returns:
+            Mapping of custom_id to the response message, None for failed
+            requests (missing for requests that never ran)
+        """
+        if len(requests) > MAX_BATCH_REQUESTS:
+            raise ValueError(f"A message batch takes at most {MAX_BATCH_REQUESTS} requests")
+
+        batch = await self.create([
+            {"custom_id": custom_id, "params": params}
+            for custom_id, params in requests.items()
+        ])
+        print(f"Submitted message batch {batch['id']} with {len(requests)} requests")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.llm_batch_timeout_hours * 3600
+        poll_seconds = 1.0
+        canceled = False
+        while batch["processing_status"] != "ended":
+            if not canceled and loop.time() >= deadline:
+                print(f"Message batch {batch['id']} timed out, canceling")
+                batch = await self.cancel(batch["id"])
+                canceled = True
+                continue
+            await asyncio.sleep(poll_seconds)
+            poll_seconds = min(poll_seconds * 2, settings.llm_batch_poll_seconds)
+            batch = await self.retrieve(batch["id"])
+
+        return await self.results(batch)
+
+
+def default_local_response(params: Dict[str, Any]) -> Optional[str]:
+    """Canned answer of the local batch server, in the format the suggestion prompt asks for."""
+    return json.dumps({
+        "suggestions": [
+            {
+                "type": "reminder",
+                "content": "Sugestão gerada pelo servidor local de lotes.",
+                "priority": 5,
+                "reasoning": "Resposta fixa do ambiente local",
+                "category": "general"
+            }
+        ]
+    }, ensure_ascii=False)
+
+
+class LocalBatchServer:
+    """
+    In-process fake of the Message Batches endpoints.
+
+    Batches end after `polls_until_ended` status requests. Each request is
+    answered by `responder`, which gets the Messages params and returns the
+    response text, or None to report the request as errored. Reported usage
+    is estimated, and simulates the prompt cache for system blocks with
+    cache_control that are long enough to be cached.
+    """
+
+    def __init__(self, responder: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None,
+                 polls_until_ended: int = 1):
+        self.responder = responder or default_local_response
+        self.polls_until_ended = polls_until_ended
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self._requests: Dict[str, List[Dict[str, Any]]] = {}
+        self._polls: Dict[str, int] = {}
+        self._cached_prefixes: Set[str] = set()
+
+    def transport(self) -> httpx.MockTransport:
+        """Get an httpx transport that routes requests to this server."""
+        return httpx.MockTransport(self.handle)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        """Serve one HTTP request."""
+        parts = request.url.path.rstrip("/").split("/")
+        # /v1/messages/batches[/<id>[/<action>]]
+        if parts[1:4] != ["v1", "messages", "batches"]:
+            return self._error(404, "not_found_error", f"Unknown path {request.url.path}")
+
+        batch_id = parts[4] if len(parts) > 4 else None
+        action = parts[5] if len(parts) > 5 else None
+
+        if batch_id is None and request.method == "POST":
+            return self._create(json.loads(request.content), request.url)
+        if batch_id not in self.batches:
+            return self._error(404, "not_found_error", f"Unknown batch {batch_id}")
+        if action is None and request.method == "GET":
+            return self._retrieve(batch_id)
+        if action == "cancel" and request.method == "POST":
+            return self._finish(batch_id, canceled=True)
+        if action == "results" and request.method == "GET":
+            return self._results(batch_id)
+        return self._error(405, "invalid_request_error", f"{request.method} not allowed")
+
+    @staticmethod
+    def _error(status: int, error_type: str, message: str) -> httpx.Response:
+        return httpx.Response(status, json={
+            "type": "error",
+            "error": {"type": error_type, "message": message}
+        })
+
+    def _create(self, body: Dict[str, Any], url: httpx.URL) -> httpx.Response:
+        requests = body.get("requests") or []
+        custom_ids = [item.get("custom_id") for item in requests]
+        if not requests or len(set(custom_ids)) != len(custom_ids) or None in custom_ids:
+            return self._error(400, "invalid_request_error", "requests need unique custom_id values")
+
+        now = datetime.now(timezone.utc)
+        batch_id = f"msgbatch_local_{uuid.uuid4().hex}"
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "in_progress",
+            "request_counts": {
+                "processing": len(requests),
+                "succeeded": 0,
+                "errored": 0,
+                "canceled": 0,
+                "expired": 0
+            },
+            "created_at": now.isoformat(),
+            "expires_at": (now + timedelta(hours=24)).isoformat(),
+            "ended_at": None,
+            "results_url": None,
+            "_base": str(url.copy_with(query=None)).rstrip("/")
+        }
+        self._requests[batch_id] = requests
+        self._polls[batch_id] = 0
+        return self._batch_response(batch_id)
+
+    def _retrieve(self, batch_id: str) -> httpx.Response:
+        batch = self.batches[batch_id]
+        if batch["processing_status"] == "in_progress":
+            self._polls[batch_id] += 1
+            if self._polls[batch_id] >= self.polls_until_ended:
+                return self._finish(batch_id)
+        return self._batch_response(batch_id)
+
+    def _finish(self, batch_id: str, canceled: bool = False) -> httpx.Response:
+        batch = self.batches[batch_id]
+        if batch["processing_status"] == "ended":
+            return self._batch_response(batch_id)
+
+        counts = {"processing": 0, "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0}
+        results = []
+        for item in self._requests[batch_id]:
+            text = None if canceled else self.responder(item["params"])
+            if canceled:
+                result = {"type": "canceled"}
+            elif text is None:
+                result = {"type": "errored", "error": {
+                    "type": "error",
+                    "error": {"type": "invalid_request_error", "message": "Rejected by the local responder"}
+                }}
+            else:
+                result = {"type": "succeeded", "message": {
+                    "id": f"msg_local_{uuid.uuid4().hex}",
+                    "type": "message",
+                    "role": "assistant",
+                    "model": item["params"].get("model"),
+                    "content": [{"type": "text", "text": text}],
+                    "stop_reason": "end_turn",
+                    "usage": self._usage(item["params"], text)
+                }}
+            counts[result["type"]] += 1
+            results.append({"custom_id": item["custom_id"], "result": result})
+
+        batch.update(
+            processing_status="ended",
+            request_counts=counts,
+            ended_at=datetime.now(timezone.utc).isoformat(),
+            results_url=f"{batch['_base']}/{batch_id}/results"
+        )
+        self._requests[batch_id] = results
+        return self._batch_response(batch_id)
+
+    def _usage(self, params: Dict[str, Any], text: str) -> Dict[str, int]:
+        """
+        Estimated token usage.
+
+        System blocks marked for caching count as cache writes, then reads,
+        when they reach the API's minimum cacheable length; shorter ones count
+        as normal input, as the API would not cache them.
+        """
+        usage = {"input_tokens": 0, "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0,
+                 "output_tokens": estimate_tokens(text)}
+        system = params.get("system") or []
+        if isinstance(system, str):
+            system = [{"type": "text", "text": system}]
+        for block in system:
+            tokens = estimate_tokens(block["text"])
+            if not block.get("cache_control") or not is_cacheable(block["text"]):
+                usage["input_tokens"] += tokens
+            elif block["text"] in self._cached_prefixes:
+                usage["cache_read_input_tokens"] += tokens
+            else:
+                self._cached_prefixes.add(block["text"])
+                usage["cache_creation_input_tokens"] += tokens
+        for message in params.get("messages", []):
+            if isinstance(message["content"], str):
+                usage["input_tokens"] += estimate_tokens(message["content"])
+        return usage
+
+    def _results(self, batch_id: str) -> httpx.Response:
+        if self.batches[batch_id]["processing_status"] != "ended":
+            return self._error(400, "invalid_request_error", "Batch has not ended yet")
+        lines = "\n".join(json.dumps(item, ensure_ascii=False) for item in self._requests[batch_id])
+        return httpx.Response(200, content=lines.encode(), headers={"content-type": "application/x-jsonl"})
+
+    def _batch_response(self, batch_id: str) -> httpx.Response:
+        batch = {key: value for key, value in self.batches[batch_id].items() if not key.startswith("_")}
+        return httpx.Response(200, json=batch)
+
+
+# Global local batch server (LLM_BATCH_TRANSPORT=local)
+local_batch_server = LocalBatchServer()
@@ -2,14 +2,137 @@
 LLM Service for AI-powered suggestion generation using Claude (Anthropic).
 """
 import json
-from typing import List, Dict, Optional, Any
+import re
+from typing import List, Dict, Optional, Any, Tuple
 from datetime import datetime
 import httpx
 import asyncio
-from decimal import Decimal
+import threading
+import weakref
 
 from ..config import settings
-from ..models import User, Profile, Transaction, Suggestion
+from ..models import User, Suggestion
+from .feature_store import FeatureVector
+from .llm_batches import MessageBatchClient, local_batch_server
+from .llm_cache import llm_cache
+from .prompt_builder import ContextBuilder, Prompt, excerpt, is_cacheable, table_rows
+
+WEEKDAYS_PT = ['Segunda-feira', 'Terça-feira', 'Quarta-feira',
+               'Quinta-feira', 'Sexta-feira', 'Sábado', 'Domingo']
+PERIODS_PT = {'morning': 'manhã', 'afternoon': 'tarde', 'evening': 'noite', 'night': 'madrugada'}
+
+# Context sections, trimmed lowest first when over LLM_CONTEXT_TOKEN_BUDGET
+PRIORITY_REJECTED = 1
+PRIORITY_ACCEPTED = 2
+PRIORITY_HABITS = 3
+PRIORITY_MERCHANTS = 4
+PRIORITY_CATEGORIES = 5
+PRIORITY_PREFERENCES = 6
+
+SUGGESTION_EXCERPT_CHARS = 80
+
+# Token counters of the `usage` field of Claude responses
+USAGE_FIELDS = ('input_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens', 'output_tokens')
+
+# Static system prompt: identical for every user and every call so it can be
+# cached. Anything that varies per request (e.g. the number of suggestions)
+# goes in the user message
+SUGGESTION_INSTRUCTIONS = """Você é um assistente financeiro pessoal que gera sugestões proativas e personalizadas para os usuários de um aplicativo de finanças. Cada mensagem do usuário traz o contexto de uma pessoa e, na última linha, quantas sugestões gerar.
+
+## Contexto recebido
+
+A mensagem do usuário pode conter as seções abaixo. Seções sem dados são omitidas, e as menos importantes podem vir resumidas quando o contexto é longo; nunca suponha informações que não foram enviadas.
+
+- "Usuário:": nome, idade e cônjuge (com a data de aniversário do cônjuge no formato dd/mm, quando informada).
+- "Preferências:": categorias de interesse e horários preferidos para receber sugestões (manhã, tarde, noite, madrugada).
+- "Gastos por categoria:": tabela com as colunas categoria, total_rs (total gasto em reais no período recente) e compras (número de compras).
+- "Estabelecimentos frequentes:": tabela com as colunas estabelecimento, compras e intervalo_dias (intervalo médio entre compras, ou "-" quando a compra não é recorrente).
+- "Dia com mais compras" e "horário mais comum": hábitos de compra ao longo da semana e do dia.
+- "Sugestões aceitas recentemente" e "Sugestões rejeitadas recentemente": trechos de sugestões anteriores e a reação do usuário a elas.
+- "Data atual": data de hoje (dd/mm/aaaa) e o dia da semana.
+
+Tabelas vêm com o nome das colunas na primeira linha e valores separados por "|". Valores monetários estão em reais, com ponto como separador decimal.
+
+## Tipos de sugestão
+
+- "anniversary": datas especiais do usuário ou do cônjuge (aniversários, comemorações). Use quando houver uma data próxima no contexto; mencione a data e, se possível, um presente ou plano compatível com os gastos e interesses do usuário.
+- "purchase": compras recorrentes ou previsíveis, por exemplo um estabelecimento com intervalo_dias definido cuja próxima compra está chegando.
+- "routine": organização do dia a dia e hábitos, considerando o dia e o horário em que o usuário costuma comprar.
+- "seasonal": oportunidades ligadas à época do ano (datas comemorativas, férias, volta às aulas, promoções sazonais), a partir da data atual.
+- "saving": economia, com base nas categorias de maior gasto; indique onde e quanto é possível economizar.
+- "health": bem-estar e saúde relacionados aos hábitos de consumo (farmácia, academia, alimentação).
+- "reminder": lembretes de contas, pagamentos ou compromissos deduzidos do contexto.
+- "recommendation": recomendações de produtos, serviços ou lugares alinhadas às categorias de interesse.
+
+## Diretrizes
+
+1. Seja específico e mencione detalhes do contexto do usuário (nomes, estabelecimentos, categorias, valores e datas).
+2. Varie os tipos de sugestões; não gere duas sugestões com a mesma ideia.
+3. Considere datas importantes, padrões de gasto e preferências.
+4. Seja útil e prático, com uma ação clara que o usuário possa tomar.
+5. Use um tom amigável e personalizado, tratando o usuário pelo primeiro nome quando informado.
+6. Evite sugestões genéricas, que serviriam para qualquer pessoa.
+7. Não repita sugestões rejeitadas recentemente nem variações delas; sugestões parecidas com as aceitas tendem a ser bem recebidas.
+8. Não invente valores, datas, nomes ou estabelecimentos que não estejam no contexto.
+9. Escreva em português do Brasil; valores no formato R$ 1.234,56 e datas no formato dd/mm.
+
+## Formato da resposta
+
+Responda apenas com um objeto JSON, sem texto antes ou depois, com a seguinte estrutura:
+{
+  "suggestions": [
+    {
+      "type": "anniversary|purchase|routine|seasonal|saving|health|reminder|recommendation",
+      "content": "Texto da sugestão personalizada",
+      "priority": 1-10,
+      "reasoning": "Breve explicação do porquê desta sugestão",
+      "category": "categoria relacionada"
+    }
+  ]
+}
+
+Regras dos campos:
+- "type": um dos tipos listados acima, em minúsculas.
+- "content": o texto mostrado ao usuário, com uma ou duas frases e no máximo 200 caracteres.
+- "priority": inteiro de 1 a 10. Use 8 a 10 para algo com prazo nos próximos dias (um aniversário, uma conta), 4 a 7 para oportunidades relevantes sem urgência e 1 a 3 para ideias opcionais.
+- "reasoning": uma frase, para uso interno, citando os dados do contexto que motivaram a sugestão.
+- "category": a categoria de gasto relacionada, como aparece no contexto (por exemplo "alimentação" ou "transporte"), ou "general" quando não houver uma.
+
+## Exemplos
+
+Para um usuário chamado Carlos, com cônjuge Ana (aniversário em 14/06), data atual 10/06, 6 compras em "restaurantes" somando R$ 540,00 e compras no "Posto Shell" a cada 7 dias, boas sugestões seriam:
+{
+  "suggestions": [
+    {
+      "type": "anniversary",
+      "content": "Carlos, o aniversário da Ana é sexta, dia 14/06! Que tal reservar hoje um jantar no restaurante preferido de vocês?",
+      "priority": 9,
+      "reasoning": "Aniversário da cônjuge em 4 dias e gasto frequente em restaurantes",
+      "category": "restaurantes"
+    },
+    {
+      "type": "saving",
+      "content": "Você gastou R$ 540,00 em restaurantes recentemente. Trocar dois jantares fora por refeições em casa pode render uns R$ 150,00 no mês.",
+      "priority": 5,
+      "reasoning": "Restaurantes é a categoria de maior gasto, com 6 compras",
+      "category": "restaurantes"
+    },
+    {
+      "type": "purchase",
+      "content": "Seu abastecimento no Posto Shell costuma ser semanal. Aproveite para conferir a calibragem dos pneus na próxima parada.",
+      "priority": 4,
+      "reasoning": "Compras recorrentes no Posto Shell a cada 7 dias",
+      "category": "transporte"
+    }
+  ]
+}
+
+Exemplos de sugestões ruins, que não devem ser geradas:
+- "Economize dinheiro este mês." (genérica, sem nenhum dado do usuário)
+- "Compre um presente para o aniversário da Maria em 20/07." (nome e data que não estão no contexto)
+- Uma sugestão de economia em restaurantes para um usuário que rejeitou recentemente uma sugestão igual.
+
+Gere sugestões criativas e verdadeiramente úteis para o usuário."""
 
 
 class LLMService:
@@ -21,83 +144,158 @@ class LLMService:
         self.max_tokens = settings.llm_max_tokens
         self.temperature = settings.llm_temperature
         self.base_url = "https://api.anthropic.com/v1/messages"
+        # One pooled client per event loop (app, sync AI engine path, scripts)
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._clients_lock = threading.Lock()
+        self._local_batch_client: Optional[httpx.AsyncClient] = None
+        self._usage = {"responses": 0, **{name: 0 for name in USAGE_FIELDS}}
+        self._usage_lock = threading.Lock()
+        self.batches = MessageBatchClient(self._get_batch_client, f"{self.base_url}/batches")
+    
+    def _build_client(self) -> httpx.AsyncClient:
+        """Create the pooled keep-alive client used for every Claude call."""
+        http2 = settings.llm_http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("HTTP/2 requested for LLM client but 'h2' is not installed; using HTTP/1.1")
+                http2 = False
+        
+        return httpx.AsyncClient(
+            http2=http2,
+            headers={
+                "x-api-key": self.api_key,
+                "anthropic-version": "2023-06-01",
+                "content-type": "application/json"
+            },
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_keepalive_connections,
+                keepalive_expiry=settings.llm_keepalive_expiry_seconds
+            ),
+            timeout=httpx.Timeout(
+                settings.llm_timeout_seconds,
+                connect=settings.llm_connect_timeout_seconds
+            )
+        )
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Get the pooled HTTP client of the running event loop, creating it on first use.
+        
+        Pooled connections belong to the event loop that opened them, so
+        every loop (the app's, the sync AI engine path, scripts) has its own
+        client. Loops that end close theirs with aclose().
+        """
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            client = self._clients.get(loop)
+            if client is None or client.is_closed:
+                client = self._build_client()
+                self._clients[loop] = client
+            return client
+    
+    def _get_batch_client(self) -> httpx.AsyncClient:
+        """Get the client for the batch endpoints (LLM_BATCH_TRANSPORT picks the server)."""
+        if settings.llm_batch_transport != "local":
+            return self._get_client()
+        # The in-process transport holds no connections, so one client serves every loop
+        with self._clients_lock:
+            if self._local_batch_client is None or self._local_batch_client.is_closed:
+                self._local_batch_client = httpx.AsyncClient(transport=local_batch_server.transport())
+            return self._local_batch_client
+    
+    async def aclose(self) -> None:
+        """Close the running event loop's HTTP client and its pooled connections."""
+        with self._clients_lock:
+            client = self._clients.pop(asyncio.get_running_loop(), None)
+            local_client, self._local_batch_client = self._local_batch_client, None
+        if client is not None and not client.is_closed:
+            await client.aclose()
+        if local_client is not None:
+            await local_client.aclose()
         
-    def _prepare_user_context(self, user: User, transactions: List[Transaction], 
+    def _prepare_user_context(self, user: User, features: Optional[FeatureVector], 
                             existing_suggestions: List[Suggestion]) -> str:
-        """Prepare comprehensive user context for the LLM."""
+        """
+        Prepare the user context for the LLM within LLM_CONTEXT_TOKEN_BUDGET.
+        
+        Sections are trimmed in this order when the context is too long:
+        rejected and accepted suggestions, weekday/hour habits, merchants,
+        categories, preferences. Profile and date are always kept.
+        """
         profile = user.profile
+        context = ContextBuilder(settings.llm_context_token_budget)
         
         # Basic profile info
-        context = f"""Informações do Usuário:
-- Nome: {profile.name or 'Não informado'}
-- Idade: {self._calculate_age(profile.birth_date) if profile.birth_date else 'Não informada'}
-- Cônjuge: {profile.spouse_name or 'Não informado'}"""
-
+        spouse = profile.spouse_name or 'Não informado'
         if profile.spouse_birth_date:
-            context += f" (aniversário: {profile.spouse_birth_date.strftime('%d/%m')})"
+            spouse += f" (aniversário: {profile.spouse_birth_date.strftime('%d/%m')})"
+        context.add("Usuário:", [
+            f"- Nome: {profile.name or 'Não informado'}",
+            f"- Idade: {self._calculate_age(profile.birth_date) if profile.birth_date else 'Não informada'}",
+            f"- Cônjuge: {spouse}"
+        ], required=True)
         
         # Preferences
-        if profile.preferences_json:
-            prefs = profile.preferences_json
-            context += f"\n\nPreferências:"
-            if prefs.get('categories_of_interest'):
-                context += f"\n- Categorias de interesse: {', '.join(prefs['categories_of_interest'])}"
-            if prefs.get('preferred_times'):
-                context += f"\n- Horários preferidos: {prefs['preferred_times']}"
-                
-        # Recent transactions analysis
-        if transactions:
-            context += "\n\nPadrões de Transações Recentes:"
-            
-            # Group by category
-            category_totals = {}
-            merchant_frequency = {}
-            
-            for t in transactions:
-                # Category spending
-                if t.category not in category_totals:
-                    category_totals[t.category] = 0
-                category_totals[t.category] += float(t.amount)
-                
-                # Merchant frequency
-                if t.description:
-                    if t.description not in merchant_frequency:
-                        merchant_frequency[t.description] = 0
-                    merchant_frequency[t.description] += 1
+        prefs = profile.preferences_json or {}
+        preference_rows = []
+        if prefs.get('categories_of_interest'):
+            preference_rows.append(f"- Categorias de interesse: {', '.join(prefs['categories_of_interest'])}")
+        preferred_times = prefs.get('preferred_times')
+        if isinstance(preferred_times, dict):
+            preferred_times = ', '.join(
+                PERIODS_PT.get(period, period) for period, enabled in preferred_times.items() if enabled
+            )
+        if preferred_times:
+            preference_rows.append(f"- Horários preferidos: {preferred_times}")
+        context.add("Preferências:", preference_rows, priority=PRIORITY_PREFERENCES)
+        
+        # Recent transactions analysis, from the precomputed feature vector
+        if features is not None and features.transaction_count:
+            context.add("Gastos por categoria:", table_rows(
+                ("categoria", "total_rs", "compras"),
+                ((cat, f"{totals.amount:.2f}", totals.count) for cat, totals in features.top_categories(5))
+            ), priority=PRIORITY_CATEGORIES, table=True)
             
-            # Top categories
-            top_categories = sorted(category_totals.items(), key=lambda x: x[1], reverse=True)[:5]
-            context += "\n- Principais categorias de gasto:"
-            for cat, total in top_categories:
-                context += f"\n  • {cat}: R$ {total:.2f}"
+            # Frequent merchants, with their usual interval when recurring
+            merchant_rows = []
+            for merchant in features.top_merchants(5):
+                interval = merchant.mean_interval_days
+                recurring = merchant.count >= 3 and interval and interval >= 1
+                merchant_rows.append((merchant.description, merchant.count, f"{interval:.0f}" if recurring else "-"))
+            context.add("Estabelecimentos frequentes:", table_rows(
+                ("estabelecimento", "compras", "intervalo_dias"), merchant_rows
+            ), priority=PRIORITY_MERCHANTS, table=True)
             
-            # Frequent merchants
-            frequent_merchants = sorted(merchant_frequency.items(), key=lambda x: x[1], reverse=True)[:5]
-            if frequent_merchants:
-                context += "\n- Estabelecimentos frequentes:"
-                for merchant, count in frequent_merchants:
-                    context += f"\n  • {merchant}: {count}x"
+            # Busiest weekday and hour
+            if any(features.weekday_counts):
+                busiest_day = max(range(7), key=lambda d: features.weekday_counts[d])
+                busiest_hour = max(range(24), key=lambda h: features.hour_counts[h])
+                context.add(None, [
+                    f"Dia com mais compras: {WEEKDAYS_PT[busiest_day]}; horário mais comum: {busiest_hour}h"
+                ], priority=PRIORITY_HABITS)
         
         # Recent suggestions and interactions
         if existing_suggestions:
             recent_accepted = [s for s in existing_suggestions if s.status == 'accepted'][-3:]
             recent_rejected = [s for s in existing_suggestions if s.status == 'rejected'][-3:]
-            
-            if recent_accepted:
-                context += "\n\nSugestões aceitas recentemente:"
-                for s in recent_accepted:
-                    context += f"\n- {s.content[:100]}..."
-                    
-            if recent_rejected:
-                context += "\n\nSugestões rejeitadas recentemente:"
-                for s in recent_rejected:
-                    context += f"\n- {s.content[:100]}..."
+            context.add("Sugestões aceitas recentemente:", [
+                f"- {excerpt(s.content, SUGGESTION_EXCERPT_CHARS)}" for s in recent_accepted
+            ], priority=PRIORITY_ACCEPTED)
+            context.add("Sugestões rejeitadas recentemente:", [
+                f"- {excerpt(s.content, SUGGESTION_EXCERPT_CHARS)}" for s in recent_rejected
+            ], priority=PRIORITY_REJECTED)
         
         # Current date context
-        context += f"\n\nData atual: {datetime.now().strftime('%d/%m/%Y')}"
-        context += f"\nDia da semana: {self._get_weekday_pt()}"
+        context.add(None, [
+            f"Data atual: {datetime.now().strftime('%d/%m/%Y')} ({self._get_weekday_pt()})"
+        ], required=True)
         
-        return context
+        return context.build()
     
     def _calculate_age(self, birth_date) -> int:
         """Calculate age from birth date."""
@@ -108,97 +306,199 @@ class LLMService:
     
     def _get_weekday_pt(self) -> str:
         """Get current weekday in Portuguese."""
-        weekdays = ['Segunda-feira', 'Terça-feira', 'Quarta-feira', 
-                   'Quinta-feira', 'Sexta-feira', 'Sábado', 'Domingo']
-        return weekdays[datetime.now().weekday()]
+        return WEEKDAYS_PT[datetime.now().weekday()]
+    
+    def _build_suggestions_prompt(self, user: User, features: Optional[FeatureVector],
+                                  existing_suggestions: List[Suggestion],
+                                  max_suggestions: int) -> Prompt:
+        """Build the suggestion generation prompt of a user."""
+        return Prompt(
+            system=SUGGESTION_INSTRUCTIONS,
+            user=(f"{self._prepare_user_context(user, features, existing_suggestions)}\n\n"
+                  f"Gere {max_suggestions} sugestões.")
+        )
+    
+    def _suggestions_params(self, prompt: Prompt) -> Dict[str, Any]:
+        """Messages API parameters of a suggestion generation request."""
+        return {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "system": self._system_blocks(prompt.system),
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt.user
+                }
+            ]
+        }
     
-    async def generate_suggestions(self, user: User, transactions: List[Transaction], 
+    def _system_blocks(self, system: str) -> List[Dict[str, Any]]:
+        """
+        System prompt content, marked as a prompt cache breakpoint.
+        
+        The API reuses the processed prefix for later requests with the same
+        system text. Prefixes shorter than the minimum cacheable length
+        (PROMPT_CACHE_MIN_TOKENS) would not be cached, so they are sent
+        without the mark.
+        """
+        block: Dict[str, Any] = {"type": "text", "text": system}
+        if settings.llm_prompt_caching and is_cacheable(system):
+            block["cache_control"] = {"type": "ephemeral"}
+        return [block]
+    
+    def _record_usage(self, message: Dict[str, Any]) -> None:
+        """Add the token counts of a Claude response to the usage counters."""
+        usage = message.get("usage") or {}
+        with self._usage_lock:
+            self._usage["responses"] += 1
+            for name in USAGE_FIELDS:
+                self._usage[name] += usage.get(name) or 0
+    
+    def usage_stats(self) -> Dict[str, Any]:
+        """
+        Get the token usage of the Claude responses since startup.
+        
+        Returns:
+            Token counters, with cache_hit_ratio the share of prompt tokens
+            read from the prompt cache
+        """
+        with self._usage_lock:
+            stats: Dict[str, Any] = dict(self._usage)
+        prompt_tokens = (stats['input_tokens'] + stats['cache_creation_input_tokens']
+                         + stats['cache_read_input_tokens'])
+        stats['cache_hit_ratio'] = round(stats['cache_read_input_tokens'] / prompt_tokens, 4) if prompt_tokens else 0.0
+        return stats
+    
+    @staticmethod
+    def _message_text(message: Dict[str, Any], default: str = "") -> str:
+        return message.get("content", [{}])[0].get("text", default)
+    
+    def _cache_key(self, prompt: Prompt, use_cache: bool) -> Optional[str]:
+        if not (use_cache and settings.llm_cache_enabled):
+            return None
+        return llm_cache.make_key(prompt.text, self.model, self.temperature, self.max_tokens)
+    
+    async def _cached_suggestions(self, cache_key: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        """Reuse the stored answer when the exact same request was made recently."""
+        if cache_key is None:
+            return None
+        # The cache does blocking SQLite I/O
+        cached = await asyncio.to_thread(llm_cache.get, cache_key)
+        return self._parse_suggestions(cached) if cached is not None else None
+    
+    async def _parse_and_cache(self, content: str, cache_key: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        suggestions = self._parse_suggestions(content)
+        # Only cache answers we could actually use
+        if suggestions is not None and cache_key:
+            await asyncio.to_thread(llm_cache.set, cache_key, content)
+        return suggestions
+    
+    async def generate_suggestions(self, user: User, features: Optional[FeatureVector], 
                                  existing_suggestions: List[Suggestion], 
-                                 max_suggestions: int = 5) -> List[Dict[str, Any]]:
+                                 max_suggestions: int = 5,
+                                 use_cache: bool = True) -> List[Dict[str, Any]]:
         """Generate personalized suggestions using Claude."""
         
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY not configured. Please set it in your .env file.")
         
-        # Prepare context
-        user_context = self._prepare_user_context(user, transactions, existing_suggestions)
+        prompt = self._build_suggestions_prompt(user, features, existing_suggestions, max_suggestions)
+        
+        cache_key = self._cache_key(prompt, use_cache)
+        cached = await self._cached_suggestions(cache_key)
+        if cached is not None:
+            return cached
         
-        # Create the prompt
-        prompt = f"""{user_context}
-
-Com base nas informações acima, gere {max_suggestions} sugestões proativas e personalizadas para ajudar este usuário. 
-
-Diretrizes:
-1. Seja específico e mencione detalhes do contexto do usuário
-2. Varie os tipos de sugestões (economia, lembretes, oportunidades, saúde, relacionamentos)
-3. Considere datas importantes, padrões de gasto e preferências
-4. Seja útil e prático, com ações claras
-5. Use um tom amigável e personalizado
-6. Evite sugestões genéricas
-
-Retorne as sugestões em formato JSON com a seguinte estrutura:
-{{
-  "suggestions": [
-    {{
-      "type": "anniversary|purchase|routine|seasonal|saving|health",
-      "content": "Texto da sugestão personalizada",
-      "priority": 1-10,
-      "reasoning": "Breve explicação do porquê desta sugestão",
-      "category": "categoria relacionada"
-    }}
-  ]
-}}
-
-Gere sugestões criativas e verdadeiramente úteis para o usuário."""
-
         try:
             # Call Claude API
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.base_url,
-                    headers={
-                        "x-api-key": self.api_key,
-                        "anthropic-version": "2023-06-01",
-                        "content-type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "max_tokens": self.max_tokens,
-                        "temperature": self.temperature,
-                        "messages": [
-                            {
-                                "role": "user",
-                                "content": prompt
-                            }
-                        ]
-                    },
-                    timeout=30.0
-                )
-                
-                if response.status_code != 200:
-                    print(f"Claude API error: {response.status_code} - {response.text}")
-                    return []
-                
-                # Parse response
-                result = response.json()
-                content = result.get("content", [{}])[0].get("text", "{}")
-                
-                # Extract JSON from response
-                try:
-                    # Find JSON in the response
-                    import re
-                    json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                    if json_match:
-                        suggestions_data = json.loads(json_match.group())
-                        return self._format_suggestions(suggestions_data.get("suggestions", []))
-                except json.JSONDecodeError:
-                    print(f"Failed to parse Claude response as JSON: {content}")
+            response = await self._get_client().post(
+                self.base_url,
+                json=self._suggestions_params(prompt)
+            )
+            
+            if response.status_code != 200:
+                print(f"Claude API error: {response.status_code} - {response.text}")
+                return []
+            
+            # Parse response
+            result = response.json()
+            self._record_usage(result)
+            content = self._message_text(result, "{}")
+            
+            suggestions = await self._parse_and_cache(content, cache_key)
+            if suggestions is not None:
+                return suggestions
                     
         except Exception as e:
             print(f"Error calling Claude API: {e}")
             
         return []
     
+    async def generate_suggestions_batch(
+        self,
+        users: Dict[str, Tuple[User, Optional[FeatureVector], List[Suggestion]]],
+        max_suggestions: int = 5,
+        use_cache: bool = True
+    ) -> Dict[str, Optional[List[Dict[str, Any]]]]:
+        """
+        Generate suggestions for many users with one Message Batches job.
+        
+        Users whose prompt has a cached answer are not sent. The call returns
+        once the job has ended, which can take minutes to hours.
+        
+        Args:
+            users: Mapping of custom_id (letters, digits, - and _) to the
+                user, their feature vector and their existing suggestions
+            max_suggestions: Suggestions requested per user
+            use_cache: Reuse and store answers in the LLM response cache
+        
+        Returns:
+            Mapping of custom_id to the suggestions, None for users whose
+            request failed or whose answer could not be parsed
+        """
+        if not self.api_key:
+            raise ValueError("ANTHROPIC_API_KEY not configured. Please set it in your .env file.")
+        
+        results: Dict[str, Optional[List[Dict[str, Any]]]] = {}
+        pending: Dict[str, Tuple[Prompt, Optional[str]]] = {}
+        for custom_id, (user, features, existing_suggestions) in users.items():
+            prompt = self._build_suggestions_prompt(user, features, existing_suggestions, max_suggestions)
+            cache_key = self._cache_key(prompt, use_cache)
+            cached = await self._cached_suggestions(cache_key)
+            if cached is not None:
+                results[custom_id] = cached
+            else:
+                pending[custom_id] = (prompt, cache_key)
+        
+        if pending:
+            messages = await self.batches.run({
+                custom_id: self._suggestions_params(prompt)
+                for custom_id, (prompt, _) in pending.items()
+            })
+            for custom_id, (_, cache_key) in pending.items():
+                message = messages.get(custom_id)
+                if message is None:
+                    results[custom_id] = None
+                    continue
+                self._record_usage(message)
+                results[custom_id] = await self._parse_and_cache(self._message_text(message, "{}"), cache_key)
+        
+        return results
+    
+    def _parse_suggestions(self, content: str) -> Optional[List[Dict[str, Any]]]:
+        """Extract and format the suggestions JSON from a Claude response text."""
+        try:
+            # Find JSON in the response
+            json_match = re.search(r'\{.*\}', content, re.DOTALL)
+            if json_match:
+                suggestions_data = json.loads(json_match.group())
+                return self._format_suggestions(suggestions_data.get("suggestions", []))
+        except json.JSONDecodeError:
+            print(f"Failed to parse Claude response as JSON: {content}")
+        
+        return None
+    
     def _format_suggestions(self, raw_suggestions: List[Dict]) -> List[Dict[str, Any]]:
         """Format suggestions from Claude into our database format."""
         formatted = []
@@ -250,31 +550,25 @@ Refine a sugestão com base no feedback, mantendo-a útil e personalizada.
 Retorne apenas o texto refinado da sugestão, sem explicações adicionais."""
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.base_url,
-                    headers={
-                        "x-api-key": self.api_key,
-                        "anthropic-version": "2023-06-01",
-                        "content-type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "max_tokens": 200,
-                        "temperature": 0.5,
-                        "messages": [
-                            {
-                                "role": "user",
-                                "content": prompt
-                            }
-                        ]
-                    },
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    return result.get("content", [{}])[0].get("text", "").strip()
+            response = await self._get_client().post(
+                self.base_url,
+                json={
+                    "model": self.model,
+                    "max_tokens": 200,
+                    "temperature": 0.5,
+                    "messages": [
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ]
+                }
+            )
+            
+            if response.status_code == 200:
+                result = response.json()
+                self._record_usage(result)
+                return self._message_text(result).strip()
                     
         except Exception as e:
             print(f"Error refining suggestion: {e}")
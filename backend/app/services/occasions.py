@@ -0,0 +1,208 @@
+"""
+Index of upcoming profile occasions.
+
+The next occurrence of every profile date that triggers date-based
+suggestions (own and spouse birthdays) is kept in the upcoming_occasions
+table. Rows follow profile changes through a session flush hook and are
+rolled forward to the following year once their occurrence has passed.
+
+The batch analysis asks this index which users have an occasion soon with
+one range query on next_date, and only runs the special-date analysis for
+them instead of loading and checking every profile.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import and_, bindparam, delete, insert, inspect, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from ..models import Profile, UpcomingOccasion, User
+from ..utils.dates import next_anniversary
+from .transaction_rollups import _attribute_before_flush
+
+# Profile date behind each occasion kind
+OCCASION_FIELDS = {
+    "birthday": "birth_date",
+    "spouse_birthday": "spouse_birth_date",
+}
+
+# Longest lookahead of AIEngine._analyze_special_dates
+SPECIAL_DATE_WINDOW_DAYS = 7
+
+
+def _today() -> date:
+    # Same clock as AIEngine._days_until_birthday
+    return datetime.now(timezone.utc).date()
+
+
+def _occasion_rows(user_id: UUID, dates: Dict[str, Optional[date]], today: date) -> List[Dict]:
+    """Rows of one user's occasions, from profile dates keyed by attribute name."""
+    return [
+        {
+            "user_id": user_id,
+            "kind": kind,
+            "original_date": dates[attr],
+            "next_date": next_anniversary(dates[attr], today)
+        }
+        for kind, attr in OCCASION_FIELDS.items()
+        if dates.get(attr) is not None
+    ]
+
+
+def _dates_changed(profile: Profile) -> bool:
+    state = inspect(profile)
+    return any(state.attrs[attr].history.has_changes() for attr in OCCASION_FIELDS.values())
+
+
+def apply_flush_to_occasions(session: Session) -> None:
+    """
+    Replace the occasions of users whose profile dates changed in a flush.
+
+    Called from the session after_flush hook.
+
+    Args:
+        session: Session being flushed
+    """
+    profiles = [obj for obj in session.new if isinstance(obj, Profile)] + [
+        obj for obj in session.dirty
+        if isinstance(obj, Profile) and session.is_modified(obj) and _dates_changed(obj)
+    ]
+    deleted_profiles = [obj for obj in session.deleted if isinstance(obj, Profile)]
+    deleted_users = {obj.id for obj in session.deleted if isinstance(obj, User)}
+
+    if not (profiles or deleted_profiles or deleted_users):
+        return
+
+    user_ids = (
+        {profile.user_id for profile in profiles}
+        | {_attribute_before_flush(profile, 'user_id') for profile in deleted_profiles}
+        | deleted_users
+    )
+
+    # SQLite does not enforce the FK cascade, so deleted users are cleared here too
+    connection = session.connection()
+    table = UpcomingOccasion.__table__
+    connection.execute(delete(table).where(table.c.user_id.in_(list(user_ids))))
+
+    today = _today()
+    rows = [
+        row
+        for profile in profiles if profile.user_id not in deleted_users
+        for row in _occasion_rows(
+            profile.user_id,
+            {attr: getattr(profile, attr) for attr in OCCASION_FIELDS.values()},
+            today
+        )
+    ]
+    if rows:
+        connection.execute(insert(table), rows)
+
+
+def roll_forward_occasions(connection: Connection) -> int:
+    """
+    Move occurrences that have passed to the following year.
+
+    Args:
+        connection: Connection to execute on (committed by the caller)
+
+    Returns:
+        int: Number of occasions moved
+    """
+    table = UpcomingOccasion.__table__
+    today = _today()
+    passed = connection.execute(
+        select(table.c.user_id, table.c.kind, table.c.original_date).where(table.c.next_date < today)
+    ).all()
+    if not passed:
+        return 0
+
+    connection.execute(
+        update(table).where(and_(
+            table.c.user_id == bindparam('occasion_user_id'),
+            table.c.kind == bindparam('occasion_kind')
+        )).values(next_date=bindparam('occasion_next_date')),
+        [
+            {
+                'occasion_user_id': user_id,
+                'occasion_kind': kind,
+                'occasion_next_date': next_anniversary(original_date, today)
+            }
+            for user_id, kind, original_date in passed
+        ]
+    )
+    return len(passed)
+
+
+def users_with_upcoming_occasions(db: Session, days: int = SPECIAL_DATE_WINDOW_DAYS,
+                                  user_ids: Optional[Iterable[UUID]] = None) -> Set[UUID]:
+    """
+    Get the users with an occasion in the next `days` days (today excluded).
+
+    Passed occurrences are rolled forward first, in a session of their own
+    so the caller's session is not committed.
+
+    Args:
+        db: Database session
+        days: Days to look ahead
+        user_ids: Optional users to restrict the search to
+
+    Returns:
+        Set of user IDs
+    """
+    with Session(db.get_bind()) as roll_db:
+        if roll_forward_occasions(roll_db.connection()):
+            roll_db.commit()
+
+    today = _today()
+    query = db.query(UpcomingOccasion.user_id).filter(
+        UpcomingOccasion.next_date > today,
+        UpcomingOccasion.next_date <= today + timedelta(days=days)
+    )
+    if user_ids is not None:
+        query = query.filter(UpcomingOccasion.user_id.in_(list(user_ids)))
+
+    return {user_id for (user_id,) in query.distinct()}
+
+
+def rebuild_occasions(db: Session) -> None:
+    """
+    Recompute every user's occasions from their profile.
+
+    Args:
+        db: Database session (committed by the caller)
+    """
+    connection = db.connection()
+    connection.execute(delete(UpcomingOccasion.__table__))
+
+    today = _today()
+    attrs = list(OCCASION_FIELDS.values())
+    rows = []
+    for user_id, *values in db.query(Profile.user_id, *[getattr(Profile, attr) for attr in attrs]):
+        rows.extend(_occasion_rows(user_id, dict(zip(attrs, values)), today))
+
+    if rows:
+        connection.execute(insert(UpcomingOccasion.__table__), rows)
+
+
+def backfill_occasions_if_empty(db: Session) -> bool:
+    """
+    Build the occasion index from existing profiles on first start.
+
+    Args:
+        db: Database session
+
+    Returns:
+        bool: True if a backfill was performed
+    """
+    if db.query(UpcomingOccasion.user_id).first() is not None:
+        return False
+    if db.query(Profile.id).filter(
+        (Profile.birth_date.isnot(None)) | (Profile.spouse_birth_date.isnot(None))
+    ).first() is None:
+        return False
+
+    rebuild_occasions(db)
+    db.commit()
+    return True
@@ -0,0 +1,157 @@
+"""
+Token-budgeted prompt construction.
+
+A prompt is a static system prefix (instructions, output format and
+examples, byte-identical across users and long enough for the API to cache
+it) followed by the per-user context.
+
+A context is a list of sections, each a header plus data rows and a
+priority. Once all sections are added, the rendered text is measured
+against a token budget; while it is over, rows are dropped from the end of
+the lowest-priority section (a section without rows disappears with its
+header), then the next one. Required sections are never trimmed.
+
+Tables render as pipe-separated rows under a one-line column header, which
+is several times shorter than one prose bullet per item.
+"""
+import math
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Sequence
+
+# Portuguese prose mixed with numbers averages a little over 3.5 characters
+# per Claude token; erring low keeps real prompts within the budget
+CHARS_PER_TOKEN = 3.5
+
+
+# Shortest prefix the API caches (Sonnet and Opus models; Haiku needs 2048).
+# Shorter prefixes marked with cache_control are processed as normal input
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+# Densest text seen per token (JSON and plain Portuguese words); a prefix
+# counted as cacheable with it reaches the minimum whatever its content
+MAX_CHARS_PER_TOKEN = 4.5
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text without calling the API."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def is_cacheable(text: str) -> bool:
+    """Check whether a prompt prefix is surely long enough for the API to cache it."""
+    return len(text) / MAX_CHARS_PER_TOKEN >= PROMPT_CACHE_MIN_TOKENS
+
+
+def table_rows(columns: Sequence[str], rows: Iterable[Sequence[object]]) -> List[str]:
+    """
+    Format a compact table.
+
+    Args:
+        columns: Column names
+        rows: Row values, in column order
+
+    Returns:
+        The column header line followed by one line per row
+    """
+    def cell(value: object) -> str:
+        return str(value).replace("|", "/").replace("\n", " ")
+
+    return ["|".join(columns)] + ["|".join(cell(value) for value in row) for row in rows]
+
+
+def excerpt(text: str, length: int) -> str:
+    """Shorten a text to at most `length` characters, on a word boundary."""
+    text = " ".join(text.split())
+    if len(text) <= length:
+        return text
+    return text[:length - 1].rsplit(" ", 1)[0] + "…"
+
+
+@dataclass(frozen=True)
+class Prompt:
+    """A static system prefix and the per-user message."""
+    system: str
+    user: str
+
+    @property
+    def text(self) -> str:
+        """Full prompt text, e.g. for cache keys."""
+        return f"{self.system}\n\n{self.user}"
+
+
+@dataclass
+class Section:
+    """Part of a context: header lines, trimmable data rows and their value."""
+    header: List[str]
+    rows: List[str]
+    priority: int  # Lower priorities are trimmed first
+    required: bool = False
+
+    def render(self) -> str:
+        if not self.rows:
+            return ""
+        return "\n".join(self.header + self.rows)
+
+
+@dataclass
+class ContextBuilder:
+    """Collect context sections and render them within a token budget."""
+    token_budget: int
+    sections: List[Section] = field(default_factory=list)
+    estimated_tokens: int = 0  # Of the last build
+
+    def add(self, title: Optional[str], rows: List[str], priority: int = 0,
+            required: bool = False, table: bool = False) -> None:
+        """
+        Add a section; sections without rows are ignored.
+
+        Args:
+            title: Heading line, or None
+            rows: Content lines (for tables, as returned by table_rows)
+            priority: Trimming order, lowest first
+            required: Never trim this section
+            table: The first row is the column header and is kept with the title
+        """
+        header = [title] if title else []
+        if table:
+            header, rows = header + rows[:1], rows[1:]
+        if rows:
+            self.sections.append(Section(header, list(rows), priority, required))
+
+    def render(self) -> str:
+        return "\n\n".join(text for text in (section.render() for section in self.sections) if text)
+
+    def build(self) -> str:
+        """
+        Render the context, trimming low-priority rows while it is over budget.
+
+        The rendered length is updated as rows are dropped instead of
+        rendering the whole context again after each one.
+
+        Returns:
+            The context text
+        """
+        budget_chars = self.token_budget * CHARS_PER_TOKEN
+        visible = len(self.sections)
+        # Sections are joined by a blank line, rows by a newline
+        length = sum(len(section.render()) for section in self.sections) + 2 * max(0, visible - 1)
+
+        trimmable = sorted(
+            (section for section in self.sections if not section.required),
+            key=lambda section: section.priority
+        )
+        for section in trimmable:
+            while section.rows and length > budget_chars:
+                row = section.rows.pop()
+                if section.rows:
+                    length -= len(row) + 1
+                else:
+                    # The header goes with the last row, and so does one separator
+                    length -= len("\n".join(section.header + [row]))
+                    visible -= 1
+                    if visible:
+                        length -= 2
+
+        text = self.render()
+        self.estimated_tokens = estimate_tokens(text)
+        return text
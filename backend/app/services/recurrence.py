@@ -0,0 +1,126 @@
+"""
+Vectorized recurrence detection.
+
+The recent purchases of every merchant of a batch of users (kept in their
+feature vectors, see feature_store.py) are laid out in flat NumPy arrays,
+sorted by merchant and time. Inter-arrival deltas, their median (the
+period), their median absolute deviation (how regular the period is) and
+the next due date are then computed for all merchants at once.
+
+Medians make the period robust to the odd skipped or extra purchase, which
+skews an average over the whole span.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Sequence
+from uuid import UUID
+
+import numpy as np
+
+from .feature_store import FeatureVector
+
+SECONDS_PER_DAY = 86400
+
+# Intervals may deviate from the period by this fraction (or MIN_MAD_DAYS)
+# and still count as a routine
+MAX_MAD_RATIO = 0.5
+MIN_MAD_DAYS = 2.0
+
+
+@dataclass
+class Recurrence:
+    """Periodicity of one (category, description) merchant of a user."""
+    user_id: UUID
+    category: str
+    description: str
+    count: int  # Transactions within the feature window
+    period_days: float  # Median days between purchases
+    mad_days: float  # Median absolute deviation of those intervals
+    typical_amount: Decimal  # Median amount
+    last_date: datetime
+    next_due: datetime
+
+    @property
+    def is_regular(self) -> bool:
+        """Purchases happen on different days at a consistent interval."""
+        return self.period_days >= 1 and self.mad_days <= max(MIN_MAD_DAYS, MAX_MAD_RATIO * self.period_days)
+
+
+def _group_medians(values: np.ndarray, groups: np.ndarray, group_count: int) -> np.ndarray:
+    """
+    Median of the values of each group.
+
+    Args:
+        values: Values
+        groups: Group number of each value (0 to group_count - 1)
+        group_count: Number of groups
+
+    Returns:
+        Array of medians, NaN for groups without values
+    """
+    order = np.lexsort((values, groups))
+    sorted_values = values[order]
+    counts = np.bincount(groups, minlength=group_count)
+    starts = np.cumsum(counts) - counts
+
+    medians = np.full(group_count, np.nan)
+    present = counts > 0
+    lower = starts[present] + (counts[present] - 1) // 2
+    upper = starts[present] + counts[present] // 2
+    medians[present] = (sorted_values[lower] + sorted_values[upper]) / 2
+    return medians
+
+
+def detect_recurrences(vectors: Sequence[FeatureVector],
+                       min_count: int = 3) -> Dict[UUID, List[Recurrence]]:
+    """
+    Detect the periodicity of every merchant of a batch of users.
+
+    Args:
+        vectors: Feature vectors of the users
+        min_count: Minimum transactions for a merchant to be considered
+
+    Returns:
+        Mapping of user ID to the recurrences of their merchants
+    """
+    recurrences: Dict[UUID, List[Recurrence]] = {vector.user_id: [] for vector in vectors}
+    merchants = [
+        (vector.user_id, merchant)
+        for vector in vectors
+        for merchant in vector.merchants.values()
+        if merchant.count >= min_count and len(merchant.events) >= 2
+    ]
+    if not merchants:
+        return recurrences
+
+    # Columnar layout: one row per event, grouped by merchant, oldest first
+    sizes = np.array([len(merchant.events) for _, merchant in merchants])
+    events = np.array([event for _, merchant in merchants for event in merchant.events], dtype=np.float64)
+    times, amounts = events[:, 0], events[:, 1]
+    groups = np.repeat(np.arange(len(merchants)), sizes)
+
+    # Inter-arrival deltas, without the ones spanning two merchants
+    same_merchant = groups[1:] == groups[:-1]
+    deltas = (np.diff(times) / SECONDS_PER_DAY)[same_merchant]
+    delta_groups = groups[1:][same_merchant]
+
+    periods = _group_medians(deltas, delta_groups, len(merchants))
+    mads = _group_medians(np.abs(deltas - periods[delta_groups]), delta_groups, len(merchants))
+    typical_amounts = _group_medians(amounts, groups, len(merchants))
+
+    for i, (user_id, merchant) in enumerate(merchants):
+        period = float(periods[i])
+        recurrences[user_id].append(Recurrence(
+            user_id=user_id,
+            category=merchant.category,
+            description=merchant.description,
+            count=merchant.count,
+            period_days=period,
+            mad_days=float(mads[i]),
+            typical_amount=Decimal(str(round(float(typical_amounts[i]), 2))),
+            last_date=merchant.last_date,
+            next_due=merchant.last_date + timedelta(days=period)
+        ))
+
+    return recurrences
@@ -0,0 +1,295 @@
+"""
+In-app scheduler for the fleet-wide AI analysis.
+
+Every SUGGESTION_GENERATION_INTERVAL_HOURS a new analysis run starts. Its
+users are split into ANALYSIS_SCHEDULER_SHARDS ranges of their (uniformly
+random) UUIDs, and one shard is analyzed per tick, evenly spread over the
+interval, instead of the whole fleet at once from a cron job.
+
+All processes run the scheduler loop, but only the holder of the
+scheduler_leases row does the work. Run progress is stored in analysis_runs
+after every shard, so whichever process holds the lease next resumes an
+interrupted run from its next shard.
+"""
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import AnalysisRun, SchedulerLease, User
+from .batch_analysis import run_batch_analysis
+
+LEASE_NAME = "ai_analysis"
+
+# UUIDs are 128-bit numbers; shards are equal slices of that space
+UUID_SPACE = 2 ** 128
+
+
+def _as_utc(value: datetime) -> datetime:
+    """SQLite returns naive datetimes; they were stored as UTC."""
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def shard_bounds(shard: int, shard_count: int) -> Tuple[UUID, Optional[UUID]]:
+    """
+    Get the user ID range of a shard.
+
+    UUIDs sort the same way as their integer value on every backend (native
+    UUID, BINARY(16) and CHAR(36) storage), so a shard is a primary key range.
+
+    Args:
+        shard: Shard number (0-based)
+        shard_count: Number of shards
+
+    Returns:
+        Tuple of (inclusive lower bound, exclusive upper bound or None for the last shard)
+    """
+    lower = UUID(int=shard * UUID_SPACE // shard_count)
+    upper = None
+    if shard + 1 < shard_count:
+        upper = UUID(int=(shard + 1) * UUID_SPACE // shard_count)
+    return lower, upper
+
+
+class AnalysisScheduler:
+    """Run the periodic AI analysis in shards, on the process holding the lease."""
+
+    def __init__(self, shards: Optional[int] = None,
+                 poll_seconds: Optional[float] = None,
+                 lease_seconds: Optional[int] = None):
+        self.shards = max(1, shards or settings.analysis_scheduler_shards)
+        self.poll_seconds = poll_seconds or settings.analysis_scheduler_poll_seconds
+        self.lease_seconds = lease_seconds or settings.analysis_scheduler_lease_seconds
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {
+            "shards_processed": 0,
+            "users_processed": 0,
+            "suggestions_created": 0
+        }
+
+    def start(self) -> None:
+        """Start the scheduler loop on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the loop and hand the lease over to another process."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self.is_leader:
+            await asyncio.to_thread(self._release_lease)
+            self.is_leader = False
+
+    def stats(self) -> Dict[str, object]:
+        """Get the scheduler counters."""
+        return {**self._stats, "is_leader": self.is_leader}
+
+    @property
+    def interval(self) -> timedelta:
+        return timedelta(hours=settings.suggestion_generation_interval_hours)
+
+    async def _run(self) -> None:
+        """Renew the lease and process the due shard, once per poll."""
+        while True:
+            try:
+                self.is_leader = await asyncio.to_thread(self._acquire_lease)
+                if self.is_leader:
+                    await self._tick()
+            except Exception as e:
+                print(f"Error in analysis scheduler: {e}")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def _tick(self) -> None:
+        """Analyze the next shard of the current run if it is due."""
+        due = await asyncio.to_thread(self._due_shard)
+        if due is None:
+            return
+
+        run_id, shard, shard_count = due
+        user_ids = await asyncio.to_thread(self._load_shard_user_ids, shard, shard_count)
+
+        result = {"users_processed": 0, "users_failed": 0, "suggestions_created": 0}
+        if user_ids:
+            batch = asyncio.create_task(run_batch_analysis(user_ids=user_ids, verbose=False))
+            # Long shards (slow LLM calls) must not let the lease expire
+            keep_lease = asyncio.create_task(self._keep_lease(batch))
+            try:
+                result = await batch
+            except asyncio.CancelledError:
+                # Our own cancellation (stop()) rather than a lost lease
+                if self.is_leader:
+                    raise
+            finally:
+                keep_lease.cancel()
+
+        # The new leader runs this shard again; its progress is not ours to record
+        if not self.is_leader or not await asyncio.to_thread(self._complete_shard, run_id, shard, result):
+            print(f"Analysis run {run_id}: lost the scheduler lease, abandoned shard {shard + 1}/{shard_count}")
+            return
+
+        self._stats["shards_processed"] += 1
+        self._stats["users_processed"] += result["users_processed"]
+        self._stats["suggestions_created"] += result["suggestions_created"]
+        print(
+            f"Analysis run {run_id}: shard {shard + 1}/{shard_count} done, "
+            f"{result['users_processed']} users, {result['suggestions_created']} suggestions"
+        )
+
+    async def _keep_lease(self, batch: asyncio.Task) -> None:
+        """Renew the lease while a shard runs, aborting the shard if it is lost."""
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            self.is_leader = await asyncio.to_thread(self._acquire_lease)
+            if not self.is_leader:
+                batch.cancel()
+                return
+
+    def _acquire_lease(self) -> bool:
+        """Take or renew the leader lease (worker thread)."""
+        db = SessionLocal()
+        try:
+            now = datetime.now(timezone.utc)
+            expires_at = now + timedelta(seconds=self.lease_seconds)
+
+            acquired = db.execute(
+                update(SchedulerLease).where(
+                    SchedulerLease.name == LEASE_NAME,
+                    or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at < now)
+                ).values(holder=self.holder, expires_at=expires_at)
+            ).rowcount
+            db.commit()
+            if acquired:
+                return True
+
+            if db.get(SchedulerLease, LEASE_NAME) is not None:
+                return False
+
+            # First process ever: create the lease row
+            try:
+                db.add(SchedulerLease(name=LEASE_NAME, holder=self.holder, expires_at=expires_at))
+                db.commit()
+                return True
+            except IntegrityError:
+                db.rollback()
+                return False
+        finally:
+            db.close()
+
+    def _release_lease(self) -> None:
+        """Expire our lease so another process can take over immediately (worker thread)."""
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(SchedulerLease).where(
+                    SchedulerLease.name == LEASE_NAME,
+                    SchedulerLease.holder == self.holder
+                ).values(expires_at=datetime.now(timezone.utc))
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _due_shard(self) -> Optional[Tuple[UUID, int, int]]:
+        """
+        Find the shard to analyze now, starting a new run when one is due (worker thread).
+
+        Returns:
+            Tuple of (run ID, shard, shard count), or None if nothing is due
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.now(timezone.utc)
+            run = db.query(AnalysisRun).filter(
+                AnalysisRun.status == "running"
+            ).order_by(AnalysisRun.started_at.desc()).first()
+
+            if run is None:
+                last_run = db.query(AnalysisRun).order_by(AnalysisRun.started_at.desc()).first()
+                if last_run is not None and _as_utc(last_run.started_at) + self.interval > now:
+                    return None
+
+                run = AnalysisRun(
+                    status="running",
+                    shard_count=self.shards,
+                    next_shard=0,
+                    users_processed=0,
+                    users_failed=0,
+                    suggestions_created=0,
+                    started_at=now
+                )
+                db.add(run)
+                db.commit()
+
+            # Shard k of a run is due k shard-spacings after the run started
+            spacing = self.interval / run.shard_count
+            if now < _as_utc(run.started_at) + spacing * run.next_shard:
+                return None
+
+            return run.id, run.next_shard, run.shard_count
+        finally:
+            db.close()
+
+    def _load_shard_user_ids(self, shard: int, shard_count: int) -> List[UUID]:
+        """Load the active users whose ID falls in a shard (worker thread)."""
+        lower, upper = shard_bounds(shard, shard_count)
+        db = SessionLocal()
+        try:
+            query = db.query(User.id).filter(User.is_active == True, User.id >= lower)
+            if upper is not None:
+                query = query.filter(User.id < upper)
+            return [user_id for (user_id,) in query.all()]
+        finally:
+            db.close()
+
+    def _complete_shard(self, run_id: UUID, shard: int, result: Dict[str, int]) -> bool:
+        """
+        Record a processed shard and close the run after the last one (worker thread).
+
+        Returns:
+            bool: False if the lease was lost, in which case nothing is recorded
+        """
+        db = SessionLocal()
+        try:
+            # The lease may have expired since the last renewal
+            lease = db.get(SchedulerLease, LEASE_NAME, with_for_update=True)
+            if (lease is None or lease.holder != self.holder
+                    or _as_utc(lease.expires_at) <= datetime.now(timezone.utc)):
+                self.is_leader = False
+                return False
+
+            run = db.get(AnalysisRun, run_id)
+            # Another leader already recorded this shard
+            if run is None or run.next_shard != shard:
+                return True
+
+            run.next_shard = shard + 1
+            run.users_processed += result["users_processed"]
+            run.users_failed += result["users_failed"]
+            run.suggestions_created += result["suggestions_created"]
+            if run.next_shard >= run.shard_count:
+                run.status = "completed"
+                run.finished_at = datetime.now(timezone.utc)
+            db.commit()
+            return True
+        finally:
+            db.close()
+
+
+# Global analysis scheduler instance
+analysis_scheduler = AnalysisScheduler()
@@ -0,0 +1,200 @@
+"""
+Bulk transaction import.
+
+Rows are validated one by one so a bad row is reported without failing the
+rest of the request, then inserted in batches with a single Core executemany
+per batch instead of one ORM object (and one refresh SELECT) per row.
+"""
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterable, List, Tuple
+from uuid import UUID
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import Transaction
+from ..models.transaction import month_day
+from ..schemas import TransactionCreate, TransactionImportError, TransactionImportResult
+from .feature_store import add_rows_to_features
+from .incremental_analysis import incremental_analyzer
+from .transaction_rollups import add_rows_to_rollups
+
+
+def validation_messages(error: ValidationError) -> List[str]:
+    """
+    Flatten a pydantic validation error into readable messages.
+
+    Args:
+        error: Validation error
+
+    Returns:
+        List of "field: message" strings
+    """
+    messages = []
+    for detail in error.errors(include_url=False):
+        field = ".".join(str(part) for part in detail["loc"])
+        messages.append(f"{field}: {detail['msg']}" if field else detail["msg"])
+    return messages
+
+
+def insert_transactions(session: Session, user_id: UUID,
+                        transactions: List[TransactionCreate]) -> List[UUID]:
+    """
+    Insert validated transactions with one executemany and update the rollups
+    and feature vectors.
+
+    IDs are generated here so they are known without a RETURNING round trip.
+    The caller commits.
+
+    Args:
+        session: Database session
+        user_id: Owner of the transactions
+        transactions: Validated transactions
+
+    Returns:
+        List of the new transaction IDs, in input order
+    """
+    connection = session.connection()
+    dialect_name = connection.dialect.name
+    created_at = datetime.now(timezone.utc)
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "user_id": user_id,
+            "type": transaction.type,
+            "amount": transaction.amount,
+            "date": transaction.date,
+            # Set by the ORM on flush; Core inserts must compute it themselves
+            "month_day": month_day(transaction.date, dialect_name),
+            "category": transaction.category,
+            "location": transaction.location,
+            "description": transaction.description,
+            "created_at": created_at
+        }
+        for transaction in transactions
+    ]
+
+    connection.execute(insert(Transaction.__table__), rows)
+    add_rows_to_rollups(connection, rows)
+    add_rows_to_features(connection, rows)
+
+    return [row["id"] for row in rows]
+
+
+async def import_transactions(db: AsyncSession, user_id: UUID,
+                              rows: AsyncIterator[Tuple[int, object]]) -> TransactionImportResult:
+    """
+    Validate and insert a stream of raw transaction rows.
+
+    Each batch of settings.transaction_import_batch_size valid rows is
+    inserted and committed on its own, so memory stays bounded for streamed
+    bodies. If a batch fails in the database, its rows are reported as
+    failed and the import continues.
+
+    Args:
+        db: Database session
+        user_id: Owner of the transactions
+        rows: Async iterator of (row number, decoded JSON value or ValueError)
+
+    Returns:
+        TransactionImportResult: Counts, created IDs and per-row errors
+    """
+    received = 0
+    ids: List[UUID] = []
+    errors: List[TransactionImportError] = []
+    batch: List[Tuple[int, TransactionCreate]] = []
+
+    async def flush_batch() -> None:
+        try:
+            transactions = [transaction for _, transaction in batch]
+            batch_ids = await db.run_sync(insert_transactions, user_id, transactions)
+            await db.commit()
+            ids.extend(batch_ids)
+            incremental_analyzer.notify(user_id, transactions)
+        except Exception as e:
+            await db.rollback()
+            print(f"Error importing transactions for user {user_id}: {e}")
+            errors.extend(
+                TransactionImportError(row=row, errors=["Could not be saved"])
+                for row, _ in batch
+            )
+        batch.clear()
+
+    async for row, data in rows:
+        received += 1
+        if isinstance(data, ValueError):
+            errors.append(TransactionImportError(row=row, errors=[str(data)]))
+            continue
+        try:
+            batch.append((row, TransactionCreate.model_validate(data)))
+        except ValidationError as e:
+            errors.append(TransactionImportError(row=row, errors=validation_messages(e)))
+            continue
+
+        if len(batch) >= settings.transaction_import_batch_size:
+            await flush_batch()
+
+    if batch:
+        await flush_batch()
+
+    return TransactionImportResult(
+        received=received,
+        created=len(ids),
+        failed=len(errors),
+        ids=ids,
+        errors=errors
+    )
+
+
+async def iterate_rows(values: Iterable[object]) -> AsyncIterator[Tuple[int, object]]:
+    """
+    Number the items of an already decoded JSON array.
+
+    Args:
+        values: Decoded rows
+
+    Yields:
+        Tuple of (row number, row)
+    """
+    for row, value in enumerate(values):
+        yield row, value
+
+
+async def iterate_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, object]]:
+    """
+    Decode an NDJSON body as it arrives, one row per non-blank line.
+
+    Lines that are not valid JSON are yielded as ValueError so they are
+    reported like validation errors.
+
+    Args:
+        chunks: Raw body chunks (e.g. request.stream())
+
+    Yields:
+        Tuple of (row number, decoded value or ValueError)
+    """
+    row = 0
+    buffer = b""
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield row, _decode_line(line)
+                row += 1
+
+    if buffer.strip():
+        yield row, _decode_line(buffer)
+
+
+def _decode_line(line: bytes) -> object:
+    try:
+        return json.loads(line)
+    except ValueError:
+        return ValueError("Invalid JSON")
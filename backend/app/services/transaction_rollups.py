@@ -0,0 +1,385 @@
+"""
+Daily transaction rollups for analytics.
+
+Transactions are summarized per (user, day, category, type, hour) in the
+transaction_daily_rollups table. The table is updated incrementally on every
+session flush that creates, updates or deletes transactions, so analytics
+endpoints read a handful of rows per day instead of every raw transaction.
+
+Partial days at the edges of a requested range are read from the raw
+transactions table, so results match the original timestamp filters exactly.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, delete, func, inspect, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from ..models import Transaction, TransactionDailyRollup, User
+
+# (user_id, day, category, type, hour)
+RollupKey = Tuple[UUID, date, str, str, int]
+
+
+@dataclass
+class RollupRow:
+    """Transactions of one (day, category, type, hour) bucket."""
+    day: date
+    category: str
+    type: str
+    hour: int
+    count: int
+    amount: Decimal
+
+
+def rollup_bucket(value: datetime, dialect_name: str) -> Tuple[date, int]:
+    """
+    Get the (day, hour) bucket of a transaction date.
+
+    SQLite stores the wall-clock time of the value it was given, while
+    PostgreSQL stores an instant, so buckets follow the same convention to
+    match what func.date / extract('hour') return on each backend.
+
+    Args:
+        value: Transaction date
+        dialect_name: Name of the database dialect
+
+    Returns:
+        Tuple of (day, hour)
+    """
+    if not isinstance(value, datetime):
+        return value, 0
+
+    if value.tzinfo is not None:
+        if dialect_name == 'postgresql':
+            value = value.astimezone(timezone.utc)
+        value = value.replace(tzinfo=None)
+
+    return value.date(), value.hour
+
+
+def _attribute_before_flush(obj, attr: str):
+    """Value an attribute had in the database before the current flush."""
+    history = inspect(obj).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(obj, attr)
+
+
+def _add_delta(deltas: Dict[RollupKey, List], dialect_name: str, user_id, when,
+               category: str, type_: str, amount, sign: int) -> None:
+    day, hour = rollup_bucket(when, dialect_name)
+    delta = deltas[(user_id, day, category, type_, hour)]
+    delta[0] += sign
+    delta[1] += sign * Decimal(str(amount or 0))
+
+
+def apply_flush_to_rollups(session: Session) -> None:
+    """
+    Collect the transaction changes of a flush and apply them to the rollups.
+
+    Called from the session after_flush hook, while new/dirty/deleted and the
+    attribute history still describe the changes that were just flushed.
+
+    Args:
+        session: Session being flushed
+    """
+    new = [obj for obj in session.new if isinstance(obj, Transaction)]
+    dirty = [
+        obj for obj in session.dirty
+        if isinstance(obj, Transaction) and session.is_modified(obj)
+    ]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Transaction)]
+    deleted_users = {obj.id for obj in session.deleted if isinstance(obj, User)}
+
+    if not (new or dirty or deleted or deleted_users):
+        return
+
+    connection = session.connection()
+    dialect_name = connection.dialect.name
+    deltas: Dict[RollupKey, List] = defaultdict(lambda: [0, Decimal('0')])
+
+    for obj in new:
+        _add_delta(deltas, dialect_name, obj.user_id, obj.date, obj.category, obj.type, obj.amount, 1)
+
+    for obj in dirty:
+        _add_delta(
+            deltas, dialect_name,
+            _attribute_before_flush(obj, 'user_id'),
+            _attribute_before_flush(obj, 'date'),
+            _attribute_before_flush(obj, 'category'),
+            _attribute_before_flush(obj, 'type'),
+            _attribute_before_flush(obj, 'amount'),
+            -1
+        )
+        _add_delta(deltas, dialect_name, obj.user_id, obj.date, obj.category, obj.type, obj.amount, 1)
+
+    for obj in deleted:
+        _add_delta(
+            deltas, dialect_name,
+            _attribute_before_flush(obj, 'user_id'),
+            _attribute_before_flush(obj, 'date'),
+            _attribute_before_flush(obj, 'category'),
+            _attribute_before_flush(obj, 'type'),
+            _attribute_before_flush(obj, 'amount'),
+            -1
+        )
+
+    # Rollups of deleted users are dropped as a whole (SQLite does not
+    # enforce the FK cascade)
+    if deleted_users:
+        table = TransactionDailyRollup.__table__
+        connection.execute(delete(table).where(table.c.user_id.in_(list(deleted_users))))
+
+    apply_rollup_deltas(connection, {
+        key: delta for key, delta in deltas.items()
+        if key[0] not in deleted_users and (delta[0] != 0 or delta[1] != 0)
+    })
+
+
+def apply_rollup_deltas(connection: Connection, deltas: Dict[RollupKey, List]) -> None:
+    """
+    Add (count, amount) deltas to the rollup buckets, creating them as needed.
+
+    Args:
+        connection: Connection to execute on (the caller's transaction)
+        deltas: Mapping of bucket key to [count delta, amount delta]
+    """
+    if not deltas:
+        return
+
+    table = TransactionDailyRollup.__table__
+    rows = [
+        {
+            "user_id": user_id,
+            "day": day,
+            "category": category,
+            "type": type_,
+            "hour": hour,
+            "txn_count": count,
+            "total_amount": amount
+        }
+        for (user_id, day, category, type_, hour), (count, amount) in deltas.items()
+    ]
+
+    dialect_name = connection.dialect.name
+    if dialect_name in ('sqlite', 'postgresql'):
+        insert = sqlite_insert if dialect_name == 'sqlite' else pg_insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[c.name for c in table.primary_key.columns],
+            set_={
+                "txn_count": table.c.txn_count + stmt.excluded.txn_count,
+                "total_amount": table.c.total_amount + stmt.excluded.total_amount
+            }
+        )
+        connection.execute(stmt, rows)
+    else:
+        # Portable fallback: update the bucket, insert it if it did not exist
+        for row in rows:
+            result = connection.execute(
+                update(table).where(and_(
+                    table.c.user_id == row["user_id"],
+                    table.c.day == row["day"],
+                    table.c.category == row["category"],
+                    table.c.type == row["type"],
+                    table.c.hour == row["hour"]
+                )).values(
+                    txn_count=table.c.txn_count + row["txn_count"],
+                    total_amount=table.c.total_amount + row["total_amount"]
+                )
+            )
+            if result.rowcount == 0:
+                connection.execute(table.insert().values(**row))
+
+    # Drop buckets that no longer hold any transaction
+    connection.execute(
+        delete(table).where(and_(
+            table.c.user_id.in_(list({row["user_id"] for row in rows})),
+            table.c.txn_count <= 0
+        ))
+    )
+
+
+def add_rows_to_rollups(connection: Connection, rows: List[Dict]) -> None:
+    """
+    Add transactions inserted outside the ORM to the rollups.
+
+    Core inserts do not go through a session flush, so callers that bypass
+    the ORM (bulk imports) must call this in the same transaction.
+
+    Args:
+        connection: Connection the rows were inserted on
+        rows: Inserted transaction values (user_id, date, category, type, amount)
+    """
+    dialect_name = connection.dialect.name
+    deltas: Dict[RollupKey, List] = defaultdict(lambda: [0, Decimal('0')])
+    for row in rows:
+        _add_delta(
+            deltas, dialect_name, row["user_id"], row["date"],
+            row["category"], row["type"], row["amount"], 1
+        )
+
+    apply_rollup_deltas(connection, deltas)
+
+
+def _start_of_next_day(value: datetime) -> datetime:
+    return datetime.combine(value.date() + timedelta(days=1), time.min, tzinfo=value.tzinfo)
+
+
+def _start_of_day(value: datetime) -> datetime:
+    return datetime.combine(value.date(), time.min, tzinfo=value.tzinfo)
+
+
+def _raw_rows(db: Session, user_id: UUID, start: datetime, end: Optional[datetime],
+              end_inclusive: bool) -> List[RollupRow]:
+    """Bucket raw transactions of a partial day the same way the rollups do."""
+    dialect_name = db.get_bind().dialect.name
+    query = db.query(
+        Transaction.date, Transaction.category, Transaction.type, Transaction.amount
+    ).filter(
+        Transaction.user_id == user_id,
+        Transaction.date >= start
+    )
+    if end is not None:
+        query = query.filter(Transaction.date <= end if end_inclusive else Transaction.date < end)
+
+    buckets: Dict[Tuple, List] = defaultdict(lambda: [0, Decimal('0')])
+    for when, category, type_, amount in query.all():
+        day, hour = rollup_bucket(when, dialect_name)
+        bucket = buckets[(day, category, type_, hour)]
+        bucket[0] += 1
+        bucket[1] += Decimal(str(amount or 0))
+
+    return [
+        RollupRow(day=day, category=category, type=type_, hour=hour, count=count, amount=amount)
+        for (day, category, type_, hour), (count, amount) in buckets.items()
+    ]
+
+
+def load_rollup_rows(db: Session, user_id: UUID,
+                     start: Optional[datetime] = None,
+                     end: Optional[datetime] = None) -> List[RollupRow]:
+    """
+    Get the bucketed transactions of a user within [start, end].
+
+    Whole days are read from the rollups; the partial first and last days are
+    bucketed from raw transactions so the timestamp bounds stay exact.
+
+    Args:
+        db: Database session
+        user_id: User ID
+        start: Inclusive lower bound (None for no bound)
+        end: Inclusive upper bound (None for no bound)
+
+    Returns:
+        List of rollup rows
+    """
+    if start is not None and end is not None and start.date() == end.date():
+        return _raw_rows(db, user_id, start, end, end_inclusive=True)
+
+    rows: List[RollupRow] = []
+    query = db.query(TransactionDailyRollup).filter(TransactionDailyRollup.user_id == user_id)
+
+    if start is not None:
+        if start == _start_of_day(start):
+            query = query.filter(TransactionDailyRollup.day >= start.date())
+        else:
+            query = query.filter(TransactionDailyRollup.day > start.date())
+            rows.extend(_raw_rows(db, user_id, start, _start_of_next_day(start), end_inclusive=False))
+
+    if end is not None:
+        query = query.filter(TransactionDailyRollup.day < end.date())
+        rows.extend(_raw_rows(db, user_id, _start_of_day(end), end, end_inclusive=True))
+
+    rows.extend(
+        RollupRow(
+            day=r.day,
+            category=r.category,
+            type=r.type,
+            hour=r.hour,
+            count=r.txn_count,
+            amount=Decimal(str(r.total_amount))
+        )
+        for r in query.all()
+    )
+    return rows
+
+
+def hourly_transaction_counts(db: Session, user_id: UUID) -> Dict[int, int]:
+    """
+    Get the number of transactions per hour of day over the user's history.
+
+    Args:
+        db: Database session
+        user_id: User ID
+
+    Returns:
+        Mapping of hour (0-23) to transaction count
+    """
+    counts = db.query(
+        TransactionDailyRollup.hour,
+        func.sum(TransactionDailyRollup.txn_count)
+    ).filter(
+        TransactionDailyRollup.user_id == user_id
+    ).group_by(TransactionDailyRollup.hour).all()
+
+    return {int(hour): int(count) for hour, count in counts if count}
+
+
+def rebuild_rollups(db: Session, user_id: Optional[UUID] = None) -> None:
+    """
+    Recompute rollups from raw transactions (all users or a single one).
+
+    Args:
+        db: Database session (committed by the caller)
+        user_id: Optional user to rebuild; all users when omitted
+    """
+    table = TransactionDailyRollup.__table__
+    connection = db.connection()
+    dialect_name = connection.dialect.name
+
+    stmt = delete(table)
+    query = db.query(
+        Transaction.user_id, Transaction.date, Transaction.category,
+        Transaction.type, Transaction.amount
+    )
+    if user_id is not None:
+        stmt = stmt.where(table.c.user_id == user_id)
+        query = query.filter(Transaction.user_id == user_id)
+    connection.execute(stmt)
+
+    deltas: Dict[RollupKey, List] = defaultdict(lambda: [0, Decimal('0')])
+    for row_user_id, when, category, type_, amount in query.yield_per(1000):
+        _add_delta(deltas, dialect_name, row_user_id, when, category, type_, amount, 1)
+
+    apply_rollup_deltas(connection, deltas)
+
+
+def backfill_rollups_if_empty(db: Session) -> bool:
+    """
+    Build the rollups from existing transactions on first start.
+
+    Args:
+        db: Database session
+
+    Returns:
+        bool: True if a backfill was performed
+    """
+    if db.query(TransactionDailyRollup.user_id).first() is not None:
+        return False
+    if db.query(Transaction.id).first() is None:
+        return False
+
+    rebuild_rollups(db)
+    db.commit()
+    return True
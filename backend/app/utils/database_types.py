@@ -1,28 +1,45 @@
 import uuid
-from sqlalchemy import TypeDecorator, CHAR
+from typing import Optional
+from sqlalchemy import TypeDecorator, CHAR, BINARY, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.types import String
 from sqlalchemy.dialects.postgresql import UUID as pgUUID
 
+from ..config import settings
+
 
 class GUID(TypeDecorator):
     """Platform-independent GUID type.
-    
-    Uses PostgreSQL's UUID type, otherwise uses
-    CHAR(32), storing as stringified hex values.
+
+    Uses PostgreSQL's UUID type. Elsewhere it uses CHAR(36) holding the string
+    form, or BINARY(16) holding the raw UUID bytes when GUID_STORAGE=binary
+    (databases migrated with that setting).
     """
     impl = CHAR
     cache_ok = True
 
+    def __init__(self, binary: Optional[bool] = None):
+        super().__init__()
+        self.binary = settings.guid_storage == "binary" if binary is None else binary
+
     def load_dialect_impl(self, dialect):
         if dialect.name == 'postgresql':
             return dialect.type_descriptor(pgUUID(as_uuid=True))
+        elif self.binary:
+            return dialect.type_descriptor(BINARY(16))
         else:
             return dialect.type_descriptor(CHAR(36))
 
     def process_bind_param(self, value, dialect):
-        if value is None:
-            return value
-        elif dialect.name == 'postgresql':
+        if value is None or dialect.name == 'postgresql':
             return value
+        elif self.binary:
+            # Fast path: UUID instances are by far the most common bind value
+            if value.__class__ is uuid.UUID:
+                return value.bytes
+            if isinstance(value, (bytes, bytearray)):
+                return bytes(value)
+            return uuid.UUID(str(value)).bytes
         else:
             if isinstance(value, uuid.UUID):
                 return str(value)
@@ -31,11 +48,45 @@ class GUID(TypeDecorator):
                 return str(uuid.UUID(value))
 
     def process_result_value(self, value, dialect):
-        if value is None:
-            return value
-        elif dialect.name == 'postgresql':
+        if value is None or dialect.name == 'postgresql':
             return value
+        elif self.binary:
+            return uuid.UUID(bytes=bytes(value))
         else:
             if not isinstance(value, uuid.UUID):
                 value = uuid.UUID(value)
-            return value
\ No newline at end of file
+            return value
+
+
+def check_guid_storage(engine: Engine) -> None:
+    """
+    Refuse to run against a database storing GUIDs differently than GUID_STORAGE.
+
+    With the wrong setting, lookups by ID silently match nothing instead of
+    failing, so the mismatch is reported at startup.
+
+    Args:
+        engine: Application database engine
+
+    Raises:
+        RuntimeError: If the users.id column type does not match GUID_STORAGE
+    """
+    if engine.dialect.name == 'postgresql':
+        return
+    inspector = inspect(engine)
+    if 'users' not in inspector.get_table_names():
+        return
+
+    id_type = next(column['type'] for column in inspector.get_columns('users') if column['name'] == 'id')
+    # SQLite reflects BINARY(16) with its NUMERIC affinity, so test for text
+    stored = 'char' if isinstance(id_type, String) else 'binary'
+    if stored != settings.guid_storage:
+        # Revision c3e8a5d1f7b2 converts to binary when run with GUID_STORAGE=binary
+        hint = (
+            ", or convert the database by running `alembic upgrade head` with GUID_STORAGE=binary "
+            "(after `alembic downgrade b7d2e4f1a9c3` if it is already past revision c3e8a5d1f7b2)"
+        ) if stored == 'char' else ""
+        raise RuntimeError(
+            f"The database stores GUIDs as {stored} but GUID_STORAGE={settings.guid_storage}. "
+            f"Set GUID_STORAGE={stored}{hint}."
+        )
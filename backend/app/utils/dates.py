@@ -0,0 +1,38 @@
+from datetime import date
+
+
+def anniversary_in_year(value: date, year: int) -> date:
+    """
+    Get the date a yearly occasion falls on in a given year.
+
+    Occasions on Feb 29 are moved to Feb 28 outside leap years, where
+    value.replace(year=year) would raise ValueError.
+
+    Args:
+        value: Original date (birth date, wedding date...)
+        year: Year of the occurrence
+
+    Returns:
+        date: The occurrence in that year
+    """
+    try:
+        return value.replace(year=year)
+    except ValueError:
+        return date(year, 2, 28)
+
+
+def next_anniversary(value: date, today: date) -> date:
+    """
+    Get the next occurrence of a yearly occasion, today included.
+
+    Args:
+        value: Original date
+        today: Current date
+
+    Returns:
+        date: The first occurrence on or after today
+    """
+    occurrence = anniversary_in_year(value, today.year)
+    if occurrence < today:
+        occurrence = anniversary_in_year(value, today.year + 1)
+    return occurrence
@@ -0,0 +1,101 @@
+import base64
+import json
+from typing import Any, Callable, List, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+# Response header carrying the cursor of the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Encode the sort key of the last row of a page as an opaque cursor.
+
+    Args:
+        values: Sort key values (datetimes, UUIDs, ints)
+
+    Returns:
+        str: URL-safe cursor string
+    """
+    raw = json.dumps(
+        [value if isinstance(value, int) else (
+            value.isoformat() if hasattr(value, "isoformat") else str(value)
+        ) for value in values],
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, parsers: Sequence[Callable[[Any], Any]]) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor: Cursor string from the client
+        parsers: One parser per sort key value (e.g. datetime.fromisoformat, UUID)
+
+    Returns:
+        List[Any]: Parsed sort key values
+
+    Raises:
+        HTTPException: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(parsers):
+            raise ValueError("wrong number of values")
+        return [parse(value) for parse, value in zip(parsers, values)]
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def keyset_condition(keys: Sequence[Tuple[Any, bool]], values: Sequence[Any]):
+    """
+    Build the WHERE clause selecting the rows after a cursor.
+
+    For keys (a desc, b asc) and values (x, y) this is
+    a <= x AND (a < x OR (a = x AND b > y)). The redundant bound on the
+    leading key lets the database seek straight to the cursor position
+    through the matching index instead of skipping rows.
+
+    Args:
+        keys: (column, descending) pairs in ORDER BY order
+        values: Cursor values, one per key
+
+    Returns:
+        SQL expression for the WHERE clause
+    """
+    (column, descending), value = keys[0], values[0]
+    if len(keys) == 1:
+        return column < value if descending else column > value
+    return and_(
+        column <= value if descending else column >= value,
+        _strictly_after(keys, values)
+    )
+
+
+def _strictly_after(keys: Sequence[Tuple[Any, bool]], values: Sequence[Any]):
+    (column, descending), value = keys[0], values[0]
+    after = column < value if descending else column > value
+    if len(keys) == 1:
+        return after
+    return or_(after, and_(column == value, _strictly_after(keys[1:], values[1:])))
+
+
+def keyset_order(keys: Sequence[Tuple[Any, bool]]) -> List[Any]:
+    """
+    Build the ORDER BY clauses matching keyset_condition.
+
+    Args:
+        keys: (column, descending) pairs
+
+    Returns:
+        List of ORDER BY expressions
+    """
+    return [column.desc() if descending else column.asc() for column, descending in keys]
@@ -1,12 +1,113 @@
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 
 from ..config import settings
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing context (existing hashes keep verifying with their own cost)
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.bcrypt_rounds
+)
+
+T = TypeVar("T")
+
+
+class PasswordHashPool:
+    """
+    Bounded worker pool for bcrypt hashing and verification.
+
+    bcrypt is deliberately slow, so running it inside an async handler
+    blocks the event loop for every other request. Calls are handed to a
+    fixed number of worker threads (bcrypt releases the GIL while hashing)
+    and the pool tracks how many calls are waiting for a worker.
+    """
+    def __init__(self, max_workers: int):
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.max_queue_depth = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="password-hash"
+                )
+            return self._executor
+
+    def _call(self, func: Callable[..., T], *args) -> T:
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """
+        Run a hashing function on the pool without blocking the event loop.
+
+        Args:
+            func: Function to run
+            *args: Positional arguments for the function
+
+        Returns:
+            The function result
+        """
+        executor = self._get_executor()
+        with self._lock:
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queued)
+
+        future = executor.submit(self._call, func, *args)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Calls cancelled before a worker picked them up never reach _call
+            if future.cancel():
+                with self._lock:
+                    self.queued -= 1
+            raise
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get queue-depth metrics of the pool.
+
+        Returns:
+            Dict[str, int]: Workers, queued/running calls, completed calls and peak queue depth
+        """
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "max_queue_depth": self.max_queue_depth
+            }
+
+    def shutdown(self):
+        """Stop the worker threads."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+# Global password hashing pool
+password_hash_pool = PasswordHashPool(max_workers=settings.password_hash_workers)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -36,6 +137,33 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password on the hashing pool (use from async handlers).
+    
+    Args:
+        plain_password: Plain text password
+        hashed_password: Hashed password
+        
+    Returns:
+        bool: True if password matches, False otherwise
+    """
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Hash a password on the hashing pool (use from async handlers).
+    
+    Args:
+        password: Plain text password
+        
+    Returns:
+        str: Hashed password
+    """
+    return await password_hash_pool.run(get_password_hash, password)
+
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """
     Create a JWT access token.
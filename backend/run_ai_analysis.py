@@ -7,66 +7,30 @@ from sqlalchemy.orm import Session
 from app.database import SessionLocal
 from app.models import User, Suggestion
 from app.services.ai_engine import AIEngine
+from app.services.batch_analysis import run_batch_analysis_sync
 from app.config import settings
 
 
-def run_analysis_for_all_users():
-    """Run AI analysis for all active users."""
+def run_analysis_for_all_users(concurrency: int = None):
+    """Run AI analysis for all active users, many at a time."""
     print(f"🤖 Starting AI Analysis - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"LLM Enabled: {settings.use_llm_for_suggestions}")
     print(f"LLM Model: {settings.llm_model}")
+    print(f"Concurrency: {concurrency or settings.ai_batch_concurrency}")
     print("-" * 50)
     
-    db = SessionLocal()
-    
     try:
-        # Get all active users
-        users = db.query(User).filter(User.is_active == True).all()
-        print(f"Found {len(users)} active users")
-        
-        total_suggestions = 0
-        
-        for user in users:
-            print(f"\n📊 Analyzing user: {user.username}")
-            
-            # Initialize AI Engine
-            engine = AIEngine(db)
-            
-            # Generate suggestions
-            new_suggestions = engine.analyze_user(user)
-            
-            # Save suggestions to database
-            user_suggestions = 0
-            for suggestion_data in new_suggestions:
-                # Check if similar suggestion already exists
-                existing = db.query(Suggestion).filter(
-                    Suggestion.user_id == user.id,
-                    Suggestion.content == suggestion_data['content'],
-                    Suggestion.status.in_(['pending', 'accepted'])
-                ).first()
-                
-                if not existing:
-                    suggestion = Suggestion(
-                        user_id=user.id,
-                        **suggestion_data
-                    )
-                    db.add(suggestion)
-                    user_suggestions += 1
-                    print(f"  ✅ {suggestion_data['type']}: {suggestion_data['content'][:60]}...")
-            
-            db.commit()
-            total_suggestions += user_suggestions
-            print(f"  Generated {user_suggestions} new suggestions for {user.username}")
+        result = run_batch_analysis_sync(concurrency=concurrency)
         
         print(f"\n✅ Analysis complete!")
-        print(f"Total new suggestions created: {total_suggestions}")
+        print(f"Users processed: {result['users_processed']}")
+        if result['users_failed']:
+            print(f"Users failed: {result['users_failed']}")
+        print(f"Total new suggestions created: {result['suggestions_created']}")
         
     except Exception as e:
         print(f"\n❌ Error during analysis: {e}")
-        db.rollback()
         raise
-    finally:
-        db.close()
 
 
 def run_analysis_for_user(username: str):
@@ -15,6 +15,7 @@ from app.models import User, Profile, Transaction, Suggestion, Interaction
 from app.models.suggestion import SuggestionType, SuggestionStatus
 from app.models.interaction import InteractionAction
 from app.utils.security import get_password_hash
+from app.utils.dates import next_anniversary
 
 # Priority levels
 class Priority:
@@ -269,7 +270,8 @@ def create_ai_suggestions(usernames):
         
         # 1. Upcoming spouse birthday suggestion
         if user.profile.spouse_birth_date:
-            days_until = (user.profile.spouse_birth_date.replace(year=today.year) - today.date()).days
+            spouse_birthday = next_anniversary(user.profile.spouse_birth_date, today.date())
+            days_until = (spouse_birthday - today.date()).days
             
             if 0 < days_until <= 7:
                 # Restaurant reservation suggestion
@@ -280,7 +282,7 @@ def create_ai_suggestions(usernames):
                            f"Deseja que eu reserve o Fasano Restaurant como nos anos anteriores?",
                     priority=Priority.HIGH,
                     status=SuggestionStatus.PENDING,
-                    scheduled_date=datetime.combine(user.profile.spouse_birth_date.replace(year=today.year), datetime.min.time()).replace(tzinfo=timezone.utc),
+                    scheduled_date=datetime.combine(spouse_birthday, datetime.min.time()).replace(tzinfo=timezone.utc),
                     context_data=json.dumps({
                         "person": user.profile.spouse_name,
                         "occasion": "birthday",
@@ -297,7 +299,7 @@ def create_ai_suggestions(usernames):
                            "Nos últimos anos você enviou rosas vermelhas.",
                     priority=Priority.MEDIUM,
                     status=SuggestionStatus.PENDING,
-                    scheduled_date=datetime.combine(user.profile.spouse_birth_date.replace(year=today.year) - timedelta(days=1), datetime.min.time()).replace(tzinfo=timezone.utc),
+                    scheduled_date=datetime.combine(spouse_birthday - timedelta(days=1), datetime.min.time()).replace(tzinfo=timezone.utc),
                     context_data=json.dumps({
                         "person": user.profile.spouse_name,
                         "item": "flowers",
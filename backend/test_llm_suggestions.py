@@ -3,11 +3,10 @@ Test script to demonstrate LLM suggestion generation.
 Run this after configuring your ANTHROPIC_API_KEY in .env
 """
 import asyncio
-from datetime import datetime, timedelta, timezone
-from sqlalchemy.orm import Session
 from app.database import SessionLocal
-from app.models import User, Transaction
+from app.models import User
 from app.services.ai_engine import AIEngine
+from app.services.feature_store import load_features
 from app.services.llm_service import llm_service
 from app.config import settings
 
@@ -38,13 +37,10 @@ def test_llm_service():
             
         print(f"\nTesting with user: {user.username}")
         
-        # Get recent transactions
-        transactions = db.query(Transaction).filter(
-            Transaction.user_id == user.id,
-            Transaction.date >= datetime.now(timezone.utc) - timedelta(days=30)
-        ).limit(10).all()
+        # Get the precomputed transaction features
+        features = load_features(db, user.id)
         
-        print(f"Found {len(transactions)} recent transactions")
+        print(f"Found {features.transaction_count} transactions in the last {features.window_days} days")
         
         # Test LLM suggestion generation
         print("\n🤖 Generating suggestions with Claude...")
@@ -52,7 +48,7 @@ def test_llm_service():
         async def generate():
             return await llm_service.generate_suggestions(
                 user, 
-                transactions, 
+                features, 
                 [], 
                 max_suggestions=3
             )
@@ -15,11 +15,9 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from datetime import datetime, timezone
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.models import User, Transaction, Suggestion, SuggestionType, SuggestionStatus
+from app.models import User, Suggestion, SuggestionStatus
 from app.services.ai_engine import AIEngine
+from app.services.feature_store import load_features
 from app.database import SessionLocal
 import json
 
@@ -29,38 +27,20 @@ def print_separator():
     print("=" * 80)
 
 
-def print_transaction_summary(transactions):
-    """Imprime resumo das transações."""
-    if not transactions:
+def print_transaction_summary(features):
+    """Imprime resumo das transações a partir do vetor de features do usuário."""
+    if not features.transaction_count:
         print("   📊 Nenhuma transação encontrada")
         return
     
-    # Agregar por categoria
-    category_totals = {}
-    type_totals = {}
-    
-    for t in transactions:
-        # Por categoria
-        if t.category not in category_totals:
-            category_totals[t.category] = {"count": 0, "total": 0}
-        category_totals[t.category]["count"] += 1
-        category_totals[t.category]["total"] += float(t.amount)
-        
-        # Por tipo
-        if t.type not in type_totals:
-            type_totals[t.type] = {"count": 0, "total": 0}
-        type_totals[t.type]["count"] += 1
-        type_totals[t.type]["total"] += float(t.amount)
-    
-    print(f"   📊 Total de transações: {len(transactions)}")
+    print(f"   📊 Total de transações: {features.transaction_count}")
     print("\n   💰 Por tipo:")
-    for type_name, data in sorted(type_totals.items()):
-        print(f"      - {type_name}: {data['count']} transações, R$ {data['total']:.2f}")
+    for type_name, totals in sorted(features.types.items()):
+        print(f"      - {type_name}: {totals.count} transações, R$ {totals.amount:.2f}")
     
     print("\n   📂 Por categoria (top 5):")
-    sorted_categories = sorted(category_totals.items(), key=lambda x: x[1]["total"], reverse=True)[:5]
-    for cat, data in sorted_categories:
-        print(f"      - {cat}: {data['count']} transações, R$ {data['total']:.2f}")
+    for cat, totals in features.top_categories(5):
+        print(f"      - {cat}: {totals.count} transações, R$ {totals.amount:.2f}")
 
 
 def analyze_single_user(db, username):
@@ -87,16 +67,10 @@ def analyze_single_user(db, username):
             if profile.spouse_birth_date:
                 print(f"   - Aniversário cônjuge: {profile.spouse_birth_date.strftime('%d/%m')}")
     
-    # Buscar transações recentes
-    print("\n📈 Transações recentes (últimos 90 dias):")
-    from datetime import timedelta
-    ninety_days_ago = datetime.now(timezone.utc) - timedelta(days=90)
-    recent_transactions = db.query(Transaction).filter(
-        Transaction.user_id == user.id,
-        Transaction.date >= ninety_days_ago
-    ).order_by(Transaction.date.desc()).all()
-    
-    print_transaction_summary(recent_transactions)
+    # Resumo das transações recentes (feature store)
+    features = load_features(db, user.id)
+    print(f"\n📈 Transações recentes (últimos {features.window_days} dias):")
+    print_transaction_summary(features)
     
     # Buscar sugestões existentes
     existing_pending = db.query(Suggestion).filter(